@@ -1,16 +1,20 @@
 from django.contrib import admin
 from .models import (
     UserProfile, DietLogItem, Exercise, Workout, WorkoutExercise,
-    WorkoutProgram, ActiveWorkoutProgram, ProgramDay, LoggedWorkout, LoggedExercise
+    WorkoutProgram, ActiveWorkoutProgram, ProgramDay, LoggedWorkout, LoggedExercise,
+    DailyUserStats, FoodScanJob, Muscle
 )
 
 admin.site.register(UserProfile)
 admin.site.register(DietLogItem)
 admin.site.register(Exercise)
+admin.site.register(Muscle)
 admin.site.register(Workout)
 admin.site.register(WorkoutExercise)
 admin.site.register(WorkoutProgram)
 admin.site.register(ProgramDay)
 admin.site.register(LoggedWorkout)
 admin.site.register(LoggedExercise)
-admin.site.register(ActiveWorkoutProgram)
\ No newline at end of file
+admin.site.register(ActiveWorkoutProgram)
+admin.site.register(DailyUserStats)
+admin.site.register(FoodScanJob)
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+
+
+class FitnessConfig(AppConfig):
+    name = "fitness"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+        from . import signals  # noqa: F401
+        from .profiling import instrument_connection
+
+        if settings.PROFILING_ENABLED:
+            connection_created.connect(instrument_connection)
@@ -0,0 +1,108 @@
+"""
+Async versions of the I/O-bound endpoints: food scans and diet log uploads.
+
+Served from fitness_server.asgi by uvicorn workers (SERVER_MODE=asgi), a
+request waiting on the model or on storage does not hold a worker. They run
+under WSGI too, like every other view.
+
+DRF views cannot be async, so these are plain Django views taking the same
+token authentication and returning the same payloads as their DRF versions.
+"""
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from .authentication import CachedTokenAuthentication
+from .models import FoodScanJob
+from .profiling import span
+from .scan_jobs import asubmit_scan, await_for_scan, parse_wait
+from .serializers import DietLogItemSerializer, FoodScanJobSerializer
+
+
+async def authenticate(request):
+    """The user of the request's token, or None."""
+    with span('auth'):
+        try:
+            credentials = await sync_to_async(CachedTokenAuthentication().authenticate)(request)
+        except AuthenticationFailed:
+            return None
+    return credentials[0] if credentials else None
+
+
+def token_view(methods):
+    """
+    Make an async view answer `methods` to token-authenticated users. Exempt
+    from CSRF checks like the DRF views, as the token is not a cookie.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return HttpResponseNotAllowed(methods)
+            user = await authenticate(request)
+            if user is None:
+                return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+            request.user = user
+            return await view(request, *args, **kwargs)
+        wrapper.csrf_exempt = True
+        wrapper.http_methods = [method.lower() for method in methods]
+        return wrapper
+    return decorator
+
+
+@token_view(['POST'])
+async def scan_food(request):
+    """
+    Queue a scan of a food image like DietLogItemViewSet.scan. With
+    `?wait=<seconds>` the request awaits the model call: 200 with the result
+    if the scan finished in time, 202 with the job to poll otherwise.
+    """
+    # Parsing the multipart body may spool the upload to disk
+    image_file = await sync_to_async(request.FILES.get)('image')
+    if not image_file:
+        return JsonResponse({"error": "No image provided."}, status=400)
+    try:
+        wait = parse_wait(request.GET.get('wait'))
+    except ValueError:
+        return JsonResponse({"error": "wait must be a number of seconds."}, status=400)
+
+    image_bytes = await sync_to_async(image_file.read)()
+    job = await asubmit_scan(request.user, image_bytes, wait)
+    return JsonResponse(FoodScanJobSerializer(job).data, status=200 if job.is_finished else 202)
+
+
+@token_view(['GET'])
+async def scan_result(request, job_id):
+    """
+    State of a scan job like DietLogItemViewSet.scan_result, long-polled
+    with `?wait=<seconds>` without holding a thread.
+    """
+    job = await FoodScanJob.objects.filter(pk=job_id, user=request.user).afirst()
+    if job is None:
+        return JsonResponse({"detail": "Not found."}, status=404)
+    try:
+        wait = parse_wait(request.GET.get('wait'))
+    except ValueError:
+        return JsonResponse({"error": "wait must be a number of seconds."}, status=400)
+
+    job = await await_for_scan(job, wait)
+    return JsonResponse(FoodScanJobSerializer(job).data)
+
+
+def create_diet_log_item(request):
+    serializer = DietLogItemSerializer(data=request.POST.dict() | request.FILES.dict(), context={'request': request})
+    if not serializer.is_valid():
+        return serializer.errors, 400
+    serializer.save(user=request.user)
+    return serializer.data, 201
+
+
+@token_view(['POST'])
+async def upload_diet_log_item(request):
+    """
+    Log a meal with its photo, like a multipart POST to DietLogItemViewSet.
+    Parsing, the thumbnail and the storage and database writes run off the
+    event loop.
+    """
+    data, status = await sync_to_async(create_diet_log_item)(request)
+    return JsonResponse(data, status=status)
@@ -0,0 +1,45 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import SessionAuthentication as DRFSessionAuthentication, TokenAuthentication
+from .profiling import TimedAuthenticationMixin
+
+
+def token_cache_key(key):
+    # Hashed, so raw tokens never end up in a shared cache backend
+    return 'auth-token:' + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    """
+    Drop the cached user of token `key`. Called when the token is deleted or
+    the user changes, so the next request loads them from the database.
+    """
+    cache.delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(TimedAuthenticationMixin, TokenAuthentication):
+    """
+    TokenAuthentication that keeps the (user, token) of a key in the Django
+    cache for AUTH_TOKEN_CACHE_TTL seconds, saving the Token + UserProfile
+    query of every authenticated request. The cache backend bounds and evicts
+    the entries; a TTL of 0 turns caching off.
+
+    Entries are dropped by logout and profile updates (see forget_token), and
+    otherwise expire, so a user deactivated in the admin is refused within
+    the TTL.
+    """
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE_TTL:
+            return super().authenticate_credentials(key)
+
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.AUTH_TOKEN_CACHE_TTL)
+        return credentials
+
+
+class SessionAuthentication(TimedAuthenticationMixin, DRFSessionAuthentication):
+    """DRF's SessionAuthentication, timed like CachedTokenAuthentication."""
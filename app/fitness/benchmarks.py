@@ -0,0 +1,150 @@
+import json
+import statistics
+import time
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import Exercise, Workout, WorkoutProgram
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def logged_workout_payload(user):
+    exercise_ids = list(Exercise.objects.order_by('pk').values_list('pk', flat=True)[:5])
+    return {
+        'workout_name': "Benchmark workout",
+        'duration_minutes': 45,
+        'log_time': '2024-01-01T10:00:00Z',
+        'exercises': [
+            {'exercise_id': exercise_id, 'order': order, 'sets': 3, 'reps': 10}
+            for order, exercise_id in enumerate(exercise_ids, start=1)
+        ],
+    }
+
+
+def endpoints(user):
+    """
+    The benchmarked requests as (name, method, path, payload), against the data of `user`.
+    """
+    program_id = WorkoutProgram.objects.filter(user=user).values_list('pk', flat=True).first()
+    workout_id = Workout.objects.values_list('pk', flat=True).first()
+    return [
+        ('stats.calories_burned', 'get', '/api/v1/stats/calories_burned/', None),
+        ('stats.calories_eaten_per_day', 'get', '/api/v1/stats/calories_eaten_per_day/', None),
+        ('stats.number_exercises', 'get', '/api/v1/stats/number_exercises/', None),
+        ('stats.number_logged_exercises_per_day', 'get', '/api/v1/stats/number_logged_exercises_per_day/', None),
+        ('dietlogitems.list', 'get', '/api/v1/dietlogitems/', None),
+        ('loggedworkouts.list', 'get', '/api/v1/loggedworkouts/', None),
+        ('exercises.list', 'get', '/api/v1/exercises/', None),
+        ('exercises.search', 'get', '/api/v1/exercises/search/?q=squat', None),
+        ('workouts.list', 'get', '/api/v1/workouts/', None),
+        ('workouts.retrieve', 'get', f'/api/v1/workouts/{workout_id}/', None),
+        ('workoutprograms.retrieve', 'get', f'/api/v1/workoutprograms/{program_id}/', None),
+        ('workoutprograms.current_program', 'get', '/api/v1/workoutprograms/current_program/', None),
+        ('workoutprograms.todays_workout', 'get', '/api/v1/workoutprograms/todays_workout/', None),
+        ('loggedworkouts.create', 'post', '/api/v1/loggedworkouts/', logged_workout_payload(user)),
+    ]
+
+
+class EndpointBenchmark:
+    """
+    Drives the API endpoints through the DRF test client as `user` and records
+    the latency and number of SQL queries of every request.
+
+    Requests authenticate with the user's token like the apps do, so the
+    query counts include authentication; with `token_cache=False` every
+    request loads the token and user from the database.
+
+    The test client keeps the database connection open between requests; with
+    `close_connections` every request ends like under gunicorn, closing the
+    connection unless CONN_MAX_AGE allows its reuse, so latencies include
+    connection setup.
+
+    Writes are rolled back after each request, so repeated runs see the same data.
+    """
+    def __init__(self, user, iterations=20, warmup=2, token_cache=True, close_connections=False):
+        self.user = user
+        self.iterations = iterations
+        self.warmup = warmup
+        self.token_cache = token_cache
+        self.close_connections = close_connections
+        token, created = Token.objects.get_or_create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def run(self, only=None):
+        results = {}
+        overrides = {
+            # The test client always sends Host: testserver
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+        }
+        if not self.token_cache:
+            overrides['AUTH_TOKEN_CACHE_TTL'] = 0
+        with override_settings(**overrides):
+            for name, method, path, payload in endpoints(self.user):
+                if only and not any(pattern in name for pattern in only):
+                    continue
+                results[name] = self.measure(method, path, payload)
+        return results
+
+    def request(self, method, path, payload):
+        if method == 'get':
+            response = self.client.get(path)
+        else:
+            with transaction.atomic():
+                response = getattr(self.client, method)(path, payload, format='json')
+                transaction.set_rollback(True)
+        if self.close_connections:
+            close_old_connections()  # What the request_finished signal does in production
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {path} returned {response.status_code}: {response.content[:200]!r}")
+        return response
+
+    def measure(self, method, path, payload):
+        for _ in range(self.warmup):
+            self.request(method, path, payload)
+
+        latencies, queries = [], []
+        for _ in range(self.iterations):
+            # Started first: entering the context opens a closed connection
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                self.request(method, path, payload)
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        return {
+            'p50_ms': round(statistics.median(latencies), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'queries': max(queries),
+        }
+
+
+def compare(results, baseline, tolerance, slack_ms=0):
+    """
+    Regressions of `results` against a baseline, as (endpoint, message). Any
+    extra query is a regression; latency only when p50 is more than `tolerance`
+    times the baseline plus `slack_ms`, since timings vary between machines.
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get('endpoints', {}).get(name)
+        if not expected:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append((name, f"{result['queries']} queries, baseline {expected['queries']}"))
+        if result['p50_ms'] > expected['p50_ms'] * tolerance + slack_ms:
+            regressions.append((name, f"p50 {result['p50_ms']} ms, baseline {expected['p50_ms']} ms"))
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
@@ -0,0 +1,93 @@
+import hashlib
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+# Cached resources, invalidated by fitness.signals
+ACTIVE_PROGRAMS = 'active_programs'
+DIET_LOG_ITEMS = 'diet_log_items'
+LOGGED_WORKOUTS = 'logged_workouts'
+WORKOUTS = 'workouts'
+WORKOUT_PROGRAMS = 'workout_programs'
+
+# Resources versioned per user; the others have one version shared by everyone
+PER_USER_RESOURCES = {ACTIVE_PROGRAMS, DIET_LOG_ITEMS, LOGGED_WORKOUTS}
+
+
+def version_key(resource, user_id=None):
+    return f'version:{resource}' if user_id is None else f'version:{resource}:{user_id}'
+
+
+def resource_version(resource, user_id=None):
+    """
+    Current version of a resource, shared or of one user. Part of the key of
+    every cached response built from it, so bumping it invalidates them all.
+    """
+    return cache.get_or_set(version_key(resource, user_id), uuid.uuid4().hex, None)
+
+
+def invalidate(resource, user_id=None):
+    """
+    Bump the version of a resource. Bumped again on commit: a request reading
+    the old rows while the write is in progress may cache them under the
+    first new version.
+    """
+    key = version_key(resource, user_id)
+    cache.set(key, uuid.uuid4().hex, None)
+    transaction.on_commit(lambda: cache.set(key, uuid.uuid4().hex, None))
+
+
+def response_key(view, request, resources, per_user):
+    user_id = request.user.pk if per_user else None
+    versions = ':'.join(
+        resource_version(resource, request.user.pk if resource in PER_USER_RESOURCES else None)
+        for resource in resources
+    )
+    path = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+    # The date, as many of the views are about "today"
+    return f'view:{type(view).__name__}.{view.action}:{user_id}:{timezone.localdate()}:{versions}:{path}'
+
+
+def cache_response(*resources, per_user=False, timeout=None):
+    """
+    Cache the data of the successful responses of a DRF view method for
+    `timeout` seconds (VIEW_CACHE_TIMEOUT by default, or a function of the
+    request), until one of `resources` is invalidated. A VIEW_CACHE_TIMEOUT
+    of 0 turns the caching of every view off.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if not settings.VIEW_CACHE_TIMEOUT:
+                return method(view, request, *args, **kwargs)
+
+            key = response_key(view, request, resources, per_user)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data, status=status.HTTP_200_OK)
+
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                if timeout is None:
+                    seconds = settings.VIEW_CACHE_TIMEOUT
+                else:
+                    seconds = timeout(request) if callable(timeout) else timeout
+                cache.set(key, response.data, seconds)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_per_user(*resources, timeout=None):
+    """Cache a view method per user."""
+    return cache_response(*resources, per_user=True, timeout=timeout)
+
+
+def cache_per_resource(*resources, timeout=None):
+    """Cache a view method for all users, over resources shared by everyone."""
+    return cache_response(*resources, per_user=False, timeout=timeout)
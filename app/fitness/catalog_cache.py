@@ -0,0 +1,86 @@
+import threading
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from .models import CatalogVersion, Exercise, exercise_list_prefetches
+from .serializers import ExerciseSerializer
+
+
+class ExerciseCatalogCache:
+    """
+    In-process cache of the serialized Exercise catalog.
+
+    Holds the serialized exercises and the JSON bytes of the whole catalog and of
+    every exercise for one CatalogVersion. Any write to the catalog bumps the version (see
+    fitness/signals.py), and the next request on each worker reloads it.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.items = []
+        self.catalog = b''
+        self.entries = {}
+        self.items_by_id = {}
+
+    def load(self, version):
+        with self.lock:
+            if self.version != version:
+                renderer = JSONRenderer()
+                self.items = ExerciseSerializer(Exercise.objects.prefetch_related(*exercise_list_prefetches()), many=True).data
+                self.entries = {item['exercise_id']: renderer.render(item) for item in self.items}
+                self.items_by_id = {item['exercise_id']: item for item in self.items}
+                self.catalog = renderer.render(self.items)
+                self.version = version
+            return self.items, self.catalog, self.entries, self.items_by_id
+
+    def exercises(self, version):
+        """The serialized exercises, as dicts."""
+        return self.load(version)[0]
+
+    def exercises_by_id(self, version):
+        """The serialized exercises by exercise_id."""
+        return self.load(version)[3]
+
+    def catalog_bytes(self, version):
+        return self.load(version)[1]
+
+    def entry_bytes(self, version, exercise_id):
+        entry = self.load(version)[2].get(exercise_id)
+        if entry is None:
+            raise Http404("No Exercise matches the given query.")
+        return entry
+
+
+catalog_cache = ExerciseCatalogCache()
+
+
+def etag_matches(request, etag):
+    """
+    Whether the If-None-Match header of `request` names `etag` or is `*`,
+    compared weakly as RFC 9110 asks of If-None-Match.
+    """
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in etags}
+
+
+def catalog_response(request, etag, content):
+    """
+    A JSON response of the bytes returned by `content`, tagged with `etag`.
+    Clients that already hold that version get an empty 304 instead.
+    """
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content(), content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'  # Always revalidate, which is free with the ETag
+    return response
+
+
+def exercise_catalog_response(request, exercise_id=None):
+    version = CatalogVersion.current()
+    if exercise_id is None:
+        return catalog_response(request, f'"exercises-{version}"', lambda: catalog_cache.catalog_bytes(version))
+    return catalog_response(
+        request, f'"exercise-{exercise_id}-{version}"', lambda: catalog_cache.entry_bytes(version, exercise_id)
+    )
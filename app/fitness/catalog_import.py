@@ -0,0 +1,187 @@
+import json
+from collections import Counter
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from .caching import WORKOUTS, invalidate
+from .featured import forget_featured
+from .models import (
+    CatalogVersion, Exercise, ExerciseInstruction, ExerciseSecondaryMuscle, Muscle, exercise_list_prefetches,
+    rewriting_catalog_lists
+)
+from .rollups import refresh_exercise_stats
+from .serializers import ExerciseSerializer
+
+# Keys of the exercisedb export (seed_exercise.json) -> ExerciseSerializer fields
+SOURCE_KEYS = {'id': 'exercise_id', 'gifUrl': 'gif_url', 'bodyPart': 'body_part'}
+
+EXERCISE_FIELDS = ['body_part', 'equipment', 'gif_url', 'name', 'target', 'calories_burned']
+
+
+def iter_json_array(stream, chunk_size=64 * 1024):
+    """
+    Yield the items of a top-level JSON array from a text stream, one at a
+    time, without reading the whole document into memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+    started = False
+    while True:
+        # Skip whitespace and the array punctuation between items
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[':
+            started = started or buffer[position] == '['
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        if position < len(buffer) and started:
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+                yield item
+                continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif position < len(buffer):
+            raise ValueError("Expected a JSON array")
+        elif eof:
+            raise ValueError("Unexpected end of the JSON array")
+
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+class CatalogRowSerializer(ExerciseSerializer):
+    """
+    Validates one catalog row without touching the database: rows for existing
+    exercise ids are updates, not uniqueness errors.
+    """
+    class Meta(ExerciseSerializer.Meta):
+        extra_kwargs = {'exercise_id': {'validators': []}, 'calories_burned': {'required': False}}
+
+
+def normalize_row(row):
+    if not isinstance(row, dict):
+        return row
+    return {SOURCE_KEYS.get(key, key): value for key, value in row.items()}
+
+
+def exercise_values(exercise):
+    values = {field: getattr(exercise, field) for field in EXERCISE_FIELDS}
+    values['secondary_muscles'] = list(dict.fromkeys(exercise.get_secondary_muscles()))
+    values['instructions'] = exercise.get_instructions()
+    return values
+
+
+def row_values(row, existing):
+    values = {field: row[field] for field in EXERCISE_FIELDS if field in row}
+    values.setdefault('calories_burned', existing['calories_burned'] if existing else Exercise._meta.get_field('calories_burned').default)
+    values['secondary_muscles'] = list(dict.fromkeys(row['get_secondary_muscles']))
+    values['instructions'] = row['get_instructions']
+    return values
+
+
+class CatalogImporter:
+    """
+    Upserts exercise catalog rows in batches.
+
+    Each batch is validated, diffed against the stored exercises in three
+    queries and written with one bulk upsert on exercise_id, plus bulk writes
+    of the muscle and instruction rows of the exercises whose lists changed.
+    Unchanged rows are not written, so re-running an import is a no-op.
+    """
+    def __init__(self, batch_size=500, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.counts = Counter()
+        self.errors = []  # (row number, errors)
+        self.changes = []  # (exercise_id, 'created' | 'updated', changed fields)
+        self.recalculated = set()  # Updated exercises whose calories_burned changed
+
+    def run(self, rows):
+        with transaction.atomic():
+            batch = []
+            for number, row in enumerate(rows, start=1):
+                batch.append((number, normalize_row(row)))
+                if len(batch) >= self.batch_size:
+                    self.import_batch(batch)
+                    batch = []
+            if batch:
+                self.import_batch(batch)
+            if not self.dry_run and (self.counts['created'] or self.counts['updated']):
+                CatalogVersion.bump()
+                invalidate(WORKOUTS)
+                forget_featured()
+                # The bulk upsert skips the signal refreshing the rollups
+                refresh_exercise_stats(self.recalculated)
+        return self.counts
+
+    def validate(self, batch):
+        # One serializer validates the whole batch; building its fields costs
+        # more than validating a row.
+        serializer = CatalogRowSerializer()
+        valid = {}
+        for number, row in batch:
+            try:
+                validated_data = serializer.run_validation(row)
+            except ValidationError as e:
+                self.errors.append((number, e.detail))
+                self.counts['invalid'] += 1
+                continue
+            # A later row for the same exercise in the file wins
+            valid[validated_data['exercise_id']] = validated_data
+        return valid
+
+    def import_batch(self, batch):
+        rows = self.validate(batch)
+        existing = {
+            exercise.pk: exercise_values(exercise)
+            for exercise in Exercise.objects.filter(pk__in=rows).prefetch_related(*exercise_list_prefetches())
+        }
+
+        upserts, changed_lists = {}, {}
+        for exercise_id, row in rows.items():
+            current = existing.get(exercise_id)
+            values = row_values(row, current)
+            if current == values:
+                self.counts['unchanged'] += 1
+                continue
+            status = 'updated' if current else 'created'
+            changed = sorted(field for field in values if not current or current[field] != values[field])
+            self.counts[status] += 1
+            self.changes.append((exercise_id, status, changed))
+            upserts[exercise_id] = values
+            if current and 'calories_burned' in changed:
+                self.recalculated.add(exercise_id)
+            if not current or {'secondary_muscles', 'instructions'} & set(changed):
+                changed_lists[exercise_id] = values
+
+        if not self.dry_run and upserts:
+            self.write(upserts, changed_lists)
+
+    def write(self, upserts, changed_lists):
+        Exercise.objects.bulk_create(
+            [
+                Exercise(exercise_id=exercise_id, **{field: values[field] for field in EXERCISE_FIELDS})
+                for exercise_id, values in upserts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['exercise_id'],
+            update_fields=EXERCISE_FIELDS,
+        )
+
+        muscles = Muscle.get_or_create_all({name for values in changed_lists.values() for name in values['secondary_muscles']})
+        # The version is bumped once by run()
+        with rewriting_catalog_lists():
+            ExerciseSecondaryMuscle.objects.filter(exercise_id__in=changed_lists).delete()
+            ExerciseInstruction.objects.filter(exercise_id__in=changed_lists).delete()
+        ExerciseSecondaryMuscle.objects.bulk_create([
+            ExerciseSecondaryMuscle(exercise_id=exercise_id, muscle=muscles[name], order=order)
+            for exercise_id, values in changed_lists.items()
+            for order, name in enumerate(values['secondary_muscles'])
+        ])
+        ExerciseInstruction.objects.bulk_create([
+            ExerciseInstruction(exercise_id=exercise_id, step=step, text=text)
+            for exercise_id, values in changed_lists.items()
+            for step, text in enumerate(values['instructions'])
+        ])
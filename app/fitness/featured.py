@@ -0,0 +1,108 @@
+import datetime
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from rest_framework.renderers import JSONRenderer
+from .catalog_cache import etag_matches
+from .models import FeaturedWorkout, Workout
+from .serializers import WorkoutSerializer
+from .utils.get_current_day import seconds_until_midnight
+
+# Long enough to cover the date in every timezone, then the entries expire
+FEATURED_CACHE_TTL = 2 * 24 * 60 * 60
+NOT_FEATURED = {'etag': None, 'content': None}
+# Days ahead schedule_featured_workouts caches the payloads of
+FEATURED_HORIZON_DAYS = 14
+
+
+def featured_key(day):
+    return f'featured-workout:{day.isoformat()}'
+
+
+def build_featured(day):
+    """The JSON bytes of the workout in the first slot of `day`, with their ETag."""
+    featured = FeaturedWorkout.objects.filter(date=day).order_by('slot').select_related('workout').prefetch_related(
+        'workout__workoutexercise_set__exercise'
+    ).first()
+    if featured is None:
+        return NOT_FEATURED
+    content = JSONRenderer().render(WorkoutSerializer(featured.workout).data)
+    return {'etag': f'"featured-{day.isoformat()}-{hashlib.sha256(content).hexdigest()[:16]}"', 'content': content}
+
+
+def featured_payload(day):
+    """
+    The featured workout payload of `day`, shared by every user through the
+    Django cache. Built by the first request of the day (or by
+    schedule_featured_workouts), then a single cache read.
+    """
+    key = featured_key(day)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_featured(day)
+        cache.set(key, payload, FEATURED_CACHE_TTL)
+    return payload
+
+
+def forget_featured(*dates):
+    """
+    Drop the cached payloads of yesterday through FEATURED_HORIZON_DAYS ahead,
+    the only dates cached, and of `dates`, after a write to the featured
+    workouts or to the workouts they embed. Needs no query, so it also works
+    once the rows are deleted. Again on commit, like fitness.caching.invalidate.
+    """
+    today = timezone.localdate()
+    days = {today + datetime.timedelta(days=offset) for offset in range(-1, FEATURED_HORIZON_DAYS)}
+    keys = [featured_key(day) for day in days | set(dates)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def featured_workout_response(request, day):
+    """
+    The workout featured on `day`, revalidated with its ETag and kept by
+    clients for at most FEATURED_WORKOUT_MAX_AGE seconds, never past midnight.
+    """
+    payload = featured_payload(day)
+    if payload['content'] is None:
+        return None
+    if etag_matches(request, payload['etag']):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload['content'], content_type='application/json')
+    response['ETag'] = payload['etag']
+    max_age = min(settings.FEATURED_WORKOUT_MAX_AGE, seconds_until_midnight(settings.TIME_ZONE))
+    # Private, as the endpoint takes authentication
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def schedule_featured_workouts(start, days, slots=1):
+    """
+    Feature a workout in every empty slot of the `days` dates from `start`,
+    picking the workouts featured least recently first. Existing rows are
+    kept, and a concurrent run cannot double book a slot. Returns the number
+    of workouts featured.
+    """
+    dates = [start + datetime.timedelta(days=offset) for offset in range(days)]
+    taken = set(FeaturedWorkout.objects.filter(date__in=dates).values_list('date', 'slot'))
+    empty = [(day, slot) for day in dates for slot in range(slots) if (day, slot) not in taken]
+    workout_ids = list(
+        Workout.objects.annotate(last_featured=Max('featuredworkout__date'))
+        .order_by(F('last_featured').asc(nulls_first=True), 'pk').values_list('pk', flat=True)
+    )
+    if not empty or not workout_ids:
+        return 0
+
+    FeaturedWorkout.objects.bulk_create([
+        FeaturedWorkout(date=day, slot=slot, workout_id=workout_ids[index % len(workout_ids)])
+        for index, (day, slot) in enumerate(empty)
+    ], ignore_conflicts=True)
+    # bulk_create skips the signals
+    forget_featured()
+    return FeaturedWorkout.objects.filter(date__in=dates).count() - len(taken)
@@ -0,0 +1,163 @@
+import random
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from .caching import ACTIVE_PROGRAMS, DIET_LOG_ITEMS, LOGGED_WORKOUTS, WORKOUT_PROGRAMS, WORKOUTS, invalidate
+from .models import (
+    ActiveWorkoutProgram, CatalogVersion, DietLogItem, Exercise, LoggedExercise, LoggedWorkout,
+    ProgramDay, Workout, WorkoutExercise, WorkoutProgram
+)
+from .rollups import rebuild_daily_stats
+from .user_manager import UserProfile
+
+LOAD_PASSWORD = 'loadtest'
+FOODS = ["Oatmeal", "Grilled Chicken Salad", "Avocado Toast", "Protein Shake", "Salmon Bowl", "Pasta", "Apple"]
+BODY_PARTS = ["back", "chest", "upper legs", "lower legs", "shoulders", "upper arms", "waist", "cardio"]
+
+
+def user_email(prefix, index):
+    return f'{prefix}-{index}@example.com'
+
+
+class LoadDataGenerator:
+    """
+    Creates a realistic volume of users and logs with bulk inserts, for
+    benchmarks and capacity tests. Every user gets `days` of diet logs and
+    workouts, a program of their own and an active program.
+
+    Bulk inserts bypass the signal handlers, so the DailyUserStats rollup of the
+    new users is rebuilt and their cached responses invalidated at the end.
+    """
+    def __init__(self, prefix='load', seed=0, batch_size=2000):
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.counts = {}
+
+    def bulk_create(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    @transaction.atomic
+    def generate(self, users=10, days=365, meals_per_day=3, workouts_per_week=4, exercises_per_workout=6, catalog_size=200):
+        exercises = self.exercises(catalog_size)
+        workouts = self.workouts(exercises, exercises_per_workout)
+        profiles = self.users(users)
+        self.programs(profiles, workouts)
+
+        for profile in profiles:
+            self.diet_logs(profile, days, meals_per_day)
+            self.workout_logs(profile, days, workouts_per_week, exercises, exercises_per_workout)
+
+        rebuild_daily_stats(user_ids=[profile.id for profile in profiles], batch_size=self.batch_size)
+        # Bulk inserts skip the signals that invalidate cached responses too
+        invalidate(WORKOUTS)
+        invalidate(WORKOUT_PROGRAMS)
+        for profile in profiles:
+            invalidate(ACTIVE_PROGRAMS, profile.id)
+            invalidate(DIET_LOG_ITEMS, profile.id)
+            invalidate(LOGGED_WORKOUTS, profile.id)
+        return self.counts
+
+    def exercises(self, catalog_size):
+        """The existing catalog, topped up with synthetic exercises to `catalog_size`."""
+        exercises = list(Exercise.objects.all()[:catalog_size])
+        missing = catalog_size - len(exercises)
+        if missing > 0:
+            exercises += self.bulk_create(Exercise, [
+                Exercise(
+                    exercise_id=f'{self.prefix}-{i}',
+                    name=f'{self.prefix} exercise {i}',
+                    body_part=self.random.choice(BODY_PARTS),
+                    equipment=self.random.choice(["barbell", "dumbbell", "body weight", "cable"]),
+                    gif_url='http://example.com/exercise.gif',
+                    target="quads",
+                    calories_burned=self.random.uniform(0.5, 3),
+                )
+                for i in range(missing)
+            ])
+            CatalogVersion.bump()
+        return exercises
+
+    def workouts(self, exercises, exercises_per_workout, count=20):
+        workouts = self.bulk_create(Workout, [
+            Workout(
+                name=f'{self.prefix} workout {i}',
+                image_url='http://example.com/workout.jpg',
+                description="Generated workout",
+                body_part=self.random.choice(BODY_PARTS),
+            )
+            for i in range(count)
+        ])
+        self.bulk_create(WorkoutExercise, [
+            WorkoutExercise(workout=workout, exercise=exercise, order=order, sets=3, reps=10)
+            for workout in workouts
+            for order, exercise in enumerate(self.random.sample(exercises, exercises_per_workout), start=1)
+        ])
+        return workouts
+
+    def users(self, count):
+        password = make_password(LOAD_PASSWORD)  # Hashing is slow, do it once
+        return self.bulk_create(UserProfile, [
+            UserProfile(email=user_email(self.prefix, i), password=password, height_cm=175, weight_kg=75, age=30)
+            for i in range(count)
+        ])
+
+    def programs(self, profiles, workouts):
+        programs = self.bulk_create(WorkoutProgram, [
+            WorkoutProgram(user=profile, name=f'{profile.email} program', description="Generated program")
+            for profile in profiles
+        ])
+        days = self.bulk_create(ProgramDay, [
+            ProgramDay(workout_program=program, workout=self.random.choice(workouts), day_of_week=day)
+            for program in programs
+            for day in range(7)
+        ])
+        schedules = {}
+        for day in days:
+            schedules.setdefault(day.workout_program_id, {})[str(day.day_of_week)] = day.workout_id
+        now = timezone.now()
+        self.bulk_create(ActiveWorkoutProgram, [
+            ActiveWorkoutProgram(
+                user=program.user, workout_program=program, start_date=now - timedelta(days=7),
+                end_date=now + timedelta(days=30), is_active=True, schedule=schedules[program.id]
+            )
+            for program in programs
+        ])
+
+    def diet_logs(self, profile, days, meals_per_day):
+        now = timezone.now()
+        self.bulk_create(DietLogItem, [
+            DietLogItem(
+                user=profile,
+                food_name=self.random.choice(FOODS),
+                food_calories=self.random.randint(100, 900),
+                protein_grams=self.random.uniform(0, 50),
+                carbs_grams=self.random.uniform(0, 100),
+                fat_grams=self.random.uniform(0, 40),
+                log_time=now - timedelta(days=day, hours=meal * 5),
+            )
+            for day in range(days)
+            for meal in range(meals_per_day)
+        ])
+
+    def workout_logs(self, profile, days, workouts_per_week, exercises, exercises_per_workout):
+        now = timezone.now()
+        logged_workouts = self.bulk_create(LoggedWorkout, [
+            LoggedWorkout(
+                user=profile, workout_name="Generated workout",
+                duration_minutes=self.random.randint(20, 90), log_time=now - timedelta(days=day, hours=2)
+            )
+            for day in range(days)
+            if self.random.random() < workouts_per_week / 7
+        ])
+        self.bulk_create(LoggedExercise, [
+            LoggedExercise(
+                logged_workout=logged_workout, exercise=exercise, order=order,
+                sets_completed=3, reps_completed=self.random.randint(5, 15), weight_used_kg=20
+            )
+            for logged_workout in logged_workouts
+            for order, exercise in enumerate(self.random.sample(exercises, exercises_per_workout), start=1)
+        ])
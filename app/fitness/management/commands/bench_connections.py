@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from fitness.benchmarks import EndpointBenchmark
+from fitness.loadgen import user_email
+from fitness.user_manager import UserProfile
+
+# Cheap endpoints, whose latency is dominated by connection handling
+DEFAULT_ENDPOINTS = ['stats.calories_burned', 'stats.number_exercises', 'workoutprograms.current_program']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare request latency with a new database connection per request, persistent "
+        "connections and, given --pooler-host, connections through PgBouncer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to benchmark as. Defaults to the first generated user.")
+        parser.add_argument('--prefix', default='load', help="Prefix the load data was generated with.")
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--only', action='append', help="Endpoints to run, by name (can be repeated).")
+        parser.add_argument('--conn-max-age', type=int, default=60, help="CONN_MAX_AGE of the persistent modes.")
+        parser.add_argument('--pooler-host', help="Host of the PgBouncer in front of the database.")
+        parser.add_argument('--pooler-port', default='5432')
+
+    def modes(self, options):
+        persistent = {'CONN_MAX_AGE': options['conn_max_age'], 'CONN_HEALTH_CHECKS': True}
+        modes = [
+            ('direct, per request', {'CONN_MAX_AGE': 0}),
+            ('direct, persistent', persistent),
+        ]
+        if options['pooler_host']:
+            pooler = {'HOST': options['pooler_host'], 'PORT': options['pooler_port'], 'DISABLE_SERVER_SIDE_CURSORS': True}
+            modes += [
+                ('pooled, per request', {**pooler, 'CONN_MAX_AGE': 0}),
+                ('pooled, persistent', {**pooler, **persistent}),
+            ]
+        return modes
+
+    def reconnect(self, original, overrides):
+        """Close the connection, so the next query connects with the settings of the mode."""
+        connection.close()
+        connection.settings_dict.clear()
+        connection.settings_dict.update({**original, **overrides})
+
+    def handle(self, *args, **options):
+        email = options['user'] or user_email(options['prefix'], 0)
+        user = UserProfile.objects.filter(email=email).first()
+        if user is None:
+            raise CommandError(f"No user {email}. Run generate_load_data first.")
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f"Benchmarking {connection.vendor}; connection setup only matters against Postgres (SQL_ENGINE)."
+            ))
+
+        original = dict(connection.settings_dict)
+        results = {}
+        try:
+            for name, overrides in self.modes(options):
+                self.reconnect(original, overrides)
+                benchmark = EndpointBenchmark(user, iterations=options['iterations'], close_connections=True)
+                results[name] = benchmark.run(only=options['only'] or DEFAULT_ENDPOINTS)
+        finally:
+            self.reconnect(original, {})
+
+        self.stdout.write(f"{'mode':<22} {'endpoint':<36} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, endpoints in results.items():
+            for endpoint, result in endpoints.items():
+                self.stdout.write(f"{name:<22} {endpoint:<36} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}")
+
+        direct = results['direct, per request']
+        for name, endpoints in list(results.items())[1:]:
+            speedups = [direct[endpoint]['p50_ms'] / max(result['p50_ms'], 0.01) for endpoint, result in endpoints.items()]
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: p50 {sum(speedups) / len(speedups):.2f}x faster than a connection per request"
+            ))
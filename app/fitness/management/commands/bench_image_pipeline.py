@@ -0,0 +1,81 @@
+import base64
+import statistics
+import tempfile
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+from django.core.management.base import BaseCommand
+from PIL import Image
+from fitness.utils.image_pipeline import SCAN_SIZE, image_data_url, prepare_scan_image
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+def legacy_payload(image_file):
+    """The pre-pipeline scan preprocessing: full decode, default resize, PNG and base64."""
+    image = Image.open(image_file)
+    image = image.resize(SCAN_SIZE)
+    buffered = BytesIO()
+    image.save(buffered, format="PNG")
+    return f'data:image/png;base64,{base64.b64encode(buffered.getvalue()).decode("utf-8")}'
+
+
+def pipeline_payload(image_file):
+    return image_data_url(prepare_scan_image(image_file))
+
+
+def decoded_size(image_file, draft):
+    """Bytes of the pixel buffer an image is decoded into, read from its header."""
+    image = Image.open(image_file)
+    if draft and image.format == 'JPEG':
+        image.draft('RGB', (max(SCAN_SIZE), max(SCAN_SIZE)))
+    return image.width * image.height * len(image.getbands())
+
+
+class Command(BaseCommand):
+    help = "Compare memory use and latency of the food scan image preprocessing over a corpus of images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corpus', help="Directory of sample images. Synthetic 12 MP photos are used if omitted.")
+        parser.add_argument('--count', type=int, default=5, help="Number of synthetic images to generate.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            corpus = Path(options['corpus']) if options['corpus'] else self.synthetic_corpus(Path(tmp), options['count'])
+            paths = sorted(path for path in corpus.iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+            if not paths:
+                self.stderr.write(f"No images found in {corpus}")
+                return
+
+            self.stdout.write(f"{len(paths)} images from {corpus}")
+            for name, preprocess in (('legacy', legacy_payload), ('pipeline', pipeline_payload)):
+                self.report(name, preprocess, paths, draft=preprocess is pipeline_payload)
+
+    def synthetic_corpus(self, directory, count):
+        for i in range(count):
+            # Noise compresses poorly, like a real photo
+            bands = [Image.effect_noise((4032, 3024), 40 + 10 * band + i) for band in range(3)]
+            Image.merge('RGB', bands).save(directory / f'sample_{i}.jpg', quality=90)
+        return directory
+
+    def report(self, name, preprocess, paths, draft):
+        latencies, peaks, decoded, payloads = [], [], [], []
+        for path in paths:
+            with open(path, 'rb') as image_file:
+                tracemalloc.start()
+                started = time.perf_counter()
+                payload = preprocess(image_file)
+                latencies.append((time.perf_counter() - started) * 1000)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                image_file.seek(0)
+                decoded.append(decoded_size(image_file, draft))
+            payloads.append(len(payload))
+
+        self.stdout.write(
+            f"{name:>8}: latency p50 {statistics.median(latencies):7.1f} ms, max {max(latencies):7.1f} ms | "
+            f"decoded pixels {max(decoded) / 2 ** 20:6.1f} MiB | "
+            f"python peak {max(peaks) / 2 ** 10:7.1f} KiB | "
+            f"payload {statistics.mean(payloads) / 2 ** 10:6.1f} KiB"
+        )
@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from fitness.loadgen import LOAD_PASSWORD, LoadDataGenerator, user_email
+
+
+class Command(BaseCommand):
+    help = "Generate users with months or years of diet and workout logs, programs and active programs, for load tests."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--days', type=int, default=365, help="Days of history per user.")
+        parser.add_argument('--meals-per-day', type=int, default=3)
+        parser.add_argument('--workouts-per-week', type=int, default=4)
+        parser.add_argument('--catalog-size', type=int, default=200,
+                            help="Exercises to use; synthetic ones are added when the catalog is smaller.")
+        parser.add_argument('--prefix', default='load', help="Prefix of the generated emails and names.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        generator = LoadDataGenerator(prefix=options['prefix'], seed=options['seed'], batch_size=options['batch_size'])
+        started = time.perf_counter()
+        try:
+            counts = generator.generate(
+                users=options['users'],
+                days=options['days'],
+                meals_per_day=options['meals_per_day'],
+                workouts_per_week=options['workouts_per_week'],
+                catalog_size=options['catalog_size'],
+            )
+        except IntegrityError as e:
+            raise CommandError(f"{e}. Use another --prefix to generate more users.")
+        elapsed = time.perf_counter() - started
+
+        for model, count in counts.items():
+            self.stdout.write(f"{model:>22}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['users']} users in {elapsed:.2f}s. "
+            f"Log in as {user_email(options['prefix'], 0)} with password '{LOAD_PASSWORD}'."
+        ))
@@ -0,0 +1,38 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from fitness.catalog_import import CatalogImporter, iter_json_array
+
+
+class Command(BaseCommand):
+    help = "Create or update exercises from a JSON array of catalog rows, such as fitness_server/seed_exercise.json."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON file with the catalog rows.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help="Report the changes without writing them.")
+        parser.add_argument('--show-changes', action='store_true', help="List every created or updated exercise.")
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding='utf-8') as catalog_file:
+                counts = importer.run(iter_json_array(catalog_file))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        elapsed = time.perf_counter() - started
+
+        if options['show_changes']:
+            for exercise_id, status, fields in importer.changes:
+                self.stdout.write(f"{status:>8} {exercise_id}: {', '.join(fields)}")
+        for number, errors in importer.errors:
+            self.stderr.write(f"Row {number} skipped: {json.dumps(errors)}")
+
+        total = sum(counts.values())
+        summary = (
+            f"{'Would import' if options['dry_run'] else 'Imported'} {total} rows in {elapsed:.2f}s "
+            f"({total / elapsed if elapsed else 0:.0f} rows/s): {counts['created']} created, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged, {counts['invalid']} invalid"
+        )
+        self.stdout.write(self.style.WARNING(summary) if counts['invalid'] else self.style.SUCCESS(summary))
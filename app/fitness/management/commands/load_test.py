@@ -0,0 +1,176 @@
+import io
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from PIL import Image
+from fitness.benchmarks import percentile
+from fitness.loadgen import LOAD_PASSWORD, user_email
+
+
+def multipart(fields, files):
+    """A multipart/form-data body and its content type."""
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files.items():
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        body.write(content + b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def meal_photo(seed):
+    buffered = io.BytesIO()
+    Image.new('RGB', (640, 480), (seed % 256, 120, 40)).save(buffered, format='JPEG')
+    return buffered.getvalue()
+
+
+class LoadTest:
+    """
+    Drives a running server with a mix of food scans and CRUD requests from
+    `concurrency` clients for `duration` seconds, recording the latency of
+    every request by kind.
+    """
+    def __init__(self, url, token, concurrency, duration, scan_share, wait, use_async, timeout=60):
+        self.url = url.rstrip('/') + '/api/v1'
+        self.token = token
+        self.concurrency = concurrency
+        self.duration = duration
+        self.scan_share = scan_share
+        self.wait = wait
+        self.use_async = use_async
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+
+    def request(self, method, path, body=None, content_type='application/json'):
+        request = Request(self.url + path, data=body, method=method, headers={'Authorization': f'Token {self.token}'})
+        if body is not None:
+            request.add_header('Content-Type', content_type)
+        with urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read() or b'null')
+
+    def scan(self, random_):
+        body, content_type = multipart({}, {'image': ('meal.jpg', meal_photo(random_.randrange(1 << 16)))})
+        if self.use_async:
+            self.request('POST', f'/async/dietlogitems/scan/?wait={self.wait}', body, content_type)
+        else:
+            job = self.request('POST', '/dietlogitems/scan/', body, content_type)
+            self.request('GET', f"/dietlogitems/scan/{job['job_id']}/?wait={self.wait}")
+
+    def log_meal(self, random_):
+        fields = {
+            'food_name': "Oatmeal", 'food_calories': random_.randint(100, 900), 'protein_grams': 10,
+            'carbs_grams': 50, 'fat_grams': 5, 'log_time': timezone.now().isoformat(),
+        }
+        if self.use_async:
+            body, content_type = multipart(fields, {})
+            self.request('POST', '/async/dietlogitems/', body, content_type)
+        else:
+            self.request('POST', '/dietlogitems/', json.dumps(fields).encode())
+
+    def crud(self, random_):
+        kind = random_.choice(['list_meals', 'log_meal', 'stats', 'workouts'])
+        if kind == 'log_meal':
+            self.log_meal(random_)
+        else:
+            self.request('GET', {
+                'list_meals': '/dietlogitems/',
+                'stats': '/stats/calories_eaten/',
+                'workouts': '/workouts/',
+            }[kind])
+        return kind
+
+    def client(self, seed):
+        random_ = random.Random(seed)
+        deadline = time.monotonic() + self.duration
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            kind = 'scan'
+            try:
+                if random_.random() < self.scan_share:
+                    self.scan(random_)
+                else:
+                    kind = self.crud(random_)
+            except (HTTPError, URLError, TimeoutError) as e:
+                with self.lock:
+                    self.errors[str(e)] = self.errors.get(str(e), 0) + 1
+                continue
+            with self.lock:
+                self.latencies.setdefault(kind, []).append((time.perf_counter() - started) * 1000)
+
+    def run(self):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self.client, range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            kind: {
+                'requests': len(samples),
+                'per_second': round(len(samples) / elapsed, 2),
+                'p50_ms': round(statistics.median(samples), 2),
+                'p99_ms': round(percentile(samples, 0.99), 2),
+            }
+            for kind, samples in sorted(self.latencies.items())
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a running server with mixed food scan and CRUD traffic and report the throughput. "
+        "Compare SERVER_MODE=wsgi with SERVER_MODE=asgi --async, with the stub scanner "
+        "(FOOD_SCANNER=fitness.utils.stub_food_scanner.StubFoodScanner, FOOD_SCANNER_STUB_DELAY=2)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000')
+        parser.add_argument('--email', help="User to log in as. Defaults to the first generated load user.")
+        parser.add_argument('--password', default=LOAD_PASSWORD)
+        parser.add_argument('--concurrency', type=int, default=32, help="Concurrent clients.")
+        parser.add_argument('--duration', type=float, default=30, help="In seconds.")
+        parser.add_argument('--scan-share', type=float, default=0.2, help="Share of the requests that are food scans.")
+        parser.add_argument('--wait', type=float, default=10, help="Seconds a scan request waits for its result.")
+        parser.add_argument('--async', action='store_true', dest='use_async',
+                            help="Scan and log meals through the async endpoints.")
+
+    def handle(self, *args, **options):
+        email = options['email'] or user_email('load', 0)
+        login = Request(
+            options['url'].rstrip('/') + '/api/v1/login/',
+            data=json.dumps({'email': email, 'password': options['password']}).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urlopen(login, timeout=10) as response:
+                token = json.loads(response.read())['token']
+        except (HTTPError, URLError) as e:
+            raise CommandError(f"Could not log in as {email} at {options['url']}: {e}")
+
+        load_test = LoadTest(
+            options['url'], token, options['concurrency'], options['duration'], options['scan_share'],
+            options['wait'], options['use_async'],
+        )
+        results = load_test.run()
+
+        self.stdout.write(f"{'kind':<12} {'requests':>9} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+        for kind, result in results.items():
+            self.stdout.write(
+                f"{kind:<12} {result['requests']:>9} {result['per_second']:>8.2f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+            )
+        for error, count in load_test.errors.items():
+            self.stdout.write(self.style.ERROR(f"{count} x {error}"))
+        total = sum(result['per_second'] for result in results.values())
+        self.stdout.write(self.style.SUCCESS(f"{total:.2f} requests/s in total"))
@@ -0,0 +1,18 @@
+import time
+from django.core.management.base import BaseCommand
+from fitness.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyUserStats rollup table from the raw diet and workout logs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only rebuild the rows of this user id (can be repeated).")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_daily_stats(user_ids=options['user_ids'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} daily stats rows in {elapsed:.2f}s"))
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from fitness.benchmarks import EndpointBenchmark, compare, load_baseline
+from fitness.loadgen import user_email
+from fitness.user_manager import UserProfile
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API endpoints against generated load data and compare them with the committed baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to benchmark as. Defaults to the first generated user.")
+        parser.add_argument('--prefix', default='load', help="Prefix the load data was generated with.")
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--only', action='append', help="Only run endpoints whose name contains this (can be repeated).")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help="Allowed p50 slowdown against the baseline, as a factor.")
+        parser.add_argument('--slack-ms', type=float, default=2,
+                            help="Allowed p50 slowdown in milliseconds on top of the factor, for very fast endpoints.")
+        parser.add_argument('--no-token-cache', action='store_true',
+                            help="Load the token and user from the database on every request, to measure the token cache.")
+        parser.add_argument('--update-baseline', action='store_true', help="Write the results as the new baseline.")
+
+    def handle(self, *args, **options):
+        email = options['user'] or user_email(options['prefix'], 0)
+        user = UserProfile.objects.filter(email=email).first()
+        if user is None:
+            raise CommandError(f"No user {email}. Run generate_load_data first.")
+
+        results = EndpointBenchmark(
+            user, iterations=options['iterations'], token_cache=not options['no_token_cache']
+        ).run(only=options['only'])
+        baseline = load_baseline(options['baseline'])
+
+        self.stdout.write(f"{'endpoint':<40} {'p50 ms':>8} {'p99 ms':>8} {'queries':>8} {'baseline p50/queries':>22}")
+        for name, result in results.items():
+            expected = baseline.get('endpoints', {}).get(name)
+            reference = f"{expected['p50_ms']:.2f} / {expected['queries']}" if expected else '-'
+            self.stdout.write(
+                f"{name:<40} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['queries']:>8} {reference:>22}"
+            )
+
+        if options['update_baseline']:
+            data = {
+                'dataset': {
+                    'user': email,
+                    'diet_log_items': user.dietlogitem_set.count(),
+                    'logged_workouts': user.loggedworkout_set.count(),
+                    'database': settings.DATABASES['default']['ENGINE'],
+                },
+                'iterations': options['iterations'],
+                'endpoints': {**baseline.get('endpoints', {}), **results},
+            }
+            Path(options['baseline']).parent.mkdir(parents=True, exist_ok=True)
+            Path(options['baseline']).write_text(json.dumps(data, indent=2) + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote baseline {options['baseline']}"))
+            return
+
+        regressions = compare(results, baseline, options['tolerance'], options['slack_ms'])
+        for name, message in regressions:
+            self.stdout.write(self.style.ERROR(f"Regression in {name}: {message}"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
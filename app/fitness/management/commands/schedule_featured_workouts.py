@@ -0,0 +1,23 @@
+import datetime
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from fitness.featured import FEATURED_HORIZON_DAYS, featured_payload, schedule_featured_workouts
+
+
+class Command(BaseCommand):
+    help = (
+        "Feature a workout on each of the upcoming days that has none, and cache the featured "
+        "payloads. Run daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="Days to schedule, from today.")
+        parser.add_argument('--slots', type=int, default=1, help="Workouts to feature per day.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        count = schedule_featured_workouts(today, options['days'], options['slots'])
+        # Later dates are cached by their first request
+        for offset in range(min(options['days'], FEATURED_HORIZON_DAYS)):
+            featured_payload(today + datetime.timedelta(days=offset))
+        self.stdout.write(self.style.SUCCESS(f"Featured {count} workouts over the next {options['days']} days"))
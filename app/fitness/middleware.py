@@ -0,0 +1,99 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from .profiling import RequestProfile, current_profile, histograms
+
+SERVER_TIMING_SPANS = ('sql', 'serialize', 'auth', 'external')
+
+# cProfile cannot profile two threads' requests at once
+profiler_lock = threading.Lock()
+
+
+class ProfilingMiddleware:
+    """
+    Records where the time of every request goes: SQL time and query count
+    (see fitness.profiling.record_sql), serializer output, authentication and
+    external (OpenAI) calls.
+
+    Adds a Server-Timing header, aggregates a latency histogram per URL name
+    (see fitness.profiling.histograms) and, for a PROFILING_SAMPLE_RATE share
+    of requests, runs cProfile and dumps the stats of those slower than
+    PROFILING_SLOW_MS to PROFILING_DUMP_DIR.
+
+    Runs natively under ASGI too, so async views are not pushed onto a
+    thread; cProfile is only sampled under WSGI, as it profiles one thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        profiler = self.sampled_profiler()
+        try:
+            if profiler:
+                try:
+                    with profiler:
+                        response = self.get_response(request)
+                finally:
+                    profiler_lock.release()
+            else:
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+
+        profile = RequestProfile()
+        token = current_profile.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        return self.finish(request, response, profile, None)
+
+    def finish(self, request, response, profile, profiler):
+        elapsed = time.perf_counter() - profile.started
+        url_name = request.resolver_match.view_name if request.resolver_match else 'unresolved'
+        histograms.record(url_name, elapsed, profile.spans)
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(profile, elapsed)
+        if profiler and elapsed * 1000 >= settings.PROFILING_SLOW_MS:
+            self.dump(profiler, url_name, elapsed)
+        return response
+
+    def sampled_profiler(self):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE or not profiler_lock.acquire(blocking=False):
+            return None
+        return cProfile.Profile()
+
+    def server_timing(self, profile, elapsed):
+        metrics = []
+        for name in SERVER_TIMING_SPANS:
+            if name in profile.spans:
+                seconds, count = profile.spans[name]
+                metrics.append(f'{name};dur={seconds * 1000:.2f};desc="{count} calls"')
+        metrics.append(f'total;dur={elapsed * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def dump(self, profiler, url_name, elapsed):
+        os.makedirs(settings.PROFILING_DUMP_DIR, exist_ok=True)
+        filename = f"{url_name.replace(':', '_')}-{time.strftime('%Y%m%d-%H%M%S')}-{elapsed * 1000:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(settings.PROFILING_DUMP_DIR, filename))
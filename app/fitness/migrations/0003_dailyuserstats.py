@@ -0,0 +1,57 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_daily_stats(apps, schema_editor):
+    DailyUserStats = apps.get_model('fitness', 'DailyUserStats')
+    DietLogItem = apps.get_model('fitness', 'DietLogItem')
+    LoggedExercise = apps.get_model('fitness', 'LoggedExercise')
+
+    rows = {}
+    for log in DietLogItem.objects.values('user_id', 'log_time__date').annotate(total=models.Sum('food_calories')):
+        key = (log['user_id'], log['log_time__date'])
+        rows.setdefault(key, DailyUserStats(user_id=key[0], date=key[1])).calories_eaten = log['total']
+
+    calories_burned = models.ExpressionWrapper(
+        models.F('sets_completed') * models.F('reps_completed') * models.F('exercise__calories_burned'),
+        output_field=models.FloatField()
+    )
+    exercise_logs = LoggedExercise.objects.values('logged_workout__user_id', 'logged_workout__log_time__date').annotate(
+        calories_burned=models.Sum(calories_burned), exercises_logged=models.Count('id')
+    )
+    for log in exercise_logs:
+        key = (log['logged_workout__user_id'], log['logged_workout__log_time__date'])
+        stats = rows.setdefault(key, DailyUserStats(user_id=key[0], date=key[1]))
+        stats.calories_burned = log['calories_burned'] or 0
+        stats.exercises_logged = log['exercises_logged']
+
+    DailyUserStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0002_alter_exercise_calories_burned'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calories_eaten', models.IntegerField(default=0)),
+                ('calories_burned', models.FloatField(default=0)),
+                ('exercises_logged', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyuserstats',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='unique_daily_user_stats'),
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0003_dailyuserstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dietlogitem',
+            index=models.Index(fields=['user', 'log_time'], name='dietlogitem_user_logtime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loggedworkout',
+            index=models.Index(fields=['user', 'log_time'], name='loggedworkout_user_logtime_idx'),
+        ),
+    ]
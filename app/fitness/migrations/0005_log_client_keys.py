@@ -0,0 +1,31 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0004_log_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dietlogitem',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='loggedworkout',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='dietlogitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_key__isnull', False)), fields=('user', 'client_key'), name='unique_dietlogitem_client_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='loggedworkout',
+            constraint=models.UniqueConstraint(condition=models.Q(('client_key__isnull', False)), fields=('user', 'client_key'), name='unique_loggedworkout_client_key'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0006_foodscanjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodScanCacheEntry',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('result', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('hits', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
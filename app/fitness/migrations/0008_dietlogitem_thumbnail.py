@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0007_foodscancacheentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dietlogitem',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='diet_log_thumbnails/'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:39
+
+from django.db import migrations, models
+
+# Trigram indexes matching the UPPER("name"::text) LIKE ... that Django generates
+# for icontains/istartswith on Postgres. Other databases skip them.
+TRIGRAM_INDEXES = {
+    'fitness_exercise_name_trgm_idx': 'fitness_exercise',
+    'fitness_workout_name_trgm_idx': 'fitness_workout',
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index, table in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin (UPPER(name::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0009_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exercise',
+            name='body_part',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='equipment',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='target',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='workout',
+            name='body_part',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='workout',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,125 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split(value):
+    return value.split(';') if value else []
+
+
+def split_exercise_lists(apps, schema_editor):
+    Exercise = apps.get_model('fitness', 'Exercise')
+    ExerciseInstruction = apps.get_model('fitness', 'ExerciseInstruction')
+    ExerciseSecondaryMuscle = apps.get_model('fitness', 'ExerciseSecondaryMuscle')
+    Muscle = apps.get_model('fitness', 'Muscle')
+
+    exercises = list(Exercise.objects.values_list('exercise_id', 'secondary_muscles', 'instructions'))
+    names = {name for _, muscles, _ in exercises for name in split(muscles)}
+    Muscle.objects.bulk_create([Muscle(name=name) for name in names], ignore_conflicts=True)
+    muscle_ids = dict(Muscle.objects.values_list('name', 'id'))
+
+    links, steps = [], []
+    for exercise_id, muscles, instructions in exercises:
+        for order, name in enumerate(dict.fromkeys(split(muscles))):
+            links.append(ExerciseSecondaryMuscle(exercise_id=exercise_id, muscle_id=muscle_ids[name], order=order))
+        for step, text in enumerate(split(instructions)):
+            steps.append(ExerciseInstruction(exercise_id=exercise_id, step=step, text=text))
+    ExerciseSecondaryMuscle.objects.bulk_create(links, batch_size=1000)
+    ExerciseInstruction.objects.bulk_create(steps, batch_size=1000)
+
+
+def join_exercise_lists(apps, schema_editor):
+    Exercise = apps.get_model('fitness', 'Exercise')
+    ExerciseInstruction = apps.get_model('fitness', 'ExerciseInstruction')
+    ExerciseSecondaryMuscle = apps.get_model('fitness', 'ExerciseSecondaryMuscle')
+
+    muscles, instructions = {}, {}
+    for exercise_id, name in ExerciseSecondaryMuscle.objects.order_by('order').values_list('exercise_id', 'muscle__name'):
+        muscles.setdefault(exercise_id, []).append(name)
+    for exercise_id, text in ExerciseInstruction.objects.order_by('step').values_list('exercise_id', 'text'):
+        instructions.setdefault(exercise_id, []).append(text)
+
+    exercises = list(Exercise.objects.all())
+    for exercise in exercises:
+        exercise.secondary_muscles = ';'.join(muscles.get(exercise.pk, []))
+        exercise.instructions = ';'.join(instructions.get(exercise.pk, []))
+    Exercise.objects.bulk_update(exercises, ['secondary_muscles', 'instructions'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0010_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Muscle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExerciseSecondaryMuscle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveSmallIntegerField()),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='secondary_muscle_links', to='fitness.exercise')),
+                ('muscle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_links', to='fitness.muscle')),
+            ],
+            options={
+                'ordering': ['order'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ExerciseInstruction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.PositiveSmallIntegerField()),
+                ('text', models.TextField()),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='instruction_steps', to='fitness.exercise')),
+            ],
+            options={
+                'ordering': ['step'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='exercisesecondarymuscle',
+            index=models.Index(fields=['muscle', 'exercise'], name='exercisemuscle_muscle_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='exercisesecondarymuscle',
+            constraint=models.UniqueConstraint(fields=('exercise', 'muscle'), name='unique_exercise_secondary_muscle'),
+        ),
+        migrations.AddConstraint(
+            model_name='exerciseinstruction',
+            constraint=models.UniqueConstraint(fields=('exercise', 'step'), name='unique_exercise_instruction_step'),
+        ),
+        # A default lets the text columns be re-added when this migration is reversed
+        migrations.AlterField(
+            model_name='exercise',
+            name='instructions',
+            field=models.TextField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='secondary_muscles',
+            field=models.TextField(default=''),
+        ),
+        migrations.RunPython(split_exercise_lists, join_exercise_lists),
+        migrations.RemoveField(
+            model_name='exercise',
+            name='instructions',
+        ),
+        migrations.RemoveField(
+            model_name='exercise',
+            name='secondary_muscles',
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='secondary_muscles',
+            field=models.ManyToManyField(related_name='exercises', through='fitness.ExerciseSecondaryMuscle', to='fitness.muscle'),
+        ),
+    ]
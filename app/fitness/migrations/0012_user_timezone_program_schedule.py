@@ -0,0 +1,40 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:07
+
+from django.db import migrations, models
+import fitness.user_manager
+
+
+def fill_schedules(apps, schema_editor):
+    ActiveWorkoutProgram = apps.get_model('fitness', 'ActiveWorkoutProgram')
+    ProgramDay = apps.get_model('fitness', 'ProgramDay')
+
+    schedules = {}
+    for program_id, day_of_week, workout_id in ProgramDay.objects.order_by('pk').values_list(
+        'workout_program_id', 'day_of_week', 'workout_id'
+    ):
+        schedules.setdefault(program_id, {}).setdefault(str(day_of_week), workout_id)
+    active_programs = list(ActiveWorkoutProgram.objects.all())
+    for active_program in active_programs:
+        active_program.schedule = schedules.get(active_program.workout_program_id, {})
+    ActiveWorkoutProgram.objects.bulk_update(active_programs, ['schedule'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0011_exercise_relations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activeworkoutprogram',
+            name='schedule',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='timezone',
+            field=models.CharField(default='Asia/Dubai', max_length=64, validators=[fitness.user_manager.validate_timezone]),
+        ),
+        migrations.RunPython(fill_schedules, migrations.RunPython.noop),
+    ]
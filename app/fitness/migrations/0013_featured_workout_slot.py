@@ -0,0 +1,36 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:11
+
+from django.db import migrations, models
+
+
+def number_slots(apps, schema_editor):
+    """Give the workouts already featured on the same date their own slots, in creation order."""
+    FeaturedWorkout = apps.get_model('fitness', 'FeaturedWorkout')
+    slots = {}
+    changed = []
+    for featured in FeaturedWorkout.objects.order_by('date', 'pk').only('pk', 'date'):
+        featured.slot = slots.get(featured.date, 0)
+        slots[featured.date] = featured.slot + 1
+        if featured.slot:
+            changed.append(featured)
+    FeaturedWorkout.objects.bulk_update(changed, ['slot'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0012_user_timezone_program_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='featuredworkout',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.RunPython(number_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='featuredworkout',
+            constraint=models.UniqueConstraint(fields=('date', 'slot'), name='unique_featured_workout_slot'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:14
+
+from django.db import migrations, models
+
+
+def deactivate_duplicates(apps, schema_editor):
+    """
+    Keep one active program per user, the latest started like
+    current_program and todays_workout read, and deactivate the others.
+    """
+    ActiveWorkoutProgram = apps.get_model('fitness', 'ActiveWorkoutProgram')
+    kept = set()
+    duplicates = []
+    for active in ActiveWorkoutProgram.objects.filter(is_active=True).order_by('user_id', '-start_date', '-pk').values('pk', 'user_id'):
+        if active['user_id'] in kept:
+            duplicates.append(active['pk'])
+        kept.add(active['user_id'])
+    for start in range(0, len(duplicates), 1000):
+        ActiveWorkoutProgram.objects.filter(pk__in=duplicates[start:start + 1000]).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0013_featured_workout_slot'),
+    ]
+
+    operations = [
+        migrations.RunPython(deactivate_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='activeworkoutprogram',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('user',), name='unique_active_workout_program'),
+        ),
+    ]
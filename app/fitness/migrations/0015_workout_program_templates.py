@@ -0,0 +1,28 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0014_one_active_program_per_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workoutprogram',
+            name='is_template',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='workoutprogram',
+            name='source_workout',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='program_templates', to='fitness.workout'),
+        ),
+        migrations.AddConstraint(
+            model_name='workoutprogram',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_template', True)), fields=('source_workout',), name='unique_workout_program_template'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:29
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0015_workout_program_templates'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exercise',
+            name='body_part',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='equipment',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='target',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='workout',
+            name='body_part',
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(django.db.models.functions.text.Upper('body_part'), name='exercise_body_part_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(django.db.models.functions.text.Upper('equipment'), name='exercise_equipment_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(django.db.models.functions.text.Upper('target'), name='exercise_target_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(django.db.models.functions.text.Upper('body_part'), name='workout_body_part_upper_idx'),
+        ),
+    ]
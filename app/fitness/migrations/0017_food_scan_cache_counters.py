@@ -0,0 +1,26 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+def create_counters(apps, schema_editor):
+    FoodScanCacheCounter = apps.get_model('fitness', 'FoodScanCacheCounter')
+    FoodScanCacheCounter.objects.bulk_create([FoodScanCacheCounter(name=name) for name in ('hits', 'misses')])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0016_facet_upper_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodScanCacheCounter',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counters, migrations.RunPython.noop),
+    ]
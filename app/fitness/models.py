@@ -1,5 +1,9 @@
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Upper
 from django.utils import timezone
 from .user_manager import UserProfile
 
@@ -7,55 +11,235 @@ class DietLogItem(models.Model):
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
     food_name = models.TextField()
     image = models.ImageField(upload_to='diet_log_images/', null=True, blank=True)  # Image field for uploads
+    thumbnail = models.ImageField(upload_to='diet_log_thumbnails/', null=True, blank=True)  # Generated from image
     food_calories = models.IntegerField()
     protein_grams = models.FloatField()
     carbs_grams = models.FloatField()
     fat_grams = models.FloatField()
     log_time = models.DateTimeField()
+    client_key = models.CharField(max_length=64, null=True, blank=True)  # Idempotency key set by offline clients
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'log_time'], name='dietlogitem_user_logtime_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_key'],
+                condition=models.Q(client_key__isnull=False),
+                name='unique_dietlogitem_client_key'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.log_time}"
 
 
 
+class FoodScanJob(models.Model):
+    """
+    A food image scan queued by DietLogItemViewSet.scan and processed in the background.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, default=PENDING, choices=[
+        (PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')
+    ])
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def __str__(self):
+        return f"{self.user} - {self.status}"
+
+
+class FoodScanCacheEntry(models.Model):
+    """
+    A cached food scan result, keyed by the SHA-256 of the normalized image pixels.
+    Stored in the database so every worker process shares it; see FoodScanCache.
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+    hits = models.IntegerField(default=0)
+
+
+class FoodScanCacheCounter(models.Model):
+    """A hit or miss counter of FoodScanCache, shared by every worker process like the entries."""
+    name = models.CharField(max_length=32, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+
 class Exercise(models.Model):
     body_part = models.CharField(max_length=100)
     equipment = models.CharField(max_length=100)
     gif_url = models.URLField(max_length=200)
     exercise_id = models.CharField(max_length=100, unique=True, primary_key=True)
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     target = models.CharField(max_length=100)
     calories_burned = models.FloatField(default=200)
-    
-    # Store list data as semicolon-separated strings
-    secondary_muscles = models.TextField()
-    instructions = models.TextField()
+    secondary_muscles = models.ManyToManyField('Muscle', through='ExerciseSecondaryMuscle', related_name='exercises')
+
+    class Meta:
+        indexes = [
+            # The facet filters are __iexact, i.e. UPPER(column) = UPPER(value)
+            models.Index(Upper('body_part'), name='exercise_body_part_upper_idx'),
+            models.Index(Upper('equipment'), name='exercise_equipment_upper_idx'),
+            models.Index(Upper('target'), name='exercise_target_upper_idx'),
+        ]
 
+    # The list setters replace the rows in bulk, so they bump the catalog version
+    # themselves. The exercise must already be saved.
     def set_secondary_muscles(self, muscles_list):
-        self.secondary_muscles = ';'.join(muscles_list)
+        names = list(dict.fromkeys(muscles_list))
+        muscles = Muscle.get_or_create_all(names)
+        with rewriting_catalog_lists():
+            self.secondary_muscle_links.all().delete()
+        ExerciseSecondaryMuscle.objects.bulk_create(
+            ExerciseSecondaryMuscle(exercise=self, muscle=muscles[name], order=order) for order, name in enumerate(names)
+        )
+        CatalogVersion.bump()
 
     def get_secondary_muscles(self):
-        return self.secondary_muscles.split(';') if self.secondary_muscles else []
+        # Prefetch with exercise_list_prefetches() when serializing many exercises
+        return [link.muscle.name for link in self.secondary_muscle_links.all()]
 
     def set_instructions(self, instructions_list):
-        self.instructions = ';'.join(instructions_list)
+        with rewriting_catalog_lists():
+            self.instruction_steps.all().delete()
+        ExerciseInstruction.objects.bulk_create(
+            ExerciseInstruction(exercise=self, step=step, text=text) for step, text in enumerate(instructions_list)
+        )
+        CatalogVersion.bump()
 
     def get_instructions(self):
-        return self.instructions.split(';') if self.instructions else []
-    
+        return [instruction.text for instruction in self.instruction_steps.all()]
+
     def __str__(self):
         return self.name
 
+class Muscle(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    @classmethod
+    def get_or_create_all(cls, names):
+        """Muscles by name, creating the missing ones in one query."""
+        cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+        return cls.objects.in_bulk(names, field_name='name')
+
+    def __str__(self):
+        return self.name
+
+class ExerciseSecondaryMuscle(models.Model):
+    exercise = models.ForeignKey(Exercise, related_name='secondary_muscle_links', on_delete=models.CASCADE)
+    muscle = models.ForeignKey(Muscle, related_name='exercise_links', on_delete=models.CASCADE)
+    order = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['order']
+        constraints = [
+            models.UniqueConstraint(fields=['exercise', 'muscle'], name='unique_exercise_secondary_muscle'),
+        ]
+        indexes = [
+            # Serves "exercises that hit this muscle" without touching the exercise rows
+            models.Index(fields=['muscle', 'exercise'], name='exercisemuscle_muscle_idx'),
+        ]
+
+class ExerciseInstruction(models.Model):
+    exercise = models.ForeignKey(Exercise, related_name='instruction_steps', on_delete=models.CASCADE)
+    step = models.PositiveSmallIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ['step']
+        constraints = [
+            models.UniqueConstraint(fields=['exercise', 'step'], name='unique_exercise_instruction_step'),
+        ]
+
+def exercise_list_prefetches():
+    """
+    Prefetches that load the secondary muscles and instructions of many
+    Exercises in two queries, for ExerciseSerializer.
+    """
+    return [
+        models.Prefetch('secondary_muscle_links', queryset=ExerciseSecondaryMuscle.objects.select_related('muscle')),
+        'instruction_steps',
+    ]
+
+# Set while the muscle and instruction rows of exercises are rewritten, see rewriting_catalog_lists
+rewriting_catalog = ContextVar('rewriting_catalog', default=False)
+
+
+@contextmanager
+def rewriting_catalog_lists():
+    """
+    Around a bulk rewrite of exercise muscle and instruction rows, whose
+    deletes then leave the catalog version alone: the writer bumps it once
+    instead of once per row. Reset even if the rewrite fails.
+    """
+    token = rewriting_catalog.set(True)
+    try:
+        yield
+    finally:
+        rewriting_catalog.reset(token)
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row version of the Exercise catalog, replaced on every write to it.
+    Keys the serialized catalog cached by fitness.catalog_cache. A random value
+    rather than a counter, so a rolled back bump can never be reused.
+    """
+    version = models.UUIDField(default=uuid.uuid4)
+
+    @classmethod
+    def current(cls):
+        version = cls.objects.filter(pk=1).values_list('version', flat=True).first()
+        return version.hex if version else 'initial'
+
+    @classmethod
+    def bump(cls):
+        cls.objects.update_or_create(pk=1, defaults={'version': uuid.uuid4()})
+
+
 class Workout(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
     image_url = models.URLField(max_length=200)
     description = models.TextField()
     body_part = models.CharField(max_length=100)
     exercises = models.ManyToManyField(Exercise, through='WorkoutExercise')
 
+    class Meta:
+        indexes = [
+            models.Index(Upper('body_part'), name='workout_body_part_upper_idx'),
+        ]
+
 class FeaturedWorkout(models.Model):
+    """
+    A workout featured on a date. A date can feature several workouts, one
+    per slot; the endpoint serves the first. Filled ahead of time by the
+    schedule_featured_workouts command.
+    """
     workout = models.ForeignKey(Workout, on_delete=models.CASCADE)
     date = models.DateField()
+    slot = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index of the lookups by date
+            models.UniqueConstraint(fields=['date', 'slot'], name='unique_featured_workout_slot'),
+        ]
 
 class WorkoutExercise(models.Model):
     workout = models.ForeignKey(Workout, on_delete=models.CASCADE)
@@ -67,23 +251,105 @@ class WorkoutExercise(models.Model):
     km_ran = models.FloatField(null=True, blank=True)
 
 class WorkoutProgram(models.Model):
+    """
+    A weekly program. Templates are shared by every user subscribed to their
+    source workout and never changed by them; a user customizing their
+    schedule gets their own copy (see WorkoutProgramViewSet.customize).
+    """
     user = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True)
     name = models.CharField(max_length=100)
     description = models.TextField()
+    is_template = models.BooleanField(default=False)
+    source_workout = models.ForeignKey(
+        'Workout', related_name='program_templates', on_delete=models.SET_NULL, null=True, blank=True
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_workout'],
+                condition=models.Q(is_template=True),
+                name='unique_workout_program_template'
+            ),
+        ]
+
+    @classmethod
+    def template_for(cls, workout):
+        """
+        The template of the program doing `workout` every day, created on the
+        first subscription to it.
+        """
+        template = cls.objects.filter(is_template=True, source_workout=workout).first()
+        if template is not None:
+            return template
+        try:
+            with transaction.atomic():
+                template = cls.objects.create(
+                    name=f"Subscribed Program for Workout {workout.name}",
+                    description="",
+                    is_template=True,
+                    source_workout=workout,
+                )
+                # Skips the signals, but the cached programs are invalidated again when the template commits
+                ProgramDay.objects.bulk_create([
+                    ProgramDay(workout_program=template, workout=workout, day_of_week=day) for day in range(7)
+                ])
+        except IntegrityError:
+            # Created by a concurrent subscription
+            return cls.objects.get(is_template=True, source_workout=workout)
+        return template
 
 class ProgramDay(models.Model):
     workout_program = models.ForeignKey(WorkoutProgram, related_name='days', on_delete=models.CASCADE)
     workout = models.ForeignKey(Workout, on_delete=models.SET_NULL, null=True, blank=True)
     day_of_week = models.IntegerField()
 
+
+# Workout programs whose days are being replaced, see replacing_program_days
+replacing_program_ids = ContextVar('replacing_program_ids', default=frozenset())
+
+
+@contextmanager
+def replacing_program_days(workout_program_id):
+    """
+    Around a rewrite of a program's days, whose deletes then leave the
+    schedules of its active programs alone: the writer sets them once instead
+    of once per day. Reset even if the rewrite fails.
+    """
+    token = replacing_program_ids.set(replacing_program_ids.get() | {workout_program_id})
+    try:
+        yield
+    finally:
+        replacing_program_ids.reset(token)
+
+
 class LoggedWorkout(models.Model):
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
     workout_name = models.CharField(max_length=100)
     duration_minutes = models.FloatField()
     log_time = models.DateTimeField()
+    client_key = models.CharField(max_length=64, null=True, blank=True)  # Idempotency key set by offline clients
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'log_time'], name='loggedworkout_user_logtime_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'client_key'],
+                condition=models.Q(client_key__isnull=False),
+                name='unique_loggedworkout_client_key'
+            ),
+        ]
 
 
 class LoggedExercise(models.Model):
+    # Calories burned by a logged exercise, for use in aggregate queries
+    CALORIES_BURNED = models.ExpressionWrapper(
+        models.F('sets_completed') * models.F('reps_completed') * models.F('exercise__calories_burned'),
+        output_field=models.FloatField()
+    )
+
     logged_workout = models.ForeignKey(LoggedWorkout, on_delete=models.CASCADE)
     exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
     order = models.IntegerField()
@@ -99,3 +365,53 @@ class ActiveWorkoutProgram(models.Model):
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    # Workout id per day of the week, keyed by get_current_day() number (None
+    # on rest days), copied from the program's days so today's workout is one
+    # query. Filled in on creation and kept current by fitness.signals.
+    schedule = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        constraints = [
+            # One active program per user, which subscribe and activate rely on instead of checking first
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_active=True),
+                name='unique_active_workout_program'
+            ),
+        ]
+
+    @staticmethod
+    def schedule_of(workout_program_id):
+        """
+        The schedule of a WorkoutProgram. Like a lookup of its ProgramDay, the
+        first day wins when several fall on the same weekday.
+        """
+        schedule = {}
+        days = ProgramDay.objects.filter(workout_program_id=workout_program_id).order_by('pk')
+        for day_of_week, workout_id in days.values_list('day_of_week', 'workout_id'):
+            schedule.setdefault(str(day_of_week), workout_id)
+        return schedule
+
+    @classmethod
+    def refresh_schedules(cls, workout_program_id):
+        cls.objects.filter(workout_program_id=workout_program_id).update(schedule=cls.schedule_of(workout_program_id))
+
+
+class DailyUserStats(models.Model):
+    """
+    Per-user, per-day rollup of the diet and workout logs used by the stats endpoints.
+    Kept up to date by the signal handlers in fitness/signals.py.
+    """
+    user = models.ForeignKey(UserProfile, related_name='daily_stats', on_delete=models.CASCADE)
+    date = models.DateField()
+    calories_eaten = models.IntegerField(default=0)
+    calories_burned = models.FloatField(default=0)
+    exercises_logged = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_daily_user_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.date}"
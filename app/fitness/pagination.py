@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LogTimeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over a user's log history, newest first.
+    The id breaks ties between entries logged at the same time.
+    """
+    ordering = ('-log_time', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
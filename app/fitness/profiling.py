@@ -0,0 +1,132 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+current_profile = contextvars.ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+    """
+    Where the time of one request went: total seconds and call count per span
+    (sql, serialize, auth, external), filled in by span() and record_sql.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.active = set()
+
+    def add(self, name, seconds):
+        total, count = self.spans.get(name, (0.0, 0))
+        self.spans[name] = (total + seconds, count + 1)
+
+
+def record_sql(execute, sql, params, many, context):
+    """
+    Database execute wrapper timing queries as the sql span of the current
+    request. The profile is found through the context, so queries run by
+    sync_to_async threads of an ASGI request are counted too.
+    """
+    profile = current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add('sql', time.perf_counter() - started)
+
+
+def instrument_connection(sender, connection, **kwargs):
+    """connection_created receiver installing record_sql on every database connection."""
+    if record_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_sql)
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block as part of the current request's `name` span. Free outside a
+    profiled request, and nested blocks of the same span are only counted once.
+    """
+    profile = current_profile.get()
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.active.discard(name)
+        profile.add(name, time.perf_counter() - started)
+
+
+class TimedAuthenticationMixin:
+    """Times a DRF authentication class as the auth span of the request."""
+    def authenticate(self, request):
+        with span('auth'):
+            return super().authenticate(request)
+
+
+class TimedSerializerMixin:
+    """
+    Times the output of a serializer as the serialize span of the request.
+    Nested serializers are counted once, with their parent; a list counts
+    one call per item.
+    """
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+class RequestHistograms:
+    """
+    Thread-safe per-URL-name aggregates: a latency histogram of whole requests
+    plus the total time and calls of every span.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, url_name, seconds, spans):
+        with self.lock:
+            route = self.routes.setdefault(url_name, {
+                'requests': 0, 'total_ms': 0.0, 'buckets': [0] * len(BUCKETS_MS), 'spans': {}
+            })
+            ms = seconds * 1000
+            route['requests'] += 1
+            route['total_ms'] += ms
+            route['buckets'][bisect.bisect_left(BUCKETS_MS, ms)] += 1
+            for name, (span_seconds, count) in spans.items():
+                total_ms, calls = route['spans'].get(name, (0.0, 0))
+                route['spans'][name] = (total_ms + span_seconds * 1000, calls + count)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                url_name: {
+                    'requests': route['requests'],
+                    'mean_ms': round(route['total_ms'] / route['requests'], 2),
+                    'histogram_ms': {
+                        ('+Inf' if bound == float('inf') else str(bound)): count
+                        for bound, count in zip(BUCKETS_MS, route['buckets'])
+                    },
+                    'spans': {
+                        name: {'mean_ms': round(total_ms / route['requests'], 2), 'calls_per_request': round(calls / route['requests'], 2)}
+                        for name, (total_ms, calls) in route['spans'].items()
+                    },
+                }
+                for url_name, route in self.routes.items()
+            }
+
+    def reset(self):
+        with self.lock:
+            self.routes = {}
+
+
+histograms = RequestHistograms()
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .caching import DIET_LOG_ITEMS, LOGGED_WORKOUTS, invalidate
+from .models import DailyUserStats, DietLogItem, LoggedExercise
+
+
+def stats_date(log_time):
+    """The day a log entry counts towards, matching the `__date` lookups used by the queries."""
+    return timezone.localtime(log_time).date()
+
+
+# Logged workouts being deleted in the current thread or task, see deleting_logged_workout
+deleting_workout_ids = ContextVar('deleting_workout_ids', default=frozenset())
+
+
+@contextmanager
+def deleting_logged_workout(logged_workout_id):
+    """
+    Around the delete of a logged workout, whose exercises are deleted first
+    by the cascade: they leave the rollup alone, and the workout refreshes its
+    day once instead of once per exercise. Reset even if the delete fails.
+    """
+    token = deleting_workout_ids.set(deleting_workout_ids.get() | {logged_workout_id})
+    try:
+        yield
+    finally:
+        deleting_workout_ids.reset(token)
+
+
+def refresh_daily_stats(user_id, dates):
+    """
+    Recompute the DailyUserStats rows of a user for the given dates from the raw logs.
+    """
+    for day in set(dates):
+        calories_eaten = DietLogItem.objects.filter(
+            user_id=user_id,
+            log_time__date=day
+        ).aggregate(total=Sum('food_calories'))['total'] or 0
+
+        exercises = LoggedExercise.objects.filter(
+            logged_workout__user_id=user_id,
+            logged_workout__log_time__date=day
+        ).aggregate(calories_burned=Sum(LoggedExercise.CALORIES_BURNED), exercises_logged=Count('id'))
+
+        if not calories_eaten and not exercises['exercises_logged']:
+            DailyUserStats.objects.filter(user_id=user_id, date=day).delete()
+            continue
+
+        DailyUserStats.objects.update_or_create(
+            user_id=user_id,
+            date=day,
+            defaults={
+                'calories_eaten': calories_eaten,
+                'calories_burned': exercises['calories_burned'] or 0,
+                'exercises_logged': exercises['exercises_logged'],
+            }
+        )
+
+
+def refresh_exercise_stats(exercise_ids):
+    """
+    Recompute the DailyUserStats rows of every user and day that logged one of
+    the given exercises, after a change of their calories_burned, and drop the
+    users' cached stats.
+    """
+    days = LoggedExercise.objects.filter(exercise_id__in=exercise_ids).values_list(
+        'logged_workout__user_id', 'logged_workout__log_time__date'
+    ).order_by().distinct()
+    dates_per_user = defaultdict(set)
+    for user_id, day in days:
+        dates_per_user[user_id].add(day)
+    for user_id, dates in dates_per_user.items():
+        refresh_daily_stats(user_id, dates)
+        invalidate(LOGGED_WORKOUTS, user_id)
+
+
+def rebuild_daily_stats(user_ids=None, batch_size=1000):
+    """
+    Rebuild the DailyUserStats table (or the rows of the given users) from scratch,
+    and drop the cached stats responses of the users whose rows changed.
+    Returns the number of rows written.
+    """
+    diet_logs = DietLogItem.objects.all()
+    exercises = LoggedExercise.objects.all()
+    if user_ids is not None:
+        diet_logs = diet_logs.filter(user_id__in=user_ids)
+        exercises = exercises.filter(logged_workout__user_id__in=user_ids)
+
+    rows = {}
+
+    def row(user_id, day):
+        if (user_id, day) not in rows:
+            rows[(user_id, day)] = DailyUserStats(user_id=user_id, date=day)
+        return rows[(user_id, day)]
+
+    for log in diet_logs.values('user_id', 'log_time__date').annotate(total=Sum('food_calories')):
+        row(log['user_id'], log['log_time__date']).calories_eaten = log['total']
+
+    exercise_logs = exercises.values('logged_workout__user_id', 'logged_workout__log_time__date').annotate(
+        calories_burned=Sum(LoggedExercise.CALORIES_BURNED), exercises_logged=Count('id')
+    )
+    for log in exercise_logs:
+        stats = row(log['logged_workout__user_id'], log['logged_workout__log_time__date'])
+        stats.calories_burned = log['calories_burned'] or 0
+        stats.exercises_logged = log['exercises_logged']
+
+    with transaction.atomic():
+        existing = DailyUserStats.objects.all()
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+        affected_user_ids = set(existing.values_list('user_id', flat=True).distinct())
+        affected_user_ids.update(user_id for user_id, day in rows)
+        existing.delete()
+        DailyUserStats.objects.bulk_create(rows.values(), batch_size=batch_size)
+        # The stats views are cached under the versions of the logs they sum
+        for user_id in affected_user_ids:
+            invalidate(DIET_LOG_ITEMS, user_id)
+            invalidate(LOGGED_WORKOUTS, user_id)
+
+    return len(rows)
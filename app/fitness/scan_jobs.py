@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import FoodScanJob
+
+logger = logging.getLogger(__name__)
+
+# Scans run in a per-process thread pool so the request that submits them returns immediately
+executor = ThreadPoolExecutor(max_workers=settings.FOOD_SCAN_WORKERS, thread_name_prefix='food-scan')
+
+
+scanners = {}
+scanners_lock = threading.Lock()
+
+
+def get_food_scanner():
+    """
+    The process-wide instance of the scanner configured by the FOOD_SCANNER setting
+    (e.g. the offline StubFoodScanner). It is created lazily, after gunicorn has forked,
+    and then shared by every scan so its HTTP connections are reused.
+    """
+    with scanners_lock:
+        if settings.FOOD_SCANNER not in scanners:
+            scanners[settings.FOOD_SCANNER] = import_string(settings.FOOD_SCANNER)()
+        return scanners[settings.FOOD_SCANNER]
+
+
+def submit_scan(user, image_bytes):
+    """
+    Queue a scan of the given image for the user and return its FoodScanJob.
+    The job is processed once the current transaction commits.
+    """
+    job = FoodScanJob.objects.create(user=user)
+    if settings.FOOD_SCAN_RUN_INLINE:
+        run_scan_job(job.id, image_bytes)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: executor.submit(run_in_worker, job.id, image_bytes))
+    return job
+
+
+def run_in_worker(job_id, image_bytes):
+    try:
+        run_scan_job(job_id, image_bytes)
+    except Exception:
+        logger.exception("Food scan job %s crashed", job_id)
+    finally:
+        # Worker threads hold their own database connection
+        connection.close()
+
+
+def run_scan_job(job_id, image_bytes):
+    close_old_connections()
+    FoodScanJob.objects.filter(pk=job_id).update(status=FoodScanJob.RUNNING)
+    try:
+        result = get_food_scanner().analyze_food_image(BytesIO(image_bytes))
+    except Exception as e:
+        # Any error fails the job, rather than leaving it running until it times out
+        if not isinstance(e, (RuntimeError, ValueError)):  # Raised by the scanners for bad images and replies
+            logger.exception("Food scan job %s crashed", job_id)
+        FoodScanJob.objects.filter(pk=job_id).update(
+            status=FoodScanJob.FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return
+    FoodScanJob.objects.filter(pk=job_id).update(
+        status=FoodScanJob.DONE, result=result, finished_at=timezone.now()
+    )
+
+
+TIMED_OUT_FIELDS = ['status', 'error', 'finished_at']
+
+
+def time_out(job):
+    """
+    Mark a job left unfinished for longer than FOOD_SCAN_JOB_TIMEOUT (e.g. by a
+    restarted worker process) as failed. Returns whether it was, to be saved.
+    """
+    if job.is_finished or job.created_at >= timezone.now() - timedelta(seconds=settings.FOOD_SCAN_JOB_TIMEOUT):
+        return False
+    job.status = FoodScanJob.FAILED
+    job.error = "The scan timed out."
+    job.finished_at = timezone.now()
+    return True
+
+
+def parse_wait(value, limit=None):
+    """
+    Seconds to wait for a job, from the `wait` query parameter, capped at
+    `limit` (FOOD_SCAN_MAX_WAIT by default). Raises ValueError when it is not
+    a number.
+    """
+    return min(float(value or 0), settings.FOOD_SCAN_MAX_WAIT if limit is None else limit)
+
+
+def wait_for_scan(job, timeout):
+    """
+    Long-poll a job until it finishes or `timeout` seconds pass, and return its latest state.
+    Holds the calling thread, so sync views keep `timeout` short (FOOD_SCAN_SYNC_MAX_WAIT);
+    see await_for_scan for long waits. Jobs left unfinished for too long are reported as
+    failed, see time_out.
+    """
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        time.sleep(settings.FOOD_SCAN_POLL_INTERVAL)
+        job.refresh_from_db()
+
+    if time_out(job):
+        job.save(update_fields=TIMED_OUT_FIELDS)
+    return job
+
+
+async def asubmit_scan(user, image_bytes, wait=0):
+    """
+    Async submit_scan for ASGI views: queue a scan of the image on the scan
+    worker pool and, given `wait` seconds, await the model call there rather
+    than polling for it.
+    """
+    job = await FoodScanJob.objects.acreate(user=user)
+    if settings.FOOD_SCAN_RUN_INLINE:
+        await sync_to_async(run_scan_job)(job.id, image_bytes)
+    else:
+        future = asyncio.wrap_future(executor.submit(run_in_worker, job.id, image_bytes))
+        if wait:
+            try:
+                # Shielded: giving up waiting must not cancel the scan
+                await asyncio.wait_for(asyncio.shield(future), wait)
+            except asyncio.TimeoutError:
+                pass
+    await job.arefresh_from_db()
+    return job
+
+
+async def await_for_scan(job, timeout):
+    """
+    Async wait_for_scan, polling without holding a thread.
+    """
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        await asyncio.sleep(settings.FOOD_SCAN_POLL_INTERVAL)
+        await job.arefresh_from_db()
+
+    if time_out(job):
+        await job.asave(update_fields=TIMED_OUT_FIELDS)
+    return job
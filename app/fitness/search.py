@@ -0,0 +1,210 @@
+import bisect
+import threading
+from collections import Counter, defaultdict
+from django.db import connection
+from django.db.models import Count, Q
+from django.http import Http404
+from rest_framework.exceptions import ValidationError
+from .catalog_cache import catalog_cache
+from .models import CatalogVersion, Exercise, ExerciseSecondaryMuscle
+
+# Query parameter -> field of the serialized exercise it filters and counts
+EXERCISE_FACETS = {'body_part': 'body_part', 'equipment': 'equipment', 'target': 'target', 'muscle': 'secondaryMuscles'}
+WORKOUT_FACETS = {'body_part': 'body_part'}
+
+MATCH_MODES = ('substring', 'prefix')
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def parse_search_params(params, facets):
+    """
+    Read `q`, `match`, the facet filters, `limit` and `offset` from the query parameters.
+    Facet values are matched exactly, ignoring case.
+    """
+    query = params.get('q', '').strip().lower()
+    match = params.get('match', 'substring')
+    if match not in MATCH_MODES:
+        raise ValidationError({'match': f"Expected one of: {', '.join(MATCH_MODES)}."})
+    try:
+        limit = min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        offset = int(params.get('offset', 0))
+    except ValueError:
+        raise ValidationError({'limit': 'limit and offset must be integers.'})
+    if limit < 0 or offset < 0:
+        raise ValidationError({'limit': 'limit and offset must not be negative.'})
+    filters = {param: params[param].strip().lower() for param in facets if params.get(param)}
+    return query, match, filters, limit, offset
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ExerciseSearchIndex:
+    """
+    In-memory inverted index over the serialized exercise catalog.
+
+    Used on databases without trigram indexes (SQLite). Names are indexed by
+    trigram for substring search and kept sorted for prefix search, and every
+    facet value maps to the exercises that have it.
+    """
+    def __init__(self, exercises):
+        self.exercises = {exercise['exercise_id']: exercise for exercise in exercises}
+        self.names = sorted((exercise['name'].lower(), exercise['exercise_id']) for exercise in exercises)
+        self.trigrams = defaultdict(set)
+        self.facets = {param: defaultdict(set) for param in EXERCISE_FACETS}
+        for exercise in exercises:
+            exercise_id = exercise['exercise_id']
+            for gram in trigrams(exercise['name'].lower()):
+                self.trigrams[gram].add(exercise_id)
+            for param, field in EXERCISE_FACETS.items():
+                for value in facet_values(exercise, field):
+                    self.facets[param][value.lower()].add(exercise_id)
+
+    def search(self, query, match, filters):
+        """Ids of the matching exercises, ordered by name."""
+        ids = None
+        if query:
+            ids = self.prefix_matches(query) if match == 'prefix' else self.substring_matches(query)
+        for param, value in filters.items():
+            postings = self.facets[param].get(value, set())
+            ids = postings if ids is None else ids & postings
+        if ids is None:
+            return [exercise_id for name, exercise_id in self.names]
+        return sorted(ids, key=lambda exercise_id: (self.exercises[exercise_id]['name'].lower(), exercise_id))
+
+    def prefix_matches(self, query):
+        ids = set()
+        for name, exercise_id in self.names[bisect.bisect_left(self.names, (query,)):]:
+            if not name.startswith(query):
+                break
+            ids.add(exercise_id)
+        return ids
+
+    def substring_matches(self, query):
+        if len(query) < 3:
+            candidates = self.exercises.keys()
+        else:
+            postings = sorted((self.trigrams.get(gram, set()) for gram in trigrams(query)), key=len)
+            candidates = set.intersection(*postings)
+        return {
+            exercise_id for exercise_id in candidates
+            if query in self.exercises[exercise_id]['name'].lower()
+        }
+
+
+search_indexes = {}
+search_indexes_lock = threading.Lock()
+
+
+def exercise_search_index(version):
+    """The ExerciseSearchIndex of a catalog version, built once per worker."""
+    with search_indexes_lock:
+        if version not in search_indexes:
+            search_indexes.clear()
+            search_indexes[version] = ExerciseSearchIndex(catalog_cache.exercises(version))
+        return search_indexes[version]
+
+
+def search_exercise_ids_in_database(query, match, filters):
+    """
+    Ids of the matching exercises, ordered by name, found by the database.
+    On Postgres the name lookups use the trigram indexes created by migration
+    0010, and the facet filters the UPPER() indexes of migration 0016.
+    """
+    queryset = Exercise.objects.all()
+    if query:
+        lookup = 'name__istartswith' if match == 'prefix' else 'name__icontains'
+        queryset = queryset.filter(**{lookup: query})
+    for param, value in filters.items():
+        if param == 'muscle':
+            queryset = queryset.filter(secondary_muscles__name__iexact=value)
+        else:
+            queryset = queryset.filter(**{f'{param}__iexact': value})
+    return list(queryset.order_by('name', 'exercise_id').values_list('exercise_id', flat=True))
+
+
+def facet_values(item, field):
+    value = item[field]
+    return value if isinstance(value, list) else [value]
+
+
+def facet_counts(items, facets):
+    counts = {param: Counter() for param in facets}
+    for item in items:
+        for param, field in facets.items():
+            counts[param].update(value.lower() for value in facet_values(item, field))
+    return {param: dict(counter.most_common()) for param, counter in counts.items()}
+
+
+def search_exercises(params):
+    """
+    Search the exercise catalog by name and facets.
+
+    Returns one page of serialized exercises, the total count and, for every
+    facet, the number of matching exercises per value.
+    """
+    query, match, filters, limit, offset = parse_search_params(params, EXERCISE_FACETS)
+    version = CatalogVersion.current()
+    if connection.vendor == 'postgresql':
+        # Served by the trigram and UPPER() indexes, no in-memory index needed
+        ids = search_exercise_ids_in_database(query, match, filters)
+        exercises_by_id = catalog_cache.exercises_by_id(version)
+    else:
+        index = exercise_search_index(version)
+        ids = index.search(query, match, filters)
+        exercises_by_id = index.exercises
+
+    exercises = [exercises_by_id[exercise_id] for exercise_id in ids if exercise_id in exercises_by_id]
+    # The matches are in memory either way, so counting them here beats one aggregate query per facet
+    return {
+        'count': len(exercises),
+        'results': exercises[offset:offset + limit],
+        'facets': facet_counts(exercises, EXERCISE_FACETS),
+    }
+
+
+def related_exercises(exercise_id, limit=DEFAULT_LIMIT):
+    """
+    Exercises to suggest alongside one: those sharing its target or any of its
+    secondary muscles, most shared secondary muscles first. Ranked by the
+    database over the muscle links, and served from the catalog cache.
+    """
+    target = Exercise.objects.filter(pk=exercise_id).values_list('target', flat=True).first()
+    if target is None:
+        raise Http404
+    muscle_ids = ExerciseSecondaryMuscle.objects.filter(exercise_id=exercise_id).values('muscle_id')
+    ids = list(
+        Exercise.objects.exclude(pk=exercise_id)
+        .annotate(shared_muscles=Count('secondary_muscle_links', filter=Q(secondary_muscle_links__muscle_id__in=muscle_ids)))
+        .filter(Q(shared_muscles__gt=0) | Q(target=target))
+        .order_by('-shared_muscles', 'name', 'exercise_id')
+        .values_list('exercise_id', flat=True)[:limit]
+    )
+    exercises = {exercise['exercise_id']: exercise for exercise in catalog_cache.exercises(CatalogVersion.current())}
+    return [exercises[exercise_id] for exercise_id in ids if exercise_id in exercises]
+
+
+def filter_workouts(queryset, query, match, filters):
+    if query:
+        lookup = 'name__istartswith' if match == 'prefix' else 'name__icontains'
+        queryset = queryset.filter(**{lookup: query})
+    for param, value in filters.items():
+        queryset = queryset.filter(**{f'{param}__iexact': value})
+    return queryset
+
+
+def search_workouts(params, queryset, serializer_class):
+    """
+    Search workouts by name and body part, with body part facet counts.
+    """
+    query, match, filters, limit, offset = parse_search_params(params, WORKOUT_FACETS)
+    queryset = filter_workouts(queryset, query, match, filters)
+    body_parts = queryset.order_by().values('body_part').annotate(count=Count('id')).order_by('-count', 'body_part')
+    page = queryset.order_by('name', 'id')[offset:offset + limit]
+    return {
+        'count': sum(row['count'] for row in body_parts),
+        'results': serializer_class(page, many=True).data,
+        'facets': {'body_part': {row['body_part'].lower(): row['count'] for row in body_parts}},
+    }
@@ -1,16 +1,19 @@
 # core/serializers.py
+from django.db import transaction
 from rest_framework import serializers
 from .models import *
+from .profiling import TimedSerializerMixin
+from .utils.image_pipeline import make_thumbnail
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-class UserSignupSerializer(serializers.ModelSerializer):
+class UserSignupSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['email', 'password', 'height_cm', 'gender', 'weight_kg', 'target_weight_kg', 'age', 'activity_level']
+        fields = ['email', 'password', 'height_cm', 'gender', 'weight_kg', 'target_weight_kg', 'age', 'activity_level', 'timezone']
         extra_kwargs = {'password': {'write_only': True}}
 
     def create(self, validated_data):
@@ -23,11 +26,24 @@ class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField()
 
-class DietLogItemSerializer(serializers.ModelSerializer):
+class DietLogItemSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = DietLogItem
-        fields = ['id', 'image', 'food_calories', 'food_name', 'protein_grams', 'carbs_grams', 'fat_grams', 'log_time']
-        read_only_fields = ['user']  # Mark user as read-only
+        fields = ['id', 'image', 'thumbnail', 'food_calories', 'food_name', 'protein_grams', 'carbs_grams', 'fat_grams', 'log_time']
+        read_only_fields = ['user', 'thumbnail']  # Mark user as read-only
+
+    def validate(self, attrs):
+        # Generate the thumbnail whenever a new image is uploaded
+        if 'image' in attrs:
+            attrs['thumbnail'] = make_thumbnail(attrs['image']) if attrs['image'] else None
+        return attrs
+
+class FoodScanJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    job_id = serializers.UUIDField(source='id', read_only=True)
+
+    class Meta:
+        model = FoodScanJob
+        fields = ['job_id', 'status', 'result', 'error', 'created_at', 'finished_at']
 
 # class ExerciseSerializer(serializers.ModelSerializer):
 #     class Meta:
@@ -35,7 +51,7 @@ class DietLogItemSerializer(serializers.ModelSerializer):
 #         fields = '__all__'
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     secondaryMuscles = serializers.ListField(
         child=serializers.CharField(), source='get_secondary_muscles', write_only=False
     )
@@ -46,31 +62,32 @@ class ExerciseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Exercise
         fields = ['body_part', 'equipment', 'gif_url', 'exercise_id', 'name', 'target', 'secondaryMuscles', 'instructions', 'calories_burned']
-        
+
+    @transaction.atomic
     def create(self, validated_data):
-        # Process list fields to semicolon-separated strings
+        # The list fields are stored as related rows, written once the exercise exists
         secondary_muscles = validated_data.pop('get_secondary_muscles', [])
         instructions = validated_data.pop('get_instructions', [])
         
         exercise = Exercise(**validated_data)
+        exercise.save()
         exercise.set_secondary_muscles(secondary_muscles)
         exercise.set_instructions(instructions)
-        exercise.save()
         return exercise
-    
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         secondary_muscles = validated_data.pop('get_secondary_muscles', None)
         instructions = validated_data.pop('get_instructions', None)
         
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
+        instance.save()
         
         if secondary_muscles is not None:
             instance.set_secondary_muscles(secondary_muscles)
         if instructions is not None:
             instance.set_instructions(instructions)
-        
-        instance.save()
         return instance
 
 class WorkoutExerciseSerializer(serializers.ModelSerializer):
@@ -81,7 +98,7 @@ class WorkoutExerciseSerializer(serializers.ModelSerializer):
         model = WorkoutExercise
         fields = ['exercise_id', 'name', 'order', 'sets', 'reps', 'weight_in_kg', 'km_ran']
 
-class WorkoutSerializer(serializers.ModelSerializer):
+class WorkoutSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     exercises = WorkoutExerciseSerializer(many=True, read_only=True, source='workoutexercise_set')
     class Meta:
         model = Workout
@@ -98,14 +115,28 @@ class ProgramDaySerializer(serializers.ModelSerializer):
         model = ProgramDay
         fields = ['id', 'day_of_week', 'workout']  # Exclude workout_program_id
 
-class WorkoutProgramSerializer(serializers.ModelSerializer):
+class WorkoutProgramSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     days = ProgramDaySerializer(many=True, read_only=True)
     class Meta:
         model = WorkoutProgram
         fields = '__all__'
 
+class ProgramDayChangeSerializer(serializers.Serializer):
+    day_of_week = serializers.IntegerField(min_value=0, max_value=6)
+    workout_id = serializers.IntegerField(allow_null=True)  # None makes it a rest day
+
+class ProgramCustomizationSerializer(serializers.Serializer):
+    days = ProgramDayChangeSerializer(many=True, allow_empty=False)
+
+    def validate_days(self, days):
+        workout_ids = {day['workout_id'] for day in days if day['workout_id'] is not None}
+        missing = workout_ids - set(Workout.objects.filter(pk__in=workout_ids).values_list('pk', flat=True))
+        if missing:
+            raise serializers.ValidationError(f"Unknown workouts: {sorted(missing)}.")
+        return days
+
 class LoggedExerciseSerializer(serializers.ModelSerializer):
-    exercise_id = serializers.IntegerField(source="exercise.exercise_id", read_only=True)
+    exercise_id = serializers.CharField(source="exercise.exercise_id", read_only=True)
     name = serializers.CharField(source="exercise.name", read_only=True)
 
     class Meta:
@@ -113,7 +144,19 @@ class LoggedExerciseSerializer(serializers.ModelSerializer):
         fields = ['exercise_id', 'name', 'order', 'sets_completed', 'reps_completed', 'weight_used_kg', 'km_ran']
 
 
-class LoggedWorkoutSerializer(serializers.ModelSerializer):
+class LoggedExerciseInputSerializer(serializers.Serializer):
+    """
+    One entry of the `exercises` payload sent when logging a workout.
+    """
+    exercise_id = serializers.CharField()
+    order = serializers.IntegerField()
+    sets = serializers.IntegerField()
+    reps = serializers.IntegerField()
+    weight_in_kg = serializers.FloatField(required=False, allow_null=True)
+    km_ran = serializers.FloatField(required=False, allow_null=True)
+
+
+class LoggedWorkoutSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     exercises = LoggedExerciseSerializer(many=True, source='loggedexercise_set', read_only=True)
 
     class Meta:
@@ -121,7 +164,32 @@ class LoggedWorkoutSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'workout_name', 'duration_minutes', 'log_time', 'exercises']
         read_only_fields = ['user']
 
-class ActiveWorkoutProgramSerializer(serializers.ModelSerializer):
+class SyncLoggedWorkoutSerializer(serializers.ModelSerializer):
+    """
+    A logged workout replayed through the sync endpoint, with its exercises inline.
+    """
+    client_key = serializers.CharField(max_length=64)
+    exercises = LoggedExerciseInputSerializer(many=True, required=False)
+
+    class Meta:
+        model = LoggedWorkout
+        fields = ['client_key', 'workout_name', 'duration_minutes', 'log_time', 'exercises']
+        validators = []  # Already synced keys are reported per item, not rejected
+
+
+class SyncDietLogItemSerializer(serializers.ModelSerializer):
+    """
+    A diet log item replayed through the sync endpoint.
+    """
+    client_key = serializers.CharField(max_length=64)
+
+    class Meta:
+        model = DietLogItem
+        fields = ['client_key', 'food_name', 'food_calories', 'protein_grams', 'carbs_grams', 'fat_grams', 'log_time']
+        validators = []
+
+
+class ActiveWorkoutProgramSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     workout_program = WorkoutProgramSerializer()
     days = ProgramDaySerializer(many=True, source='workout_program.days')
 
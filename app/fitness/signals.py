@@ -0,0 +1,157 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from .caching import ACTIVE_PROGRAMS, DIET_LOG_ITEMS, LOGGED_WORKOUTS, WORKOUT_PROGRAMS, WORKOUTS, invalidate
+from .featured import forget_featured
+from .models import (
+    ActiveWorkoutProgram, CatalogVersion, DietLogItem, Exercise, ExerciseInstruction, ExerciseSecondaryMuscle,
+    FeaturedWorkout, LoggedExercise, LoggedWorkout, Muscle, ProgramDay, Workout, WorkoutExercise, WorkoutProgram,
+    replacing_program_ids, rewriting_catalog
+)
+from .rollups import deleting_workout_ids, refresh_daily_stats, refresh_exercise_stats, stats_date
+
+
+# Remember the log time an instance was loaded with, so a changed log time
+# also refreshes the day the entry was moved away from.
+@receiver(post_init, sender=DietLogItem)
+@receiver(post_init, sender=LoggedWorkout)
+def remember_log_time(sender, instance, **kwargs):
+    instance._original_log_time = instance.__dict__.get('log_time')
+
+
+def affected_dates(instance):
+    dates = {stats_date(instance.log_time)}
+    if instance._original_log_time is not None:
+        dates.add(stats_date(instance._original_log_time))
+    return dates
+
+
+@receiver(post_save, sender=DietLogItem)
+def diet_log_item_saved(sender, instance, **kwargs):
+    refresh_daily_stats(instance.user_id, affected_dates(instance))
+    instance._original_log_time = instance.log_time
+
+
+@receiver(post_delete, sender=DietLogItem)
+def diet_log_item_deleted(sender, instance, **kwargs):
+    refresh_daily_stats(instance.user_id, [stats_date(instance.log_time)])
+
+
+@receiver(post_save, sender=LoggedWorkout)
+def logged_workout_saved(sender, instance, created, **kwargs):
+    # A new workout has no exercises yet; they refresh the rollup as they are added
+    if not created:
+        refresh_daily_stats(instance.user_id, affected_dates(instance))
+    instance._original_log_time = instance.log_time
+
+
+@receiver(post_delete, sender=LoggedWorkout)
+def logged_workout_deleted(sender, instance, **kwargs):
+    refresh_daily_stats(instance.user_id, [stats_date(instance.log_time)])
+
+
+@receiver(post_save, sender=LoggedExercise)
+@receiver(post_delete, sender=LoggedExercise)
+def logged_exercise_changed(sender, instance, **kwargs):
+    if instance.logged_workout_id in deleting_workout_ids.get():
+        return
+    logged_workout = LoggedWorkout.objects.filter(pk=instance.logged_workout_id).values('user_id', 'log_time').first()
+    if logged_workout:
+        refresh_daily_stats(logged_workout['user_id'], [stats_date(logged_workout['log_time'])])
+        invalidate(LOGGED_WORKOUTS, logged_workout['user_id'])
+
+
+# Remember the calories an exercise was loaded with, so a change refreshes
+# the rollups of the workouts that logged it.
+@receiver(post_init, sender=Exercise)
+def remember_calories_burned(sender, instance, **kwargs):
+    instance._original_calories_burned = instance.__dict__.get('calories_burned')
+
+
+@receiver(post_save, sender=Exercise)
+def exercise_saved(sender, instance, created, **kwargs):
+    if not created and instance.calories_burned != instance._original_calories_burned:
+        refresh_exercise_stats([instance.pk])
+    instance._original_calories_burned = instance.calories_burned
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def exercise_changed(sender, **kwargs):
+    CatalogVersion.bump()
+    invalidate(WORKOUTS)  # Workouts embed their exercises
+    forget_featured()
+
+
+# The muscle and instruction lists serialized with the exercises, outside of
+# Exercise.set_* and import_catalog, which bump the version themselves
+@receiver(post_save, sender=Muscle)
+@receiver(post_delete, sender=Muscle)
+@receiver(post_save, sender=ExerciseSecondaryMuscle)
+@receiver(post_delete, sender=ExerciseSecondaryMuscle)
+@receiver(post_save, sender=ExerciseInstruction)
+@receiver(post_delete, sender=ExerciseInstruction)
+def exercise_list_changed(sender, **kwargs):
+    if rewriting_catalog.get():
+        return
+    CatalogVersion.bump()
+    invalidate(WORKOUTS)
+    forget_featured()
+
+
+# The schedule of today's workout, denormalized onto ActiveWorkoutProgram
+
+@receiver(pre_save, sender=ActiveWorkoutProgram)
+def fill_schedule(sender, instance, **kwargs):
+    if instance._state.adding and not instance.schedule:
+        instance.schedule = ActiveWorkoutProgram.schedule_of(instance.workout_program_id)
+
+
+@receiver(post_save, sender=ProgramDay)
+@receiver(post_delete, sender=ProgramDay)
+def program_day_changed(sender, instance, **kwargs):
+    if instance.workout_program_id in replacing_program_ids.get():
+        return
+    ActiveWorkoutProgram.refresh_schedules(instance.workout_program_id)
+
+
+# Cached responses, see fitness.caching
+
+@receiver(post_save, sender=ActiveWorkoutProgram)
+@receiver(post_delete, sender=ActiveWorkoutProgram)
+def active_program_changed(sender, instance, **kwargs):
+    invalidate(ACTIVE_PROGRAMS, instance.user_id)
+
+
+@receiver(post_save, sender=DietLogItem)
+@receiver(post_delete, sender=DietLogItem)
+def diet_log_item_changed(sender, instance, **kwargs):
+    invalidate(DIET_LOG_ITEMS, instance.user_id)
+
+
+@receiver(post_save, sender=LoggedWorkout)
+@receiver(post_delete, sender=LoggedWorkout)
+def logged_workout_changed(sender, instance, **kwargs):
+    invalidate(LOGGED_WORKOUTS, instance.user_id)
+
+
+@receiver(post_save, sender=Workout)
+@receiver(post_delete, sender=Workout)
+@receiver(post_save, sender=WorkoutExercise)
+@receiver(post_delete, sender=WorkoutExercise)
+def workout_changed(sender, **kwargs):
+    invalidate(WORKOUTS)
+    forget_featured()
+
+
+@receiver(post_save, sender=FeaturedWorkout)
+@receiver(post_delete, sender=FeaturedWorkout)
+def featured_workout_changed(sender, instance, **kwargs):
+    forget_featured(instance.date)
+
+
+@receiver(post_save, sender=WorkoutProgram)
+@receiver(post_delete, sender=WorkoutProgram)
+@receiver(post_save, sender=ProgramDay)
+@receiver(post_delete, sender=ProgramDay)
+def workout_program_changed(sender, **kwargs):
+    invalidate(WORKOUT_PROGRAMS)
@@ -0,0 +1,44 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .authentication import token_cache_key
+from .user_manager import UserProfile
+
+
+class CachedTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create_user(email="test@example.com", password="password", age=30)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def profile_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/profile/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_cached_token_saves_the_lookup_query(self):
+        first = self.profile_queries()
+        self.assertEqual(self.profile_queries(), first - 1)
+        self.assertNotIn(self.token.key, token_cache_key(self.token.key))
+
+    def test_invalid_token_is_not_cached(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        self.assertEqual(self.client.get('/api/v1/profile/').status_code, 401)
+        self.assertIsNone(cache.get(token_cache_key("invalid")))
+
+    def test_profile_update_refreshes_cached_user(self):
+        self.profile_queries()
+        response = self.client.put('/api/v1/profile/', {'age': 31}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/v1/profile/').data['age'], 31)
+
+    def test_logout_revokes_cached_token(self):
+        self.profile_queries()
+        self.assertEqual(self.client.post('/api/v1/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/v1/profile/').status_code, 401)
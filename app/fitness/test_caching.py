@@ -0,0 +1,64 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from .models import DietLogItem, Workout
+from .user_manager import UserProfile
+
+
+class ViewCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def get(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def log_meal(self, user, calories):
+        DietLogItem.objects.create(
+            user=user, food_name="Oatmeal", food_calories=calories, protein_grams=10, carbs_grams=50,
+            fat_grams=5, log_time=now()
+        )
+
+    def test_per_user_cache_is_invalidated_by_the_users_logs(self):
+        self.log_meal(self.user, 300)
+        data, queries = self.get('/api/v1/stats/calories_eaten/')
+        self.assertEqual(data['calories_eaten_today'], 300)
+        self.assertEqual(self.get('/api/v1/stats/calories_eaten/'), (data, 0))
+
+        # Another user's meal leaves the cached response alone
+        other = UserProfile.objects.create(email="other@example.com")
+        self.log_meal(other, 500)
+        self.assertEqual(self.get('/api/v1/stats/calories_eaten/')[1], 0)
+
+        self.log_meal(self.user, 200)
+        self.assertEqual(self.get('/api/v1/stats/calories_eaten/')[0]['calories_eaten_today'], 500)
+
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.get('/api/v1/stats/calories_eaten/')[0]['calories_eaten_today'], 500)
+
+    def test_shared_cache_is_invalidated_by_model_changes(self):
+        workout = Workout.objects.create(name="Leg Day", body_part="upper legs", image_url="http://example.com/w.png", description="")
+        data, queries = self.get('/api/v1/workouts/')
+        self.assertGreater(queries, 0)
+        self.assertEqual(self.get('/api/v1/workouts/'), (data, 0))
+
+        workout.name = "Leg Burner"
+        workout.save()
+        self.assertEqual(self.get('/api/v1/workouts/')[0][0]['name'], "Leg Burner")
+
+        workout.delete()
+        self.assertEqual(self.get('/api/v1/workouts/')[0], [])
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.client.get('/api/v1/workouts/1/').status_code, 404)
+        # bulk_create, so no signal invalidates a cached 404
+        Workout.objects.bulk_create([Workout(id=1, name="Leg Day", body_part="upper legs", image_url="http://example.com/w.png", description="")])
+        self.assertEqual(self.client.get('/api/v1/workouts/1/').status_code, 200)
@@ -0,0 +1,340 @@
+import datetime
+import json
+import tempfile
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .catalog_import import iter_json_array
+from .models import (
+    CatalogVersion, DailyUserStats, Exercise, ExerciseInstruction, FeaturedWorkout, LoggedExercise, LoggedWorkout, Muscle,
+    Workout, WorkoutExercise
+)
+from .search import search_exercise_ids_in_database, search_indexes
+from .user_manager import UserProfile
+
+
+def create_exercise(exercise_id, name, secondary_muscles=("hamstrings", "glutes"), instructions=("stand", "squat"), **fields):
+    defaults = {
+        'body_part': "upper legs",
+        'equipment': "barbell",
+        'gif_url': "http://example.com/exercise.gif",
+        'target': "quads",
+    }
+    defaults.update(fields)
+    exercise = Exercise.objects.create(exercise_id=exercise_id, name=name, **defaults)
+    exercise.set_secondary_muscles(secondary_muscles)
+    exercise.set_instructions(instructions)
+    return exercise
+
+
+class ExerciseCatalogCacheTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        create_exercise("0001", "barbell squat")
+        create_exercise("0002", "barbell lunge")
+
+    def test_list_serves_the_catalog(self):
+        response = self.client.get('/api/v1/exercises/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['name'] for item in response.json()], ["barbell squat", "barbell lunge"])
+        self.assertEqual(response.json()[0]['secondaryMuscles'], ["hamstrings", "glutes"])
+        self.assertEqual(response.json()[0]['instructions'], ["stand", "squat"])
+
+    def test_cached_catalog_costs_one_query(self):
+        self.client.get('/api/v1/exercises/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/exercises/')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/exercises/0002/')
+        self.assertEqual(response.json()['name'], "barbell lunge")
+
+    def test_unchanged_catalog_is_not_modified(self):
+        etag = self.client.get('/api/v1/exercises/')['ETag']
+        response = self.client.get('/api/v1/exercises/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_none_match_is_parsed(self):
+        etag = self.client.get('/api/v1/exercises/')['ETag']
+        for header in (f'"stale", {etag}', f'W/{etag}', '*'):
+            self.assertEqual(self.client.get('/api/v1/exercises/', HTTP_IF_NONE_MATCH=header).status_code, 304)
+        # Holds the ETag as a substring only
+        self.assertEqual(self.client.get('/api/v1/exercises/', HTTP_IF_NONE_MATCH=f'"{etag}"').status_code, 200)
+
+    def test_writes_invalidate_the_catalog(self):
+        etag = self.client.get('/api/v1/exercises/')['ETag']
+        exercise = Exercise.objects.get(pk="0001")
+        exercise.name = "back squat"
+        exercise.save()
+
+        response = self.client.get('/api/v1/exercises/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], "back squat")
+
+    def test_muscle_and_instruction_edits_invalidate_the_catalog(self):
+        etag = self.client.get('/api/v1/exercises/')['ETag']
+        muscle = Muscle.objects.get(name="glutes")
+        muscle.name = "gluteus maximus"
+        muscle.save()
+        response = self.client.get('/api/v1/exercises/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()[0]['secondaryMuscles'], ["hamstrings", "gluteus maximus"])
+
+        instruction = ExerciseInstruction.objects.get(exercise_id="0001", step=1)
+        instruction.text = "squat deep"
+        instruction.save()
+        self.assertEqual(self.client.get('/api/v1/exercises/0001/').json()['instructions'], ["stand", "squat deep"])
+
+        # The set_* rewrites bump the version once, not once per deleted row
+        exercise = Exercise.objects.get(pk="0001")
+        with mock.patch.object(CatalogVersion, 'bump') as bump:
+            exercise.set_secondary_muscles(["calves"])
+            exercise.set_instructions(["jump"])
+        self.assertEqual(bump.call_count, 2)
+
+    def test_unknown_exercise_is_not_found(self):
+        self.assertEqual(self.client.get('/api/v1/exercises/9999/').status_code, 404)
+
+
+class ExerciseSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        create_exercise("0001", "barbell squat")
+        create_exercise("0002", "barbell lunge", secondary_muscles=["glutes", "calves"])
+        create_exercise("0003", "dumbbell curl", body_part="upper arms", equipment="dumbbell", target="biceps", secondary_muscles=["forearms"])
+        create_exercise("0004", "front squat", secondary_muscles=[])
+
+    def search(self, **params):
+        response = self.client.get('/api/v1/exercises/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, result):
+        return [item['name'] for item in result['results']]
+
+    def test_substring_search(self):
+        self.assertEqual(self.names(self.search(q="SQUAT")), ["barbell squat", "front squat"])
+        self.assertEqual(self.names(self.search(q="ll")), ["barbell lunge", "barbell squat", "dumbbell curl"])
+
+    def test_prefix_search(self):
+        self.assertEqual(self.names(self.search(q="barbell", match="prefix")), ["barbell lunge", "barbell squat"])
+        self.assertEqual(self.search(q="squat", match="prefix")['count'], 0)
+
+    def test_facet_filters_and_counts(self):
+        result = self.search(body_part="Upper Legs", muscle="glutes")
+        self.assertEqual(self.names(result), ["barbell lunge", "barbell squat"])
+        self.assertEqual(result['facets']['muscle'], {"glutes": 2, "hamstrings": 1, "calves": 1})
+        self.assertEqual(self.search()['facets']['equipment'], {"barbell": 3, "dumbbell": 1})
+
+    def test_paging(self):
+        result = self.search(limit=2, offset=1)
+        self.assertEqual(result['count'], 4)
+        self.assertEqual(self.names(result), ["barbell squat", "dumbbell curl"])
+
+    def test_search_is_served_from_the_cache(self):
+        self.search(q="squat")
+        with self.assertNumQueries(1):
+            self.search(q="curl", equipment="dumbbell")
+
+    def test_index_follows_catalog_writes(self):
+        self.search(q="squat")
+        create_exercise("0005", "goblet squat", equipment="kettlebell")
+        self.assertEqual(self.names(self.search(q="squat")), ["barbell squat", "front squat", "goblet squat"])
+
+    def test_muscle_filter_in_the_database(self):
+        self.assertEqual(search_exercise_ids_in_database("", "substring", {'muscle': "glutes"}), ["0002", "0001"])
+        self.assertEqual(search_exercise_ids_in_database("squat", "substring", {'muscle': "glutes"}), ["0001"])
+
+        # Matched regardless of case, like the in-memory index
+        create_exercise("0005", "pull-up", secondary_muscles=["Lats"])
+        self.assertEqual(search_exercise_ids_in_database("", "substring", {'muscle': "lats"}), ["0005"])
+        self.assertEqual(self.names(self.search(muscle="LATS")), ["pull-up"])
+
+    def test_postgres_search_skips_the_in_memory_index(self):
+        expected = self.search(body_part="Upper Legs", muscle="glutes")
+        search_indexes.clear()
+        with mock.patch('fitness.search.connection', SimpleNamespace(vendor='postgresql')):
+            self.assertEqual(self.search(body_part="Upper Legs", muscle="glutes"), expected)
+        self.assertEqual(search_indexes, {})
+
+    def test_related_exercises(self):
+        response = self.client.get('/api/v1/exercises/0002/related/')
+        self.assertEqual([item['exercise_id'] for item in response.json()], ["0001", "0004"])
+        self.assertEqual(self.client.get('/api/v1/exercises/9999/related/').status_code, 404)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/v1/exercises/search/', {'match': "fuzzy"}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/exercises/search/', {'limit': "all"}).status_code, 400)
+
+
+class WorkoutSearchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for name, body_part in (("Leg Day", "upper legs"), ("Leg Burner", "lower legs"), ("Arm Blast", "upper arms")):
+            Workout.objects.create(name=name, body_part=body_part, image_url="http://example.com/w.png", description="")
+
+    def test_search_with_facets(self):
+        response = self.client.get('/api/v1/workouts/search/', {'q': "leg"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual([item['name'] for item in response.json()['results']], ["Leg Burner", "Leg Day"])
+        self.assertEqual(response.json()['facets'], {'body_part': {"lower legs": 1, "upper legs": 1}})
+
+    def test_list_filters_by_body_part(self):
+        response = self.client.get('/api/v1/workouts/', {'body_part': "Upper Legs"})
+        self.assertEqual([item['name'] for item in response.json()], ["Leg Day"])
+
+
+class FeaturedWorkoutTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        exercise = create_exercise("0001", "barbell squat")
+        self.workouts = [
+            Workout.objects.create(name=name, body_part="upper legs", image_url="http://example.com/w.png", description="")
+            for name in ("Leg Day", "Leg Burner", "Squat Day")
+        ]
+        for workout in self.workouts:
+            WorkoutExercise.objects.create(workout=workout, exercise=exercise)
+        self.today = timezone.localdate()
+
+    def test_featured_workout_is_a_cache_read(self):
+        FeaturedWorkout.objects.create(workout=self.workouts[1], date=self.today)
+        self.client.get('/api/v1/workouts/featured-workouts/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/workouts/featured-workouts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], "Leg Burner")
+        self.assertEqual(response.json()['exercises'][0]['name'], "barbell squat")
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('max-age=', response['Cache-Control'])
+
+        not_modified = self.client.get('/api/v1/workouts/featured-workouts/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        stale = self.client.get('/api/v1/workouts/featured-workouts/', HTTP_IF_NONE_MATCH=response['ETag'][:-2] + '"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_writes_invalidate_the_featured_workout(self):
+        self.assertEqual(self.client.get('/api/v1/workouts/featured-workouts/').status_code, 404)
+        featured = FeaturedWorkout.objects.create(workout=self.workouts[0], date=self.today)
+        etag = self.client.get('/api/v1/workouts/featured-workouts/')['ETag']
+
+        self.workouts[0].name = "Leg Day 2"
+        self.workouts[0].save()
+        response = self.client.get('/api/v1/workouts/featured-workouts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['name'], "Leg Day 2")
+
+        featured.workout = self.workouts[2]
+        featured.save()
+        self.assertEqual(self.client.get('/api/v1/workouts/featured-workouts/').json()['name'], "Squat Day")
+
+    def test_deleted_featured_workout_is_not_served(self):
+        featured = FeaturedWorkout.objects.create(workout=self.workouts[0], date=self.today)
+        self.assertEqual(self.client.get('/api/v1/workouts/featured-workouts/').status_code, 200)
+        featured.delete()
+        self.assertEqual(self.client.get('/api/v1/workouts/featured-workouts/').status_code, 404)
+
+        # Deleted with its workout by the cascade
+        FeaturedWorkout.objects.create(workout=self.workouts[1], date=self.today)
+        self.assertEqual(self.client.get('/api/v1/workouts/featured-workouts/').status_code, 200)
+        self.workouts[1].delete()
+        self.assertEqual(self.client.get('/api/v1/workouts/featured-workouts/').status_code, 404)
+
+    def test_one_workout_per_date_and_slot(self):
+        FeaturedWorkout.objects.create(workout=self.workouts[0], date=self.today)
+        FeaturedWorkout.objects.create(workout=self.workouts[1], date=self.today, slot=1)
+        with self.assertRaises(IntegrityError):
+            FeaturedWorkout.objects.create(workout=self.workouts[2], date=self.today)
+
+    def test_schedule_featured_workouts(self):
+        FeaturedWorkout.objects.create(workout=self.workouts[0], date=self.today)
+        stdout = StringIO()
+        call_command('schedule_featured_workouts', '--days', '3', stdout=stdout)
+        self.assertIn("Featured 2 workouts", stdout.getvalue())
+        scheduled = FeaturedWorkout.objects.order_by('date').values_list('date', 'workout__name')
+        # The workouts never featured first
+        self.assertEqual(list(scheduled), [
+            (self.today, "Leg Day"),
+            (self.today + datetime.timedelta(days=1), "Leg Burner"),
+            (self.today + datetime.timedelta(days=2), "Squat Day"),
+        ])
+
+        call_command('schedule_featured_workouts', '--days', '3', stdout=stdout)
+        self.assertEqual(FeaturedWorkout.objects.count(), 3)
+        # Pre-populated with the days
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/workouts/featured-workouts/')
+
+
+def catalog_row(exercise_id, name, **fields):
+    row = {
+        "bodyPart": "waist",
+        "equipment": "body weight",
+        "gifUrl": "http://example.com/exercise.gif",
+        "id": exercise_id,
+        "name": name,
+        "target": "abs",
+        "secondaryMuscles": ["hip flexors", "lower back"],
+        "instructions": ["lie down", "sit up"],
+    }
+    row.update(fields)
+    return row
+
+
+class ImportCatalogTestCase(TestCase):
+    def import_catalog(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as catalog_file:
+            json.dump(rows, catalog_file)
+            catalog_file.flush()
+            stdout = StringIO()
+            call_command('import_catalog', catalog_file.name, '--batch-size', '2', *args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_streams_json_arrays(self):
+        rows = [catalog_row(f"{i:04}", "sit-up \u2728 [a, b]") for i in range(5)]
+        self.assertEqual(list(iter_json_array(StringIO(json.dumps(rows, indent=2)), chunk_size=7)), rows)
+        with self.assertRaises(ValueError):
+            list(iter_json_array(StringIO('[{"id": "0001"}')))
+
+    def test_import_creates_exercises_with_their_lists(self):
+        output = self.import_catalog([catalog_row("0001", "3/4 sit-up"), catalog_row("0002", "air bike"), catalog_row("0003", "crunch")])
+        self.assertIn("3 created, 0 updated, 0 unchanged, 0 invalid", output)
+        exercise = Exercise.objects.get(pk="0001")
+        self.assertEqual(exercise.calories_burned, 200)
+        self.assertEqual(exercise.get_secondary_muscles(), ["hip flexors", "lower back"])
+        self.assertEqual(exercise.get_instructions(), ["lie down", "sit up"])
+
+    def test_reimport_applies_only_the_diff(self):
+        self.import_catalog([catalog_row("0001", "3/4 sit-up"), catalog_row("0002", "air bike")])
+        version = CatalogVersion.current()
+        self.assertIn("0 created, 0 updated, 2 unchanged", self.import_catalog([catalog_row("0001", "3/4 sit-up"), catalog_row("0002", "air bike")]))
+        self.assertEqual(CatalogVersion.current(), version)
+
+        rows = [catalog_row("0001", "half sit-up"), catalog_row("0002", "air bike", secondaryMuscles=["quads"]), {"id": "0003"}]
+        self.assertIn("0 created, 2 updated", self.import_catalog(rows, '--dry-run'))
+        self.assertEqual(Exercise.objects.get(pk="0001").name, "3/4 sit-up")
+
+        output = self.import_catalog(rows, '--show-changes')
+        self.assertIn("0 created, 2 updated, 0 unchanged, 1 invalid", output)
+        self.assertIn("updated 0002: secondary_muscles", output)
+        self.assertEqual(Exercise.objects.get(pk="0001").name, "half sit-up")
+        self.assertEqual(Exercise.objects.get(pk="0002").get_secondary_muscles(), ["quads"])
+        self.assertNotEqual(CatalogVersion.current(), version)
+
+    def test_changed_calories_refresh_the_rollups(self):
+        self.import_catalog([catalog_row("0001", "3/4 sit-up")])
+        logged_workout = LoggedWorkout.objects.create(
+            user=UserProfile.objects.create(email="testuser@example.com"), workout_name="Abs", duration_minutes=10, log_time=timezone.now()
+        )
+        LoggedExercise.objects.create(logged_workout=logged_workout, exercise_id="0001", order=1, sets_completed=1, reps_completed=2)
+        self.assertEqual(DailyUserStats.objects.get().calories_burned, 2 * 200)
+
+        self.import_catalog([catalog_row("0001", "3/4 sit-up", calories_burned=5)])
+        self.assertEqual(DailyUserStats.objects.get().calories_burned, 2 * 5)
@@ -0,0 +1,219 @@
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from . import urls
+from .loadgen import LOAD_PASSWORD, LoadDataGenerator, user_email
+from .models import ActiveWorkoutProgram, DietLogItem, Exercise, FeaturedWorkout, FoodScanJob, LoggedWorkout, Workout, WorkoutProgram
+from .user_manager import UserProfile
+
+# Where the per-route query counts and latencies are written, for tracking over time
+REPORT_PATH = os.environ.get('ENDPOINT_REPORT', os.path.join(tempfile.gettempdir(), 'fitness_endpoint_report.json'))
+
+# (users, days of history per user) of the two generated datasets
+DATASET_SIZES = {'small': (2, 3), 'large': (4, 60)}
+
+
+def api_routes(patterns=urls.urlpatterns):
+    """
+    (url name, HTTP method) of every route in fitness/urls.py, without the
+    format suffix variants of the router.
+    """
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_routes(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and 'format' not in pattern.pattern.regex.groupindex:
+            # A copy: the viewset adds 'head' to its actions on the first request
+            actions = list(getattr(pattern.callback, 'actions', None) or [])
+            if not actions and hasattr(pattern.callback, 'cls'):
+                view_class = pattern.callback.cls
+                actions = [method for method in view_class.http_method_names if hasattr(view_class, method)]
+            elif not actions:
+                actions = pattern.callback.http_methods  # fitness.async_views
+            for method in actions:
+                if method not in ('head', 'options'):
+                    yield pattern.name, method
+
+
+def png_upload():
+    image_file = io.BytesIO()
+    Image.new('RGB', (64, 64), 'red').save(image_file, format='PNG')
+    image_file.name = 'meal.png'
+    image_file.seek(0)
+    return image_file
+
+
+def deactivate_programs(data):
+    ActiveWorkoutProgram.objects.filter(user=data['user']).update(is_active=False)
+
+
+def diet_log_payload(data):
+    return {'food_name': "Oatmeal", 'food_calories': 300, 'protein_grams': 10, 'carbs_grams': 50, 'fat_grams': 5, 'log_time': data['log_time'].isoformat()}
+
+
+def logged_workout_payload(data):
+    return {
+        'workout_name': "Leg Day", 'duration_minutes': 45, 'log_time': data['log_time'].isoformat(),
+        'exercises': [{'exercise_id': data['exercise_id'], 'order': 1, 'sets': 3, 'reps': 10}],
+    }
+
+
+# How to call every route: kwargs for reverse(), query string, payload, payload
+# format and a setup run (and rolled back) before the request.
+ROUTE_CASES = {
+    ('api-root', 'get'): {},
+    ('dietlogitem-list', 'get'): {},
+    ('dietlogitem-list', 'post'): {'payload': diet_log_payload},
+    ('dietlogitem-scan', 'post'): {'payload': lambda data: {'image': png_upload()}, 'format': 'multipart'},
+    ('dietlogitem-scan-cache', 'get'): {},
+    ('dietlogitem-scan-metrics', 'get'): {},
+    ('dietlogitem-scan-result', 'get'): {'kwargs': lambda data: {'job_id': data['job_id']}},
+    ('dietlogitem-detail', 'get'): {'kwargs': lambda data: {'pk': data['diet_log_item_id']}},
+    ('dietlogitem-detail', 'put'): {'kwargs': lambda data: {'pk': data['diet_log_item_id']}, 'payload': diet_log_payload},
+    ('dietlogitem-detail', 'patch'): {'kwargs': lambda data: {'pk': data['diet_log_item_id']}, 'payload': lambda data: {'food_calories': 310}},
+    ('dietlogitem-detail', 'delete'): {'kwargs': lambda data: {'pk': data['diet_log_item_id']}},
+    ('exercise-list', 'get'): {},
+    ('exercise-search', 'get'): {'query': 'q=exercise&muscle=glutes'},
+    ('exercise-detail', 'get'): {'kwargs': lambda data: {'pk': data['exercise_id']}},
+    ('exercise-related', 'get'): {'kwargs': lambda data: {'pk': data['exercise_id']}},
+    ('workout-list', 'get'): {'query': 'q=workout'},
+    ('workout-featured-workouts', 'get'): {},
+    ('workout-search', 'get'): {'query': 'q=workout'},
+    ('workout-detail', 'get'): {'kwargs': lambda data: {'pk': data['workout_id']}},
+    ('workout-subscribe', 'post'): {'kwargs': lambda data: {'pk': data['workout_id']}, 'setup': deactivate_programs},
+    ('workoutprogram-list', 'get'): {},
+    ('workoutprogram-current-program', 'get'): {},
+    ('workoutprogram-todays-workout', 'get'): {},
+    ('workoutprogram-detail', 'get'): {'kwargs': lambda data: {'pk': data['program_id']}},
+    ('workoutprogram-activate', 'post'): {
+        'kwargs': lambda data: {'pk': data['program_id']},
+        'payload': lambda data: {'start_date': timezone.now().isoformat(), 'end_date': (timezone.now() + timedelta(days=30)).isoformat()},
+        'setup': deactivate_programs,
+    },
+    ('workoutprogram-deactivate', 'post'): {'kwargs': lambda data: {'pk': data['program_id']}},
+    ('workoutprogram-templates', 'get'): {},
+    ('workoutprogram-customize', 'post'): {
+        'kwargs': lambda data: {'pk': data['program_id']},
+        'payload': lambda data: {'days': [{'day_of_week': 1, 'workout_id': data['workout_id']}, {'day_of_week': 2, 'workout_id': None}]},
+    },
+    ('loggedworkout-list', 'get'): {},
+    ('loggedworkout-list', 'post'): {'payload': logged_workout_payload},
+    ('loggedworkout-detail', 'get'): {'kwargs': lambda data: {'pk': data['logged_workout_id']}},
+    ('loggedworkout-detail', 'put'): {'kwargs': lambda data: {'pk': data['logged_workout_id']}, 'payload': logged_workout_payload},
+    ('loggedworkout-detail', 'patch'): {'kwargs': lambda data: {'pk': data['logged_workout_id']}, 'payload': lambda data: {'duration_minutes': 50}},
+    ('loggedworkout-detail', 'delete'): {'kwargs': lambda data: {'pk': data['logged_workout_id']}},
+    ('stats-calories-burned', 'get'): {},
+    ('stats-calories-burned-per-day', 'get'): {},
+    ('stats-calories-eaten', 'get'): {},
+    ('stats-calories-eaten-per-day', 'get'): {},
+    ('stats-number-exercises', 'get'): {},
+    ('stats-number-logged-exercises-per-day', 'get'): {},
+    ('signup', 'post'): {'payload': lambda data: {'email': "new-user@example.com", 'password': "secret123"}},
+    ('login', 'post'): {'payload': lambda data: {'email': data['user'].email, 'password': LOAD_PASSWORD}},
+    ('user-profile', 'get'): {},
+    ('user-profile', 'put'): {'payload': lambda data: {'age': 31}},
+    ('logout', 'post'): {},
+    ('profiling', 'get'): {},
+    ('async-dietlogitem-upload', 'post'): {'payload': diet_log_payload, 'format': 'multipart'},
+    ('async-dietlogitem-scan', 'post'): {'payload': lambda data: {'image': png_upload()}, 'format': 'multipart'},
+    ('async-dietlogitem-scan-result', 'get'): {'kwargs': lambda data: {'job_id': data['job_id']}},
+    ('sync', 'post'): {'payload': lambda data: {
+        'logged_workouts': [{**logged_workout_payload(data), 'client_key': "sync-workout"}],
+        'diet_log_items': [{**diet_log_payload(data), 'client_key': "sync-meal"}],
+    }},
+}
+
+
+@override_settings(
+    FOOD_SCANNER='fitness.utils.stub_food_scanner.StubFoodScanner',
+    FOOD_SCAN_RUN_INLINE=True,
+    VIEW_CACHE_TIMEOUT=0,  # Measure the work of the cached views, not the cache hits
+)
+class EndpointQueryCountTestCase(TestCase):
+    """
+    Calls every route in fitness/urls.py as a user of a small and of a large
+    generated dataset, and checks that no route needs more queries for more
+    data. Each request is rolled back, so the routes see the same data.
+    """
+    def setUp(self):
+        cache.clear()
+
+    def dataset(self, prefix, users, days):
+        LoadDataGenerator(prefix=prefix, seed=1).generate(users=users, days=days, catalog_size=30)
+        user = UserProfile.objects.get(email=user_email(prefix, 0))
+        user.is_staff = True  # For the admin-only scan cache and metrics routes
+        user.save()
+        token = Token.objects.create(user=user)
+        Exercise.objects.first().set_secondary_muscles(["glutes"])
+        FeaturedWorkout.objects.update_or_create(date=timezone.localdate(), slot=0, defaults={'workout': Workout.objects.last()})
+        logged_workout = LoggedWorkout.objects.filter(user=user).order_by('-log_time').first()
+        return {
+            'user': user,
+            'token': token.key,
+            # Writes stay on the day of the edited logs, so each refreshes one rollup row
+            'log_time': logged_workout.log_time,
+            'diet_log_item_id': DietLogItem.objects.filter(user=user, log_time__date=logged_workout.log_time.date()).values_list('pk', flat=True).first(),
+            'logged_workout_id': logged_workout.pk,
+            'program_id': WorkoutProgram.objects.filter(user=user).values_list('pk', flat=True).first(),
+            'workout_id': Workout.objects.values_list('pk', flat=True).first(),
+            'exercise_id': Exercise.objects.values_list('pk', flat=True).first(),
+            'job_id': FoodScanJob.objects.create(user=user, status=FoodScanJob.DONE, result={}).id,
+        }
+
+    def call(self, client, name, method, data):
+        case = ROUTE_CASES[(name, method)]
+        path = reverse(name, kwargs=case['kwargs'](data) if 'kwargs' in case else None)
+        if 'query' in case:
+            path = f"{path}?{case['query']}"
+        payload = case['payload'](data) if 'payload' in case else None
+
+        # A fresh user per request, as token authentication would load. The
+        # async views are not DRF views and take the token itself.
+        client.force_authenticate(user=UserProfile.objects.get(pk=data['user'].pk))
+        client.credentials(HTTP_AUTHORIZATION=f"Token {data['token']}")
+        with transaction.atomic():
+            if 'setup' in case:
+                case['setup'](data)
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, payload, format=case.get('format', 'json'))
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 400, f"{method.upper()} {path}: {response.content[:300]!r}")
+        return {'queries': len(queries), 'ms': round(elapsed * 1000, 2)}
+
+    def measure(self, data):
+        client = APIClient()
+        results = {}
+        for name, method in api_routes():
+            self.call(client, name, method, data)  # Warm the in-process caches
+            results[f'{method.upper()} {name}'] = self.call(client, name, method, data)
+        return results
+
+    def test_every_route_has_a_case(self):
+        self.assertEqual(set(api_routes()) - ROUTE_CASES.keys(), set())
+
+    def test_query_counts_do_not_grow_with_data(self):
+        results = {size: self.measure(self.dataset(size, *dimensions)) for size, dimensions in DATASET_SIZES.items()}
+
+        report = {
+            'datasets': {size: {'users': users, 'days': days} for size, (users, days) in DATASET_SIZES.items()},
+            'routes': {route: {size: results[size][route] for size in results} for route in results['small']},
+        }
+        with open(REPORT_PATH, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+        for route, sizes in report['routes'].items():
+            with self.subTest(route=route):
+                self.assertEqual(sizes['large']['queries'], sizes['small']['queries'])
@@ -0,0 +1,32 @@
+from django.test import TestCase
+from .benchmarks import EndpointBenchmark, compare
+from .loadgen import LoadDataGenerator, user_email
+from .models import DailyUserStats, DietLogItem, LoggedWorkout
+from .user_manager import UserProfile
+
+
+class LoadDataTestCase(TestCase):
+    def setUp(self):
+        self.counts = LoadDataGenerator(seed=1).generate(users=2, days=14, catalog_size=20)
+        self.user = UserProfile.objects.get(email=user_email('load', 0))
+
+    def test_generates_history_and_rollups(self):
+        self.assertEqual(self.counts['UserProfile'], 2)
+        self.assertEqual(DietLogItem.objects.filter(user=self.user).count(), 14 * 3)
+        self.assertTrue(LoggedWorkout.objects.filter(user=self.user).exists())
+        self.assertTrue(DailyUserStats.objects.filter(user=self.user, calories_eaten__gt=0).exists())
+
+    def test_benchmark_drives_every_endpoint(self):
+        results = EndpointBenchmark(self.user, iterations=1, warmup=0).run()
+        self.assertIn('loggedworkouts.create', results)
+        self.assertEqual(LoggedWorkout.objects.filter(workout_name="Benchmark workout").count(), 0)
+
+        baseline = {'endpoints': {name: {**result, 'queries': result['queries'] - 1} for name, result in results.items()}}
+        self.assertEqual(len(compare(results, baseline, tolerance=1000)), len(results))
+        self.assertEqual(compare(results, {'endpoints': results}, tolerance=1000), [])
+
+    def test_token_cache_saves_the_authentication_query(self):
+        only = ['stats.number_exercises']
+        cached = EndpointBenchmark(self.user, iterations=1, warmup=1).run(only=only)
+        uncached = EndpointBenchmark(self.user, iterations=1, warmup=1, token_cache=False).run(only=only)
+        self.assertEqual(uncached['stats.number_exercises']['queries'], cached['stats.number_exercises']['queries'] + 1)
@@ -0,0 +1,219 @@
+import datetime
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from .models import DailyUserStats, DietLogItem, Exercise, LoggedExercise, LoggedWorkout
+from .user_manager import UserProfile
+
+
+class LogHistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.start = now() - datetime.timedelta(days=10)
+        for day in range(10):
+            DietLogItem.objects.create(
+                user=self.user,
+                food_name=f"Meal {day}",
+                food_calories=100,
+                protein_grams=1,
+                carbs_grams=1,
+                fat_grams=1,
+                log_time=self.start + datetime.timedelta(days=day)
+            )
+            LoggedWorkout.objects.create(
+                user=self.user,
+                workout_name=f"Workout {day}",
+                duration_minutes=30,
+                log_time=self.start + datetime.timedelta(days=day)
+            )
+
+    def test_cursor_pagination_walks_history_newest_first(self):
+        for url in ('/api/v1/dietlogitems/', '/api/v1/loggedworkouts/'):
+            names = []
+            next_url = f'{url}?page_size=4'
+            while next_url:
+                response = self.client.get(next_url)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(response.data['results']), 4)
+                names += [item['log_time'] for item in response.data['results']]
+                next_url = response.data['next']
+            self.assertEqual(len(names), 10)
+            self.assertEqual(names, sorted(names, reverse=True))
+
+    def test_since_and_until_filter_by_log_time(self):
+        since = (self.start + datetime.timedelta(days=3)).isoformat()
+        until = (self.start + datetime.timedelta(days=6)).isoformat()
+        response = self.client.get('/api/v1/dietlogitems/', {'since': since, 'until': until})
+        self.assertEqual(
+            [item['food_name'] for item in response.data['results']],
+            ['Meal 5', 'Meal 4', 'Meal 3']
+        )
+
+    def test_invalid_since_is_rejected(self):
+        response = self.client.get('/api/v1/loggedworkouts/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('since', response.data)
+
+    def test_impossible_dates_are_rejected(self):
+        response = self.client.get('/api/v1/dietlogitems/', {'until': '2024-02-30T00:00:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('until', response.data)
+
+
+class ExerciseCatalogTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(12):
+            Exercise.objects.create(
+                body_part="legs",
+                equipment="dumbbell",
+                gif_url="http://example.com/exercise.gif",
+                exercise_id=f"ex{i}",
+                name=f"Exercise {i}",
+                target="quads",
+                calories_burned=2
+            )
+
+
+class LogWorkoutTestCase(ExerciseCatalogTestCase):
+    def log_workout(self, exercise_ids):
+        return self.client.post('/api/v1/loggedworkouts/', {
+            'workout_name': "Leg Day",
+            'duration_minutes': 45,
+            'log_time': now().isoformat(),
+            'exercises': [
+                {'exercise_id': exercise_id, 'order': i + 1, 'sets': 3, 'reps': 10, 'weight_in_kg': 20}
+                for i, exercise_id in enumerate(exercise_ids)
+            ],
+        }, format='json')
+
+    def test_log_workout_creates_exercises(self):
+        response = self.log_workout(["ex0", "ex1"])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['exercises']), 2)
+        self.assertEqual(LoggedExercise.objects.filter(logged_workout_id=response.data['id']).count(), 2)
+        self.assertEqual(DailyUserStats.objects.get(user=self.user).calories_burned, 2 * 3 * 10 * 2)
+
+    def test_log_workout_query_count_is_constant(self):
+        # The first workout of the day creates the rollup row; later ones update it
+        self.log_workout(["ex0"])
+        with CaptureQueriesContext(connection) as small:
+            self.log_workout(["ex0"])
+        with CaptureQueriesContext(connection) as large:
+            self.log_workout([f"ex{i}" for i in range(12)])
+        self.assertEqual(len(small), len(large))
+
+    def test_unknown_exercise_ids_are_reported_together(self):
+        response = self.log_workout(["ex0", "nope", "missing"])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['unknown_exercise_ids'], ["missing", "nope"])
+        self.assertFalse(LoggedWorkout.objects.exists())
+        self.assertFalse(LoggedExercise.objects.exists())
+
+    def test_invalid_exercise_payload_is_rejected(self):
+        response = self.client.post('/api/v1/loggedworkouts/', {
+            'workout_name': "Leg Day",
+            'duration_minutes': 45,
+            'log_time': now().isoformat(),
+            'exercises': [{'exercise_id': "ex0"}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(LoggedWorkout.objects.exists())
+
+
+class SyncTestCase(ExerciseCatalogTestCase):
+    def batch(self):
+        return {
+            'logged_workouts': [
+                {
+                    'client_key': "workout-1",
+                    'workout_name': "Leg Day",
+                    'duration_minutes': 45,
+                    'log_time': now().isoformat(),
+                    'exercises': [{'exercise_id': "ex0", 'order': 1, 'sets': 3, 'reps': 10}],
+                },
+                {
+                    'client_key': "workout-2",
+                    'workout_name': "Broken",
+                    'duration_minutes': 30,
+                    'log_time': now().isoformat(),
+                    'exercises': [{'exercise_id': "nope", 'order': 1, 'sets': 3, 'reps': 10}],
+                },
+                {'client_key': "workout-3", 'workout_name': "No duration"},
+            ],
+            'diet_log_items': [
+                {
+                    'client_key': "meal-1",
+                    'food_name': "Apple",
+                    'food_calories': 95,
+                    'protein_grams': 0.3,
+                    'carbs_grams': 25,
+                    'fat_grams': 0.2,
+                    'log_time': now().isoformat(),
+                },
+            ],
+        }
+
+    def sync(self, batch):
+        response = self.client.post('/api/v1/sync/', batch, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_sync_reports_per_item_results(self):
+        results = self.sync(self.batch())
+        workouts = results['logged_workouts']
+        self.assertEqual([result['status'] for result in workouts], ['created', 'invalid', 'invalid'])
+        self.assertEqual(workouts[1]['errors'], {'unknown_exercise_ids': ["nope"]})
+        self.assertIn('duration_minutes', workouts[2]['errors'])
+        self.assertEqual(results['diet_log_items'][0]['status'], 'created')
+
+        logged_workout = LoggedWorkout.objects.get(pk=workouts[0]['id'])
+        self.assertEqual(logged_workout.loggedexercise_set.count(), 1)
+        stats = DailyUserStats.objects.get(user=self.user)
+        self.assertEqual((stats.calories_eaten, stats.exercises_logged), (95, 1))
+
+    def test_sync_body_must_be_an_object(self):
+        response = self.client.post('/api/v1/sync/', [self.batch()], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sync_retries_are_idempotent(self):
+        first = self.sync(self.batch())
+        second = self.sync(self.batch())
+        self.assertEqual(second['logged_workouts'][0], {'client_key': "workout-1", 'status': 'existing', 'id': first['logged_workouts'][0]['id']})
+        self.assertEqual(second['diet_log_items'][0]['status'], 'existing')
+        self.assertEqual(LoggedWorkout.objects.count(), 1)
+        self.assertEqual(DietLogItem.objects.count(), 1)
+
+    def test_repeated_keys_in_one_batch_are_written_once(self):
+        batch = self.batch()
+        batch['diet_log_items'].append(dict(batch['diet_log_items'][0]))
+        results = self.sync(batch)['diet_log_items']
+        self.assertEqual([result['status'] for result in results], ['created', 'existing'])
+        self.assertEqual(results[0]['id'], results[1]['id'])
+        self.assertEqual(DietLogItem.objects.count(), 1)
+
+    def test_sync_query_count_does_not_grow_with_batch_size(self):
+        def batch(size):
+            return {'logged_workouts': [
+                {
+                    'client_key': f"{size}-{i}",
+                    'workout_name': "Leg Day",
+                    'duration_minutes': 45,
+                    'log_time': now().isoformat(),
+                    'exercises': [{'exercise_id': f"ex{j}", 'order': j, 'sets': 3, 'reps': 10} for j in range(3)],
+                }
+                for i in range(size)
+            ]}
+
+        self.sync(batch(1))
+        with CaptureQueriesContext(connection) as small:
+            self.sync(batch(2))
+        with CaptureQueriesContext(connection) as large:
+            self.sync(batch(20))
+        self.assertEqual(len(small), len(large))
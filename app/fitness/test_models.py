@@ -19,10 +19,10 @@ class ModelsTestCase(TestCase):
             exercise_id="ex1",
             name="Squat",
             target="quads",
-            calories_burned=300,
-            secondary_muscles="hamstrings;glutes",
-            instructions="stand;lift;squat"
+            calories_burned=300
         )
+        self.exercise.set_secondary_muscles(["hamstrings", "glutes"])
+        self.exercise.set_instructions(["stand", "lift", "squat"])
         self.workout = Workout.objects.create(
             name="Leg Day",
             image_url="http://example.com/workout.jpg",
@@ -63,14 +63,17 @@ class ModelsTestCase(TestCase):
         self.assertListEqual(muscles, ["hamstrings", "glutes"])
 
         self.exercise.set_secondary_muscles(["calves", "hamstrings"])
-        self.assertEqual(self.exercise.secondary_muscles, "calves;hamstrings")
+        self.assertListEqual(self.exercise.get_secondary_muscles(), ["calves", "hamstrings"])
+        self.assertListEqual(
+            list(Exercise.objects.filter(secondary_muscles__name="calves").values_list('name', flat=True)), ["Squat"]
+        )
 
     def test_exercise_instructions(self):
         instructions = self.exercise.get_instructions()
         self.assertListEqual(instructions, ["stand", "lift", "squat"])
 
         self.exercise.set_instructions(["step1", "step2"])
-        self.assertEqual(self.exercise.instructions, "step1;step2")
+        self.assertListEqual(self.exercise.get_instructions(), ["step1", "step2"])
 
     # Test Workout model
     def test_workout_creation(self):
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import DietLogItem
+from .profiling import histograms, instrument_connection, record_sql, span
+from .user_manager import UserProfile
+from django.utils.timezone import now
+
+
+@override_settings(PROFILING_ENABLED=True)
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Installed on new connections at startup only when PROFILING_ENABLED is set
+        if record_sql not in connection.execute_wrappers:
+            instrument_connection(None, connection)
+            self.addCleanup(connection.execute_wrappers.remove, record_sql)
+        self.user = UserProfile.objects.create(email="admin@example.com", is_staff=True)
+        self.client = APIClient()
+        # A real token, as force_authenticate skips the timed authentication classes
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+        DietLogItem.objects.create(
+            user=self.user, food_name="Apple", food_calories=95, protein_grams=0.3, carbs_grams=25, fat_grams=0.2, log_time=now()
+        )
+        # Caches the token, so the requests below make the one query of the list
+        self.client.get('/api/v1/dietlogitems/')
+        histograms.reset()
+
+    def test_server_timing_breaks_down_the_request(self):
+        response = self.client.get('/api/v1/dietlogitems/')
+        timing = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertIn('desc="1 calls"', timing['sql'])
+        self.assertIn('serialize', timing)
+        self.assertIn('auth', timing)
+        self.assertIn('total', timing)
+
+    def test_histograms_per_url_name(self):
+        for _ in range(3):
+            self.client.get('/api/v1/dietlogitems/')
+        snapshot = self.client.get('/api/v1/profiling/').json()
+        route = snapshot['dietlogitem-list']
+        self.assertEqual(route['requests'], 3)
+        self.assertEqual(sum(route['histogram_ms'].values()), 3)
+        self.assertEqual(route['spans']['sql']['calls_per_request'], 1)
+
+    def test_spans_outside_requests_are_free(self):
+        with span('external'):
+            pass
+
+    def test_slow_sampled_requests_are_dumped(self):
+        with tempfile.TemporaryDirectory() as dump_dir:
+            with override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_SLOW_MS=0, PROFILING_DUMP_DIR=dump_dir):
+                self.client.get('/api/v1/dietlogitems/')
+            dumps = os.listdir(dump_dir)
+            self.assertEqual(len(dumps), 1)
+            self.assertTrue(dumps[0].startswith('dietlogitem-list-'))
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/v1/dietlogitems/'))
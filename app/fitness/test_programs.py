@@ -0,0 +1,256 @@
+import datetime
+from zoneinfo import ZoneInfo
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from .models import (
+    Exercise, Workout, WorkoutExercise, WorkoutProgram, ProgramDay, ActiveWorkoutProgram
+)
+from .user_manager import UserProfile
+from .utils.get_current_day import get_current_day, seconds_until_midnight
+
+
+class ProgramTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_program(self, days, exercises_per_workout):
+        program = WorkoutProgram.objects.create(user=self.user, name="Program", description="")
+        for day in range(days):
+            workout = Workout.objects.create(
+                name=f"Workout {day}",
+                image_url="http://example.com/workout.jpg",
+                description="",
+                body_part="legs"
+            )
+            for i in range(exercises_per_workout):
+                exercise = Exercise.objects.create(
+                    body_part="legs",
+                    equipment="dumbbell",
+                    gif_url="http://example.com/exercise.gif",
+                    exercise_id=f"{program.id}-{day}-{i}",
+                    name=f"Exercise {i}",
+                    target="quads"
+                )
+                WorkoutExercise.objects.create(workout=workout, exercise=exercise, order=i + 1)
+            ProgramDay.objects.create(workout_program=program, workout=workout, day_of_week=day)
+        return program
+
+    def activate(self, program):
+        ActiveWorkoutProgram.objects.filter(user=self.user).update(is_active=False)
+        ActiveWorkoutProgram.objects.create(
+            workout_program=program,
+            user=self.user,
+            start_date=now(),
+            end_date=now() + datetime.timedelta(days=30)
+        )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+
+class WorkoutProgramQueryCountTestCase(ProgramTestCase):
+    def test_program_endpoints_use_a_fixed_number_of_queries(self):
+        small = self.create_program(days=1, exercises_per_workout=1)
+        self.activate(small)
+        small_counts = {
+            'list': self.count_queries('/api/v1/workoutprograms/'),
+            'retrieve': self.count_queries(f'/api/v1/workoutprograms/{small.id}/'),
+            'current_program': self.count_queries('/api/v1/workoutprograms/current_program/'),
+        }
+
+        large = self.create_program(days=7, exercises_per_workout=5)
+        self.activate(large)
+        large_counts = {
+            'list': self.count_queries('/api/v1/workoutprograms/'),
+            'retrieve': self.count_queries(f'/api/v1/workoutprograms/{large.id}/'),
+            'current_program': self.count_queries('/api/v1/workoutprograms/current_program/'),
+        }
+
+        self.assertEqual(small_counts, large_counts)
+        self.assertEqual(large_counts['retrieve'], 3)
+
+    def test_todays_workout_uses_a_fixed_number_of_queries(self):
+        self.activate(self.create_program(days=7, exercises_per_workout=1))
+        small = self.count_queries('/api/v1/workoutprograms/todays_workout/')
+        self.activate(self.create_program(days=7, exercises_per_workout=8))
+        large = self.count_queries('/api/v1/workoutprograms/todays_workout/')
+        self.assertEqual(small, large)
+
+    def test_serialized_program_includes_nested_exercises(self):
+        program = self.create_program(days=2, exercises_per_workout=2)
+        response = self.client.get(f'/api/v1/workoutprograms/{program.id}/')
+        days = response.data['days']
+        self.assertEqual(len(days), 2)
+        self.assertEqual(len(days[0]['workout']['exercises']), 2)
+        self.assertEqual(days[0]['workout']['exercises'][0]['name'], "Exercise 0")
+
+
+class TodaysWorkoutTestCase(ProgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.program = self.create_program(days=7, exercises_per_workout=2)
+        self.activate(self.program)
+
+    def test_workout_of_the_day_in_the_users_timezone(self):
+        # 25 hours apart, so never on the same day
+        for timezone_name in ("Pacific/Kiritimati", "Pacific/Pago_Pago"):
+            self.user.timezone = timezone_name
+            self.user.save()
+            cache.clear()
+            response = self.client.get('/api/v1/workoutprograms/todays_workout/')
+            self.assertEqual(response.data['name'], f"Workout {get_current_day(timezone_name)}")
+            self.assertEqual(response.data['workout_program_id'], self.program.id)
+
+    def test_schedule_follows_program_days(self):
+        day = get_current_day(self.user.timezone)
+        self.assertEqual(self.count_queries('/api/v1/workoutprograms/todays_workout/'), 3)
+        self.assertEqual(self.count_queries('/api/v1/workoutprograms/todays_workout/'), 0)
+
+        ProgramDay.objects.filter(workout_program=self.program, day_of_week=day).delete()
+        self.assertEqual(ActiveWorkoutProgram.objects.get(is_active=True).schedule.get(str(day)), None)
+        # A rest day takes the one query resolving it
+        self.assertEqual(self.count_queries('/api/v1/workoutprograms/todays_workout/'), 1)
+        self.assertEqual(self.client.get('/api/v1/workoutprograms/todays_workout/').data['message'], "Rest day")
+
+        workout = Workout.objects.get(name="Workout 0")
+        ProgramDay.objects.create(workout_program=self.program, workout=workout, day_of_week=day)
+        self.assertEqual(self.client.get('/api/v1/workoutprograms/todays_workout/').data['id'], workout.id)
+
+    def test_cached_until_local_midnight(self):
+        seconds = seconds_until_midnight("Asia/Tokyo")
+        midnight = datetime.datetime.now(ZoneInfo("Asia/Tokyo")) + datetime.timedelta(seconds=seconds)
+        self.assertTrue(0 < seconds <= 24 * 60 * 60)
+        self.assertEqual(midnight.strftime('%H:%M'), "00:00")
+
+    def test_timezone_is_validated(self):
+        response = self.client.put('/api/v1/profile/', {'timezone': "Mars/Olympus_Mons"}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put('/api/v1/profile/', {'timezone': "Europe/Paris"}, format='json')
+        self.assertEqual(response.data['timezone'], "Europe/Paris")
+
+
+class SubscribeTestCase(ProgramTestCase):
+    def setUp(self):
+        super().setUp()
+        program = self.create_program(days=1, exercises_per_workout=2)
+        self.workout = ProgramDay.objects.get(workout_program=program).workout
+
+    def test_subscriptions_share_the_program_template(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/v1/workouts/{self.workout.id}/subscribe/')
+        self.assertEqual(response.status_code, 201)
+        # The workout, its template, the template and its days in one insert, and the active program
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 5)
+
+        active = ActiveWorkoutProgram.objects.get(user=self.user, is_active=True)
+        self.assertEqual(active.workout_program_id, response.data['workout_program_id'])
+        self.assertTrue(active.workout_program.is_template)
+        self.assertEqual(active.schedule, ActiveWorkoutProgram.schedule_of(active.workout_program_id))
+        self.assertEqual(ProgramDay.objects.filter(workout_program_id=active.workout_program_id).count(), 7)
+        self.assertEqual(self.client.get('/api/v1/workoutprograms/todays_workout/').data['id'], self.workout.id)
+
+        other = APIClient()
+        other.force_authenticate(user=UserProfile.objects.create(email="other@example.com"))
+        programs, days = WorkoutProgram.objects.count(), ProgramDay.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            response = other.post(f'/api/v1/workouts/{self.workout.id}/subscribe/')
+        self.assertEqual(response.data['workout_program_id'], active.workout_program_id)
+        self.assertEqual(len([query for query in queries if 'SAVEPOINT' not in query['sql']]), 3)
+        self.assertEqual((WorkoutProgram.objects.count(), ProgramDay.objects.count()), (programs, days))
+
+    def test_second_subscription_is_refused(self):
+        self.client.post(f'/api/v1/workouts/{self.workout.id}/subscribe/')
+        programs = WorkoutProgram.objects.count()
+        response = self.client.post(f'/api/v1/workouts/{self.workout.id}/subscribe/')
+        self.assertEqual(response.status_code, 400)
+        # Rolled back with the refused active program
+        self.assertEqual(WorkoutProgram.objects.count(), programs)
+        self.assertEqual(ActiveWorkoutProgram.objects.filter(user=self.user, is_active=True).count(), 1)
+
+    def test_one_active_program_per_user(self):
+        program = WorkoutProgram.objects.get()
+        self.activate(program)
+        ActiveWorkoutProgram.objects.create(
+            workout_program=program, user=self.user, start_date=now(), end_date=now(), is_active=False
+        )
+        with self.assertRaises(IntegrityError):
+            ActiveWorkoutProgram.objects.create(workout_program=program, user=self.user, start_date=now(), end_date=now())
+
+
+class ProgramTemplateTestCase(ProgramTestCase):
+    def setUp(self):
+        super().setUp()
+        self.own = self.create_program(days=2, exercises_per_workout=1)
+        self.workouts = list(Workout.objects.order_by('pk'))
+        self.template = WorkoutProgram.template_for(self.workouts[0])
+        self.other = WorkoutProgram.objects.create(
+            user=UserProfile.objects.create(email="other@example.com"), name="Other", description=""
+        )
+
+    def test_templates_and_own_programs_are_listed(self):
+        response = self.client.get('/api/v1/workoutprograms/')
+        self.assertEqual({program['id'] for program in response.data}, {self.own.id, self.template.id})
+        self.assertEqual(self.client.get(f'/api/v1/workoutprograms/{self.other.id}/').status_code, 404)
+
+        response = self.client.get('/api/v1/workoutprograms/templates/')
+        self.assertEqual([program['id'] for program in response.data], [self.template.id])
+        self.assertEqual(self.count_queries('/api/v1/workoutprograms/templates/'), 0)
+
+    def test_customizing_a_template_copies_it(self):
+        self.client.post(f'/api/v1/workouts/{self.workouts[0].id}/subscribe/')
+        response = self.client.post(f'/api/v1/workoutprograms/{self.template.id}/customize/', {'days': [
+            {'day_of_week': 1, 'workout_id': self.workouts[1].id},
+            {'day_of_week': 2, 'workout_id': None},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['id'], self.template.id)
+        self.assertEqual(response.data['user'], self.user.id)
+
+        # The template is unchanged for its other subscribers
+        self.assertEqual(set(self.template.days.values_list('workout_id', flat=True)), {self.workouts[0].id})
+        active = ActiveWorkoutProgram.objects.get(user=self.user, is_active=True)
+        self.assertEqual(active.workout_program_id, response.data['id'])
+        self.assertEqual(active.schedule['1'], self.workouts[1].id)
+        self.assertIsNone(active.schedule['2'])
+        self.assertEqual(active.schedule['3'], self.workouts[0].id)
+
+        # Then the copy is changed in place, without refreshing the schedule once per replaced day
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/api/v1/workoutprograms/{active.workout_program_id}/customize/', {'days': [
+                {'day_of_week': 3, 'workout_id': self.workouts[1].id},
+            ]}, format='json')
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(response.data['id'], active.workout_program_id)
+        self.assertEqual(WorkoutProgram.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(ActiveWorkoutProgram.objects.get(pk=active.pk).schedule['3'], self.workouts[1].id)
+
+        # A customize that lost the race to the copy finds no active program of the template
+        response = self.client.post(f'/api/v1/workoutprograms/{self.template.id}/customize/', {'days': [
+            {'day_of_week': 1, 'workout_id': None},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(WorkoutProgram.objects.filter(user=self.user).count(), 2)
+
+    def test_customize_validates_the_days(self):
+        self.activate(self.own)
+        response = self.client.post(f'/api/v1/workoutprograms/{self.own.id}/customize/', {'days': [
+            {'day_of_week': 7, 'workout_id': self.workouts[0].id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(f'/api/v1/workoutprograms/{self.own.id}/customize/', {'days': [
+            {'day_of_week': 1, 'workout_id': 0},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(f'/api/v1/workoutprograms/{self.template.id}/customize/', {'days': [
+            {'day_of_week': 1, 'workout_id': None},
+        ]}, format='json').status_code, 400)
@@ -0,0 +1,311 @@
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from .models import DietLogItem, FoodScanCacheEntry, FoodScanJob
+from .scan_jobs import run_scan_job
+from .user_manager import UserProfile
+from .utils.food_scan_cache import FoodScanCache
+from .utils.gpt_food_scanner import GPTFoodScanner
+from .utils.image_pipeline import SCAN_SIZE, THUMBNAIL_SIZE, image_data_url, load_image, prepare_scan_image
+
+STUB_SCANNER = 'fitness.utils.stub_food_scanner.StubFoodScanner'
+
+
+def image_upload(name='meal.jpg', size=(640, 480), format='JPEG', color=(200, 120, 40)):
+    buffered = BytesIO()
+    Image.new('RGB', size, color).save(buffered, format=format)
+    return SimpleUploadedFile(name, buffered.getvalue(), content_type=f'image/{format.lower()}')
+
+
+@override_settings(FOOD_SCANNER=STUB_SCANNER)
+class FoodScanJobTestCase(TestCase):
+    def setUp(self):
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_scan_returns_a_job_immediately(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/v1/dietlogitems/scan/', {'image': image_upload()})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], FoodScanJob.PENDING)
+        # The job is handed to the worker pool only once the request's transaction commits
+        self.assertEqual(len(callbacks), 1)
+
+        response = self.client.get(f"/api/v1/dietlogitems/scan/{response.data['job_id']}/")
+        self.assertEqual(response.data['status'], FoodScanJob.PENDING)
+
+    @override_settings(FOOD_SCAN_RUN_INLINE=True)
+    def test_scan_result_can_be_polled(self):
+        response = self.client.post('/api/v1/dietlogitems/scan/', {'image': image_upload()})
+        response = self.client.get(f"/api/v1/dietlogitems/scan/{response.data['job_id']}/", {'wait': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], FoodScanJob.DONE)
+        self.assertEqual(response.data['result']['food_name'], "Stub meal")
+
+    def test_failed_scan_reports_the_error(self):
+        job = FoodScanJob.objects.create(user=self.user)
+        run_scan_job(job.id, b"not an image")
+        job.refresh_from_db()
+        self.assertEqual(job.status, FoodScanJob.FAILED)
+        self.assertIn("Failed to analyze the image", job.error)
+
+    def test_unexpected_scanner_errors_fail_the_job(self):
+        job = FoodScanJob.objects.create(user=self.user)
+        scanner = SimpleNamespace(analyze_food_image=lambda image: {}["missing"])
+        with mock.patch('fitness.scan_jobs.get_food_scanner', return_value=scanner), self.assertLogs('fitness.scan_jobs'):
+            run_scan_job(job.id, b"image")
+        job.refresh_from_db()
+        self.assertEqual(job.status, FoodScanJob.FAILED)
+        self.assertIn("missing", job.error)
+
+    @override_settings(FOOD_SCAN_SYNC_MAX_WAIT=0.3, FOOD_SCAN_POLL_INTERVAL=0.05)
+    def test_sync_wait_is_capped(self):
+        job = FoodScanJob.objects.create(user=self.user)
+        started = time.monotonic()
+        response = self.client.get(f"/api/v1/dietlogitems/scan/{job.id}/", {'wait': 20})
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(response.data['status'], FoodScanJob.PENDING)
+
+    def test_jobs_of_other_users_are_hidden(self):
+        other = UserProfile.objects.create(email="other@example.com")
+        job = FoodScanJob.objects.create(user=other)
+        response = self.client.get(f"/api/v1/dietlogitems/scan/{job.id}/")
+        self.assertEqual(response.status_code, 404)
+
+    def test_job_ids_must_be_uuids(self):
+        for job_id in ('abc', '-', '0' * 36):
+            self.assertEqual(self.client.get(f"/api/v1/dietlogitems/scan/{job_id}/").status_code, 404)
+
+    def test_scan_requires_an_image(self):
+        response = self.client.post('/api/v1/dietlogitems/scan/', {})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(FOOD_SCANNER=STUB_SCANNER, FOOD_SCAN_RUN_INLINE=True, PROFILING_ENABLED=True)
+class AsyncScanViewTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_scan_awaits_the_result(self):
+        response = self.client.post('/api/v1/async/dietlogitems/scan/?wait=5', {'image': image_upload()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result']['food_name'], "Stub meal")
+
+        response = self.client.get(f"/api/v1/async/dietlogitems/scan/{response.json()['job_id']}/", {'wait': 1})
+        self.assertEqual(response.json()['status'], FoodScanJob.DONE)
+
+    def test_scan_checks_input_and_credentials(self):
+        self.assertEqual(self.client.post('/api/v1/async/dietlogitems/scan/', {}).status_code, 400)
+        self.assertEqual(self.client.post('/api/v1/async/dietlogitems/scan/?wait=x', {'image': image_upload()}).status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/async/dietlogitems/scan/').status_code, 405)
+
+        other = UserProfile.objects.create(email="other@example.com")
+        job = FoodScanJob.objects.create(user=other)
+        self.assertEqual(self.client.get(f"/api/v1/async/dietlogitems/scan/{job.id}/").status_code, 404)
+
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        self.assertEqual(self.client.post('/api/v1/async/dietlogitems/scan/', {'image': image_upload()}).status_code, 401)
+
+    def test_upload_logs_the_meal_with_a_thumbnail(self):
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post('/api/v1/async/dietlogitems/', {
+                'food_name': "Oatmeal", 'food_calories': 300, 'protein_grams': 10, 'carbs_grams': 50, 'fat_grams': 5,
+                'log_time': timezone.now().isoformat(), 'image': image_upload(),
+            })
+        self.assertEqual(response.status_code, 201)
+        item = DietLogItem.objects.get(pk=response.json()['id'])
+        self.assertEqual(item.user, self.user)
+        self.assertTrue(item.thumbnail)
+
+        response = self.client.post('/api/v1/async/dietlogitems/', {'food_name': "Oatmeal"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('food_calories', response.json())
+
+    async def test_served_natively_by_the_asgi_handler(self):
+        response = await self.async_client.post(
+            '/api/v1/async/dietlogitems/scan/?wait=5', {'image': image_upload()},
+            headers={'Authorization': f'Token {self.token.key}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+
+class FakeOpenAIClient:
+    """Stands in for the OpenAI client, answering every completion with the same JSON."""
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = json.dumps({"food_name": "Apple", "calories": 95})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class FoodScanCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = FakeOpenAIClient()
+        self.scanner = GPTFoodScanner(client=self.client, cache=FoodScanCache(max_entries=2, ttl=60))
+
+    def test_rescans_are_served_from_the_cache(self):
+        first = self.scanner.analyze_food_image(image_upload(format='PNG'))
+        # The same picture uploaded at another resolution normalizes to the same pixels
+        second = self.scanner.analyze_food_image(image_upload(size=(1280, 960), format='PNG'))
+        self.assertEqual(first, second)
+        self.assertEqual(self.client.calls, 1)
+        self.assertEqual(FoodScanCacheEntry.objects.get().hits, 1)
+        # Counted in the database, shared by every worker rather than in a per-process cache
+        cache.clear()
+        stats = FoodScanCache().stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+
+    def test_expired_entries_are_rescanned(self):
+        self.scanner.analyze_food_image(image_upload())
+        FoodScanCacheEntry.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+        self.scanner.analyze_food_image(image_upload())
+        self.assertEqual(self.client.calls, 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for color in [(255, 0, 0), (0, 255, 0), (0, 0, 255)]:
+            self.scanner.analyze_food_image(image_upload(color=color))
+            FoodScanCacheEntry.objects.update(last_used_at=F('last_used_at') - timedelta(seconds=10))
+        self.assertEqual(FoodScanCacheEntry.objects.count(), 2)
+
+        self.scanner.analyze_food_image(image_upload(color=(255, 0, 0)))
+        self.assertEqual(self.client.calls, 4)
+
+
+class ImagePipelineTestCase(TestCase):
+    def test_jpeg_is_decoded_at_reduced_resolution(self):
+        image = load_image(image_upload(size=(4032, 3024)), SCAN_SIZE)
+        self.assertEqual(image.size, (504, 378))
+        self.assertEqual(prepare_scan_image(image_upload(size=(4032, 3024))).size, SCAN_SIZE)
+
+    def test_exif_orientation_is_applied(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90 degrees
+        buffered = BytesIO()
+        Image.new('RGB', (640, 480)).save(buffered, format='JPEG', exif=exif)
+        image = load_image(BytesIO(buffered.getvalue()), THUMBNAIL_SIZE)
+        self.assertEqual(image.size, (480, 640))
+
+    def test_scan_payload_is_a_compact_jpeg(self):
+        url = image_data_url(prepare_scan_image(image_upload(format='PNG')))
+        self.assertTrue(url.startswith('data:image/jpeg;base64,'))
+
+    def test_diet_log_item_upload_gets_a_thumbnail(self):
+        user = UserProfile.objects.create(email="testuser@example.com")
+        client = APIClient()
+        client.force_authenticate(user=user)
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            response = client.post('/api/v1/dietlogitems/', {
+                'image': image_upload(size=(2000, 1000)),
+                'food_name': "Apple",
+                'food_calories': 95,
+                'protein_grams': 0.3,
+                'carbs_grams': 25,
+                'fat_grams': 0.2,
+                'log_time': timezone.now().isoformat(),
+            })
+            self.assertEqual(response.status_code, 201)
+            item = DietLogItem.objects.get()
+            with Image.open(item.thumbnail.path) as thumbnail:
+                self.assertEqual(thumbnail.size, (320, 160))
+            with Image.open(item.image.path) as image:
+                self.assertEqual(image.size, (2000, 1000))
+
+
+class StubOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat completions like the OpenAI API, failing the first `failures` requests."""
+    protocol_version = 'HTTP/1.1'  # Keep connections alive
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers['Content-Length']))
+        server.connections.add(self.client_address)
+        server.requests += 1
+        if server.requests <= server.failures:
+            self.reply(500, {"error": {"message": "try again", "type": "server_error"}})
+            return
+        self.reply(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps({"food_name": "Apple", "calories": 95})},
+            }],
+        })
+
+    def reply(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledScannerTestCase(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOpenAIHandler)
+        self.server.connections = set()
+        self.server.requests = 0
+        self.server.failures = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        settings = override_settings(
+            OPENAI_API_KEY='test',
+            OPENAI_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}/v1',
+            OPENAI_RETRY_BACKOFF=0,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.scanner = GPTFoodScanner()
+
+    def test_scans_reuse_one_connection(self):
+        for color in [(255, 0, 0), (0, 255, 0), (0, 0, 255)]:
+            self.assertEqual(self.scanner.analyze_food_image(image_upload(color=color))['food_name'], "Apple")
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.scanner.metrics.snapshot()['calls'], 3)
+
+    def test_transient_errors_are_retried(self):
+        self.server.failures = 2
+        self.assertEqual(self.scanner.analyze_food_image(image_upload())['food_name'], "Apple")
+        metrics = self.scanner.metrics.snapshot()
+        self.assertEqual((metrics['calls'], metrics['failures']), (3, 2))
+
+    @override_settings(OPENAI_MAX_RETRIES=1)
+    def test_persistent_errors_fail_the_scan(self):
+        self.server.failures = 5
+        with self.assertRaises(RuntimeError):
+            self.scanner.analyze_food_image(image_upload())
+        self.assertEqual(self.server.requests, 2)
@@ -0,0 +1,174 @@
+import datetime
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from .models import DailyUserStats, DietLogItem, Exercise, LoggedWorkout, LoggedExercise
+from .rollups import deleting_logged_workout
+from .user_manager import UserProfile
+
+
+class StatsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = UserProfile.objects.create(email="testuser@example.com")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.exercise = Exercise.objects.create(
+            body_part="legs",
+            equipment="dumbbell",
+            gif_url="http://example.com/exercise.gif",
+            exercise_id="ex1",
+            name="Squat",
+            target="quads",
+            calories_burned=1.5
+        )
+
+    def log_exercises(self, count, log_time=None):
+        logged_workout = LoggedWorkout.objects.create(
+            user=self.user,
+            workout_name="Morning Workout",
+            duration_minutes=45,
+            log_time=log_time or now()
+        )
+        for i in range(count):
+            LoggedExercise.objects.create(
+                logged_workout=logged_workout,
+                exercise=self.exercise,
+                order=i + 1,
+                sets_completed=3,
+                reps_completed=10
+            )
+        return logged_workout
+
+    def log_meal(self, calories, log_time=None):
+        return DietLogItem.objects.create(
+            user=self.user,
+            food_name="Apple",
+            food_calories=calories,
+            protein_grams=0.3,
+            carbs_grams=25,
+            fat_grams=0.2,
+            log_time=log_time or now()
+        )
+
+    def today_stats(self):
+        return DailyUserStats.objects.get(user=self.user, date=now().date())
+
+
+class StatsViewSetTestCase(StatsTestCase):
+
+    def test_calories_burned_today(self):
+        self.log_exercises(2)
+        response = self.client.get('/api/v1/stats/calories_burned/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['calories_burned_today'], 2 * 3 * 10 * 1.5)
+
+    def test_calories_burned_today_without_logs(self):
+        response = self.client.get('/api/v1/stats/calories_burned/')
+        self.assertEqual(response.data['calories_burned_today'], 0)
+
+    def test_calories_burned_per_day(self):
+        self.log_exercises(2)
+        response = self.client.get('/api/v1/stats/calories_burned_per_day/')
+        self.assertEqual(response.status_code, 200)
+        calories = response.data['calories_burned_per_day']
+        self.assertEqual(len(calories), 7)
+        self.assertEqual(calories[now().weekday()], 2 * 3 * 10 * 1.5)
+
+    def test_calories_burned_query_count_is_constant(self):
+        for count in (1, 25):
+            self.log_exercises(count)
+            with self.assertNumQueries(1):
+                self.client.get('/api/v1/stats/calories_burned/')
+            with self.assertNumQueries(1):
+                self.client.get('/api/v1/stats/calories_burned_per_day/')
+
+    def test_calories_eaten_per_day(self):
+        self.log_meal(95)
+        self.log_meal(200)
+        response = self.client.get('/api/v1/stats/calories_eaten_per_day/')
+        self.assertEqual(response.data['calories_eaten_per_day'][now().weekday()], 295)
+
+    def test_number_logged_exercises_per_day(self):
+        self.log_exercises(3)
+        response = self.client.get('/api/v1/stats/number_logged_exercises_per_day/')
+        self.assertEqual(response.data['number_logged_exercises_per_day'], {now().date().isoformat(): 3})
+
+
+class DailyUserStatsTestCase(StatsTestCase):
+    def test_rollup_tracks_diet_log_items(self):
+        meal = self.log_meal(95)
+        self.assertEqual(self.today_stats().calories_eaten, 95)
+
+        meal.food_calories = 120
+        meal.save()
+        self.assertEqual(self.today_stats().calories_eaten, 120)
+
+        meal.delete()
+        self.assertFalse(DailyUserStats.objects.filter(user=self.user).exists())
+
+    def test_rollup_follows_moved_log_time(self):
+        yesterday = now() - datetime.timedelta(days=1)
+        logged_workout = self.log_exercises(2, log_time=yesterday)
+        self.assertEqual(DailyUserStats.objects.get(date=yesterday.date()).exercises_logged, 2)
+
+        logged_workout = LoggedWorkout.objects.get(pk=logged_workout.pk)
+        logged_workout.log_time = now()
+        logged_workout.save()
+        self.assertFalse(DailyUserStats.objects.filter(date=yesterday.date()).exists())
+        self.assertEqual(self.today_stats().exercises_logged, 2)
+        self.assertEqual(self.today_stats().calories_burned, 2 * 3 * 10 * 1.5)
+
+    def test_rollup_tracks_deleted_workouts(self):
+        logged_workout = self.log_exercises(2)
+        logged_workout.delete()
+        self.assertFalse(DailyUserStats.objects.filter(user=self.user).exists())
+
+    def test_failed_delete_does_not_silence_the_rollup(self):
+        logged_workout = self.log_exercises(2)
+        with self.assertRaises(RuntimeError):
+            with deleting_logged_workout(logged_workout.pk):
+                raise RuntimeError("delete failed")
+
+        LoggedExercise.objects.filter(logged_workout=logged_workout).first().delete()
+        self.assertEqual(self.today_stats().exercises_logged, 1)
+
+    def test_deleting_a_workout_refreshes_its_day_once(self):
+        logged_workout = self.log_exercises(3)
+        response = self.client.delete(f'/api/v1/loggedworkouts/{logged_workout.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(DailyUserStats.objects.filter(user=self.user).exists())
+
+    def test_changed_exercise_calories_refresh_the_rollup(self):
+        self.log_exercises(2)
+        self.assertEqual(self.client.get('/api/v1/stats/calories_burned/').data['calories_burned_today'], 2 * 3 * 10 * 1.5)
+
+        # As edited in the admin
+        exercise = Exercise.objects.get(pk=self.exercise.pk)
+        exercise.calories_burned = 4
+        exercise.save()
+        self.assertEqual(self.today_stats().calories_burned, 2 * 3 * 10 * 4)
+        self.assertEqual(self.client.get('/api/v1/stats/calories_burned/').data['calories_burned_today'], 2 * 3 * 10 * 4)
+
+    def test_rebuild_daily_stats_command(self):
+        self.log_meal(95)
+        self.log_exercises(2)
+        DailyUserStats.objects.all().delete()
+
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        stats = self.today_stats()
+        self.assertEqual(stats.calories_eaten, 95)
+        self.assertEqual(stats.calories_burned, 2 * 3 * 10 * 1.5)
+        self.assertEqual(stats.exercises_logged, 2)
+
+    def test_rebuild_daily_stats_drops_the_cached_stats(self):
+        meal = self.log_meal(95)
+        self.assertEqual(self.client.get('/api/v1/stats/calories_eaten/').data['calories_eaten_today'], 95)
+
+        # update() skips the signals refreshing the rollup
+        DietLogItem.objects.filter(pk=meal.pk).update(food_calories=200)
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(self.client.get('/api/v1/stats/calories_eaten/').data['calories_eaten_today'], 200)
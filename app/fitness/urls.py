@@ -2,6 +2,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import *
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'dietlogitems', DietLogItemViewSet, basename='dietlogitem')
@@ -23,4 +24,10 @@ urlpatterns = [
     path('login/', UserLoginView.as_view(), name='login'),
     path('profile/', UserProfileView.as_view(), name='user-profile'),
     path('logout/', logout_view, name='logout'),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('profiling/', ProfilingView.as_view(), name='profiling'),
+    # Async versions of the I/O-bound endpoints, see fitness/async_views.py
+    path('async/dietlogitems/', async_views.upload_diet_log_item, name='async-dietlogitem-upload'),
+    path('async/dietlogitems/scan/', async_views.scan_food, name='async-dietlogitem-scan'),
+    path('async/dietlogitems/scan/<uuid:job_id>/', async_views.scan_result, name='async-dietlogitem-scan-result'),
 ]
@@ -1,5 +1,20 @@
+from functools import lru_cache
+from zoneinfo import available_timezones
 from django.contrib.auth.models import AbstractBaseUser, AbstractUser, BaseUserManager, PermissionsMixin
+from django.core.exceptions import ValidationError
 from django.db import models
+from .utils.get_current_day import DEFAULT_TIMEZONE
+
+
+@lru_cache(maxsize=None)
+def timezone_names():
+    return available_timezones()  # Scans the tz database, so only once
+
+
+def validate_timezone(value):
+    if value not in timezone_names():
+        raise ValidationError(f'"{value}" is not an IANA timezone name.')
+
 
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
@@ -43,6 +58,8 @@ class UserProfile(AbstractUser):
         ('Moderately active', 'Moderately active'), ('Very active', 'Very active')
     ], null=True, blank=True)
     join_date = models.DateTimeField(auto_now_add=True)
+    # Decides when the user's day starts, e.g. for today's workout
+    timezone = models.CharField(max_length=64, default=DEFAULT_TIMEZONE, validators=[validate_timezone])
 
     USERNAME_FIELD = 'email'  # Set email as the username field
     REQUIRED_FIELDS = []  # No additional required fields
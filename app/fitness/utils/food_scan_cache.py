@@ -0,0 +1,67 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from ..models import FoodScanCacheCounter, FoodScanCacheEntry
+
+
+class FoodScanCache:
+    """
+    Bounded cache of food scan results, keyed by a hash of the normalized image.
+
+    Entries live in the FoodScanCacheEntry table so all gunicorn workers share them.
+    They expire `ttl` seconds after being stored, and once there are more than
+    `max_entries` the least recently used ones are evicted. Hit and miss counters
+    are kept in the FoodScanCacheCounter table, shared the same way.
+    """
+    HITS = 'hits'
+    MISSES = 'misses'
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = settings.FOOD_SCAN_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl = timedelta(seconds=settings.FOOD_SCAN_CACHE_TTL if ttl is None else ttl)
+
+    @staticmethod
+    def key_for(image):
+        """Key of a normalized (resized) PIL image: the SHA-256 of its RGB pixels."""
+        return hashlib.sha256(image.convert('RGB').tobytes()).hexdigest()
+
+    def get(self, key):
+        now = timezone.now()
+        entry = FoodScanCacheEntry.objects.filter(key=key, created_at__gt=now - self.ttl).first()
+        if entry is None:
+            self.count(self.MISSES)
+            return None
+
+        FoodScanCacheEntry.objects.filter(key=key).update(last_used_at=now, hits=F('hits') + 1)
+        self.count(self.HITS)
+        return entry.result
+
+    def set(self, key, result):
+        FoodScanCacheEntry.objects.update_or_create(
+            key=key, defaults={'result': result, 'created_at': timezone.now(), 'last_used_at': timezone.now()}
+        )
+        self.evict()
+
+    def evict(self):
+        FoodScanCacheEntry.objects.filter(created_at__lte=timezone.now() - self.ttl).delete()
+        stale_keys = FoodScanCacheEntry.objects.order_by('-last_used_at').values_list('key', flat=True)[self.max_entries:]
+        FoodScanCacheEntry.objects.filter(key__in=list(stale_keys)).delete()
+
+    def count(self, counter):
+        counters = FoodScanCacheCounter.objects.filter(name=counter)
+        if not counters.update(value=F('value') + 1):
+            # The rows are created by the migration, unless they were deleted since
+            FoodScanCacheCounter.objects.bulk_create([FoodScanCacheCounter(name=counter)], ignore_conflicts=True)
+            counters.update(value=F('value') + 1)
+
+    def stats(self):
+        counters = dict(FoodScanCacheCounter.objects.values_list('name', 'value'))
+        return {
+            'hits': counters.get(self.HITS, 0),
+            'misses': counters.get(self.MISSES, 0),
+            'entries': FoodScanCacheEntry.objects.count(),
+            'max_entries': self.max_entries,
+            'ttl_seconds': int(self.ttl.total_seconds()),
+        }
@@ -1,6 +1,22 @@
-from datetime import datetime, timezone
-import pytz
+import math
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
 
-def get_current_day():
-    timezone = pytz.timezone('Asia/Dubai')
-    return int(datetime.now(timezone).strftime('%w'))
\ No newline at end of file
+# The timezone of users who have not set theirs
+DEFAULT_TIMEZONE = 'Asia/Dubai'
+
+
+def get_current_day(timezone_name=DEFAULT_TIMEZONE):
+    """
+    Today's day of the week in the given IANA timezone, 0 being Sunday.
+    ZoneInfo caches its instances, so this does not reload the zone.
+    """
+    return int(datetime.now(ZoneInfo(timezone_name)).strftime('%w'))
+
+
+def seconds_until_midnight(timezone_name=DEFAULT_TIMEZONE):
+    """Seconds until the next midnight in the given timezone, rounded up."""
+    now = datetime.now(ZoneInfo(timezone_name))
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min, tzinfo=now.tzinfo)
+    # Timestamps, as subtracting datetimes of one zone ignores DST changes
+    return max(1, math.ceil(midnight.timestamp() - now.timestamp()))
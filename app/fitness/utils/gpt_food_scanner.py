@@ -1,25 +1,71 @@
 # gpt4o.py
-from openai import OpenAI
-import base64
-from PIL import Image
-from io import BytesIO
-import os
+import openai
+from openai import DefaultHttpxClient, OpenAI
 import json
+import random
+import threading
+import time
+from django.conf import settings
+from ..profiling import span
+from .food_scan_cache import FoodScanCache
+from .image_pipeline import image_data_url, prepare_scan_image
+from .latency_metrics import LatencyMetrics
+
+try:
+    import httpx
+except ImportError:  # Recent openai releases are built on httpx2
+    import httpx2 as httpx
+
+# Errors worth retrying: network failures and timeouts, rate limiting and 5xx responses
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+def build_openai_client():
+    """
+    An OpenAI client whose HTTP connection pool keeps connections alive between scans.
+    Retries are left to GPTFoodScanner.complete.
+    """
+    timeout = httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT)
+    http_client = DefaultHttpxClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+            keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY,
+        ),
+    )
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=timeout,
+        max_retries=0,
+        http_client=http_client,
+    )
 
 class GPTFoodScanner:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    """
+    Food scanner backed by the OpenAI API. Meant to be shared process-wide (see
+    fitness.scan_jobs.get_food_scanner) so every scan reuses the client's connections.
+    """
+    def __init__(self, client=None, cache=None):
+        self.client = client or build_openai_client()
+        self.cache = cache or FoodScanCache()
+        self.concurrency = threading.BoundedSemaphore(settings.OPENAI_MAX_CONCURRENCY)
+        self.metrics = LatencyMetrics()
 
     def analyze_food_image(self, image_file):
         try:
             # Resize the image to 224x224
-            image = Image.open(image_file)
-            image = image.resize((224, 224))
+            image = prepare_scan_image(image_file)
+
+            # Rescans of the same photo are answered from the cache
+            cache_key = self.cache.key_for(image)
+            cached_result = self.cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
 
-            # Convert the image to base64
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            image_base64 = base64.b64encode(buffered.getvalue()).decode("utf-8")
+            # Encode the image compactly for the request
+            image_url = image_data_url(image, format=settings.FOOD_SCAN_IMAGE_FORMAT)
 
             # Construct a detailed prompt for OpenAI API
             prompt = (
@@ -29,7 +75,7 @@ class GPTFoodScanner:
             )
 
             # Call OpenAI API using ChatCompletion to interpret the image
-            response = self.client.chat.completions.create(
+            response = self.complete(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You provide estimates of calories and macros."},
@@ -44,18 +90,42 @@ class GPTFoodScanner:
                       {
                         "type": 'image_url',
                         'image_url': {
-                          "url": f'data:image/png;base64,{image_base64}'
+                          "url": image_url
                         }
                       }
                     ]},
                 ]
             )
 
-            # Parse response and return result
-            return self.parse_response(response)
+            # Parse response, cache and return result
+            result = self.parse_response(response)
+            self.cache.set(cache_key, result)
+            return result
         except Exception as e:
             raise RuntimeError(f"Failed to analyze the image: {str(e)}")
 
+    def complete(self, **request):
+        """
+        Create a chat completion. At most OPENAI_MAX_CONCURRENCY calls run at once and
+        transient errors are retried up to OPENAI_MAX_RETRIES times with jittered
+        exponential backoff. The latency of every attempt is recorded in self.metrics.
+        """
+        for attempt in range(settings.OPENAI_MAX_RETRIES + 1):
+            with self.concurrency:
+                started = time.perf_counter()
+                try:
+                    with span('external'):
+                        response = self.client.chat.completions.create(**request)
+                except TRANSIENT_ERRORS:
+                    self.metrics.record(time.perf_counter() - started, failed=True)
+                    if attempt == settings.OPENAI_MAX_RETRIES:
+                        raise
+                else:
+                    self.metrics.record(time.perf_counter() - started)
+                    return response
+            # Full jitter keeps retrying workers from hitting the API in lockstep
+            time.sleep(random.uniform(0, settings.OPENAI_RETRY_BACKOFF * 2 ** attempt))
+
     def parse_response(self, response):
         # Check if the response has the correct structure and retrieve JSON
         try:
@@ -0,0 +1,64 @@
+import base64
+from io import BytesIO
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+SCAN_SIZE = (224, 224)
+THUMBNAIL_SIZE = (320, 320)
+
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+def load_image(image_file, size):
+    """
+    Open an uploaded image for downscaling to `size`.
+
+    JPEGs are decoded in draft mode, which lets libjpeg decode straight to the
+    smallest power-of-two scale that is still at least `size`, so a 12 MP phone
+    photo never has to be held in memory at full resolution. The EXIF
+    orientation is applied so the image is upright.
+    """
+    image_file.seek(0)
+    image = Image.open(image_file)
+    if image.format == 'JPEG':
+        # Either side may end up horizontal once the EXIF rotation is applied
+        longest = max(size)
+        image.draft('RGB', (longest, longest))
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGB')
+
+
+def prepare_scan_image(image_file, size=SCAN_SIZE):
+    """
+    The upload normalized to the fixed `size` the food scanner works on.
+    """
+    image = load_image(image_file, size)
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def encode_image(image, format='JPEG', quality=85):
+    """
+    Compact JPEG/WebP encoding of an image, as bytes.
+    """
+    buffered = BytesIO()
+    image.save(buffered, format=format, quality=quality)
+    return buffered.getvalue()
+
+
+def image_data_url(image, format='JPEG', quality=85):
+    """
+    A `data:` URL with the compact encoding of an image, for the OpenAI image_url content.
+    """
+    payload = base64.b64encode(encode_image(image, format, quality)).decode('ascii')
+    return f'data:{CONTENT_TYPES[format]};base64,{payload}'
+
+
+def make_thumbnail(image_file, size=THUMBNAIL_SIZE, quality=80):
+    """
+    A JPEG thumbnail of an uploaded image fitting within `size`, ready to assign to an ImageField.
+    """
+    image = load_image(image_file, size)
+    image.thumbnail(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    image_file.seek(0)  # Leave the upload readable for saving the original
+    name = (getattr(image_file, 'name', None) or 'image').rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return ContentFile(encode_image(image, 'JPEG', quality), name=f'{name}_thumb.jpg')
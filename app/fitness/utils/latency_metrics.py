@@ -0,0 +1,39 @@
+import statistics
+import threading
+from collections import deque
+
+
+class LatencyMetrics:
+    """
+    Thread-safe latency recorder: totals since start plus percentiles over the most recent calls.
+    """
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.recent = deque(maxlen=window)
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds, failed=False):
+        with self.lock:
+            self.calls += 1
+            self.failures += failed
+            self.total_seconds += seconds
+            self.recent.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            recent = sorted(self.recent)
+            calls, failures, total_seconds = self.calls, self.failures, self.total_seconds
+
+        def percentile(fraction):
+            return round(recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000, 1) if recent else None
+
+        return {
+            'calls': calls,
+            'failures': failures,
+            'mean_ms': round(total_seconds / calls * 1000, 1) if calls else None,
+            'p50_ms': round(statistics.median(recent) * 1000, 1) if recent else None,
+            'p95_ms': percentile(0.95),
+            'max_ms': round(recent[-1] * 1000, 1) if recent else None,
+        }
@@ -0,0 +1,28 @@
+import os
+import time
+from PIL import Image
+
+
+class StubFoodScanner:
+    """
+    Offline stand-in for GPTFoodScanner, for development and load tests.
+    Select it with FOOD_SCANNER=fitness.utils.stub_food_scanner.StubFoodScanner;
+    FOOD_SCANNER_STUB_DELAY simulates the latency of the model call in seconds.
+    """
+    def __init__(self):
+        self.delay = float(os.environ.get("FOOD_SCANNER_STUB_DELAY", 0))
+
+    def analyze_food_image(self, image_file):
+        try:
+            Image.open(image_file).verify()
+        except Exception as e:
+            raise RuntimeError(f"Failed to analyze the image: {str(e)}")
+
+        time.sleep(self.delay)
+        return {
+            "food_name": "Stub meal",
+            "calories": 500,
+            "protein_grams": 25,
+            "carbs_grams": 60,
+            "fat_grams": 15,
+        }
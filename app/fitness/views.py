@@ -17,11 +17,25 @@ from django.views.decorators.csrf import csrf_exempt
 import json
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.models import Token
-from django.db.models import Prefetch
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 import openai
-from .utils.gpt_food_scanner import GPTFoodScanner
-from .utils.get_current_day import get_current_day
+from django.conf import settings
+from .utils.get_current_day import get_current_day, seconds_until_midnight
 from django.shortcuts import get_object_or_404
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from .authentication import forget_token
+from .caching import ACTIVE_PROGRAMS, DIET_LOG_ITEMS, LOGGED_WORKOUTS, WORKOUT_PROGRAMS, WORKOUTS, cache_per_resource, cache_per_user, invalidate
+from .catalog_cache import exercise_catalog_response
+from .featured import featured_workout_response
+from .pagination import LogTimeCursorPagination
+from .profiling import histograms
+from .rollups import deleting_logged_workout, refresh_daily_stats, stats_date
+from .scan_jobs import parse_wait, scanners, submit_scan, wait_for_scan
+from .search import WORKOUT_FACETS, filter_workouts, parse_search_params, related_exercises, search_exercises, search_workouts
+from .utils.food_scan_cache import FoodScanCache
+from .workout_logs import build_logged_exercises, resolve_exercises, sync_logs
 import os 
 from django.db.models import Q
 from django.utils.timezone import now
@@ -33,6 +47,27 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.user == request.user
 
+
+def filter_log_time(queryset, request):
+    """
+    Restrict a queryset to the `since`/`until` log time window given in the query parameters.
+    """
+    for param, lookup in (('since', 'log_time__gte'), ('until', 'log_time__lt')):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            log_time = parse_datetime(value)
+        except ValueError:
+            # Well formatted, but not a real date/time
+            log_time = None
+        if log_time is None:
+            raise ValidationError({param: 'Enter a valid ISO 8601 date/time.'})
+        if timezone.is_naive(log_time):
+            log_time = timezone.make_aware(log_time)
+        queryset = queryset.filter(**{lookup: log_time})
+    return queryset
+
 # class UserSignupView(APIView):
 #     def post(self, request):
 #         serializer = UserSignupSerializer(data=request.data)
@@ -64,6 +99,10 @@ class UserProfileView(APIView):
         serializer = UserSignupSerializer(user, data=data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            token = getattr(user, 'auth_token', None)
+            if token is not None:
+                forget_token(token.key)  # Token requests must see the updated profile
+            invalidate(ACTIVE_PROGRAMS, user.pk)  # Today's workout depends on the timezone
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
@@ -80,6 +119,7 @@ class UserSignupView(APIView):
                 'target_weight_kg': user.target_weight_kg,
                 'age': user.age,
                 'activity_level': user.activity_level,
+                'timezone': user.timezone,
                 'join_date': user.join_date,
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -100,38 +140,93 @@ class UserLoginView(APIView):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])  # Ensure the user is authenticated
 def logout_view(request):
+    forget_token(request.user.auth_token.key)
     request.user.auth_token.delete()  # Delete the user's auth token
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 class DietLogItemViewSet(viewsets.ModelViewSet):
     serializer_class = DietLogItemSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = LogTimeCursorPagination
 
     def get_queryset(self):
-        return DietLogItem.objects.filter(user=self.request.user)
+        queryset = DietLogItem.objects.filter(user=self.request.user)
+        return filter_log_time(queryset, self.request)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
         
     @action(detail=False, methods=['post'], url_path='scan')
     def scan(self, request):
+        """
+        Queue a scan of a food image. Returns the job to poll for the result.
+        """
         image_file = request.FILES.get('image')
         if not image_file:
             return Response({"error": "No image provided."}, status=status.HTTP_400_BAD_REQUEST)
-        gpt4o = GPTFoodScanner()
 
+        job = submit_scan(request.user, image_file.read())
+        return Response(FoodScanJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'scan/(?P<job_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+    def scan_result(self, request, job_id=None):
+        """
+        State of a scan job. With `?wait=<seconds>` the request waits for the job to finish,
+        for at most FOOD_SCAN_SYNC_MAX_WAIT seconds; the async endpoint long-polls for longer.
+        """
+        job = get_object_or_404(FoodScanJob, pk=job_id, user=request.user)
         try:
-            result = gpt4o.analyze_food_image(image_file)
-            return Response(result, status=status.HTTP_200_OK)
-        except RuntimeError as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        except ValueError as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            wait = parse_wait(request.query_params.get('wait'), settings.FOOD_SCAN_SYNC_MAX_WAIT)
+        except ValueError:
+            return Response({"error": "wait must be a number of seconds."}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = wait_for_scan(job, wait)
+        return Response(FoodScanJobSerializer(job).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='scan-cache', permission_classes=[permissions.IsAdminUser])
+    def scan_cache(self, request):
+        """
+        Hit/miss counters and size of the food scan result cache.
+        """
+        return Response(FoodScanCache().stats(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='scan-metrics', permission_classes=[permissions.IsAdminUser])
+    def scan_metrics(self, request):
+        """
+        Latency of the model calls made by this worker process's food scanner, once it has been used.
+        """
+        metrics = getattr(scanners.get(settings.FOOD_SCANNER), 'metrics', None)
+        return Response(metrics.snapshot() if metrics else {}, status=status.HTTP_200_OK)
 
 class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    The exercise catalog, served from the in-process catalog cache with ETags.
+    """
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
 
+    def list(self, request, *args, **kwargs):
+        return exercise_catalog_response(request)
+
+    def retrieve(self, request, pk=None, *args, **kwargs):
+        return exercise_catalog_response(request, exercise_id=pk)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Search exercises by name (`q`, `match=substring|prefix`) and filter by
+        `body_part`, `equipment`, `target` and `muscle`. Paged with `limit` and
+        `offset`; `facets` counts the matching exercises per filter value.
+        """
+        return Response(search_exercises(request.query_params), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='related')
+    def related(self, request, pk=None):
+        """
+        Exercises working the same target or secondary muscles, best matches first.
+        """
+        return Response(related_exercises(pk), status=status.HTTP_200_OK)
+
 
 class WorkoutViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Workout.objects.all().prefetch_related(
@@ -139,24 +234,24 @@ class WorkoutViewSet(viewsets.ReadOnlyModelViewSet):
     )
     serializer_class = WorkoutSerializer
 
+    @cache_per_resource(WORKOUTS)
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
-        # Search functionality
-        query = request.query_params.get('q', None)
-        if query:
-            queryset = queryset.filter(Q(name__icontains=query))
-        
-        # Filter by body_part
-        body_part = request.query_params.get('body_part', None)
-        # if body_part:
-        #     queryset = queryset.filter(workoutexercise__exercise__body_part__icontains=body_part)
-        if body_part:
-            queryset = queryset.filter(body_part__icontains=body_part)
+        # Search by name (q) and filter by body_part
+        query, match, filters, _, _ = parse_search_params(request.query_params, WORKOUT_FACETS)
+        queryset = filter_workouts(self.get_queryset(), query, match, filters)
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='search')
+    @cache_per_resource(WORKOUTS)
+    def search(self, request):
+        """
+        Paged workout search with body part facet counts, see ExerciseViewSet.search.
+        """
+        return Response(search_workouts(request.query_params, self.get_queryset(), self.get_serializer_class()), status=status.HTTP_200_OK)
+
+    @cache_per_resource(WORKOUTS)
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
@@ -165,25 +260,18 @@ class WorkoutViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'], url_path='featured-workouts')
     def featured_workouts(self, request, *args, **kwargs):
         """
-        Custom action to fetch the featured workout for today.
+        The workout featured today, the same for every user: a single read of
+        the payload cached per date, with HTTP caching headers.
         """
-        today = date.today()
-        try:
-            # Filter FeaturedWorkout for today and get the first one
-            featured = FeaturedWorkout.objects.filter(date=today)
-            if not featured:
-                return Response({"detail": "No featured workouts for today."}, status=404)
-
-            # Serialize the associated workout
-            serializer = self.get_serializer(featured.workout)
-            return Response(serializer.data)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=500)
-    
+        response = featured_workout_response(request, timezone.localdate())
+        if response is None:
+            return Response({"detail": "No featured workouts for today."}, status=status.HTTP_404_NOT_FOUND)
+        return response
+
     @action(detail=True, methods=['post'], url_path='subscribe')
     def subscribe(self, request, pk=None):
         """
-        Subscribe to a workout by creating a program for 7 days.
+        Subscribe to a workout with the shared program template doing it every day.
         """
         if not request.user.is_authenticated:
             return Response(
@@ -192,44 +280,34 @@ class WorkoutViewSet(viewsets.ReadOnlyModelViewSet):
             )
         user = request.user
 
-        # Check if the user has an active subscription
-        active_program = ActiveWorkoutProgram.objects.filter(user=user, is_active=True).first()
-        if active_program:
-            return Response(
-                {"error": "You already have an active workout program."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
         # Fetch the workout by its ID (pk)
         try:
             workout = Workout.objects.get(pk=pk)
         except Workout.DoesNotExist:
             return Response({"error": "Workout not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Create a new Workout Program
-        workout_program = WorkoutProgram.objects.create(
-            user=user,
-            name=f"Subscribed Program for Workout {workout.name}"
-        )
-
-        # Create ProgramDays for all 7 days
-        for day in range(7):
-            ProgramDay.objects.create(
-                workout_program=workout_program,
-                workout=workout,
-                day_of_week=day
-            )
+        # Shared by every subscriber, so subscriptions no longer add programs
+        workout_program = WorkoutProgram.template_for(workout)
 
-        # Create an ActiveWorkoutProgram
+        # The unique constraint on active programs refuses a second
+        # subscription, even from a concurrent request
         start_date = now()
-        end_date = start_date + timedelta(days=30)
-        active_workout_program = ActiveWorkoutProgram.objects.create(
-            user=user,
-            workout_program=workout_program,
-            start_date=start_date,
-            end_date=end_date,
-            is_active=True
-        )
+        try:
+            with transaction.atomic():
+                ActiveWorkoutProgram.objects.create(
+                    user=user,
+                    workout_program=workout_program,
+                    start_date=start_date,
+                    end_date=start_date + timedelta(days=30),
+                    is_active=True,
+                    # The schedule of the template, which the signals would load again
+                    schedule={str(day): workout.id for day in range(7)}
+                )
+        except IntegrityError:
+            return Response(
+                {"error": "You already have an active workout program."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Return success response with workout and program IDs
         return Response(
@@ -244,63 +322,167 @@ class WorkoutViewSet(viewsets.ReadOnlyModelViewSet):
 
     
 
+class ProfilingView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        """
+        Per-URL-name request latency histograms and mean time per span of this worker process.
+        """
+        return Response(histograms.snapshot(), status=status.HTTP_200_OK)
+
+
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Replay a batch of logged workouts and diet log items recorded while offline.
+        """
+        return Response(sync_logs(request.user, request.data), status=status.HTTP_200_OK)
+
+
+def logged_exercise_prefetch():
+    """
+    The exercises of LoggedWorkouts in logging order, with their catalog entry, as LoggedWorkoutSerializer needs them.
+    """
+    return Prefetch('loggedexercise_set', queryset=LoggedExercise.objects.select_related('exercise').order_by('order'))
+
+
 class LoggedWorkoutViewSet(viewsets.ModelViewSet):
     serializer_class = LoggedWorkoutSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = LogTimeCursorPagination
 
     def get_queryset(self):
-        return LoggedWorkout.objects.filter(user=self.request.user)
+        queryset = LoggedWorkout.objects.filter(user=self.request.user).prefetch_related(logged_exercise_prefetch())
+        return filter_log_time(queryset, self.request)
 
     def perform_create(self, serializer):
-        logged_workout = serializer.save(user=self.request.user)
-        exercises_data = self.request.data.get('exercises', [])
-        for exercise in exercises_data:
-            # Retrieve the Exercise instance
-            exercise_instance = get_object_or_404(Exercise, exercise_id=exercise["exercise_id"])
-            
-            LoggedExercise.objects.create(
-                logged_workout=logged_workout,
-                exercise=exercise_instance,  # Pass the instance instead of the ID
-                order=exercise['order'],
-                sets_completed=exercise["sets"],
-                reps_completed=exercise["reps"],
-                weight_used_kg=exercise.get('weight_in_kg', None),
-                km_ran=exercise.get('km_ran', None),
-            )
+        exercises = LoggedExerciseInputSerializer(data=self.request.data.get('exercises', []), many=True)
+        exercises.is_valid(raise_exception=True)
+        exercises_data = exercises.validated_data
+        exercises_by_id = resolve_exercises({exercise['exercise_id'] for exercise in exercises_data})
 
-    def retrieve(self, request, *args, **kwargs):
+        with transaction.atomic():
+            logged_workout = serializer.save(user=self.request.user)
+            LoggedExercise.objects.bulk_create(build_logged_exercises(logged_workout, exercises_data, exercises_by_id))
+            # bulk_create skips the signals that keep the stats rollup current
+            refresh_daily_stats(logged_workout.user_id, [stats_date(logged_workout.log_time)])
+
+        prefetch_related_objects([logged_workout], logged_exercise_prefetch())
+
+    def update(self, request, *args, **kwargs):
+        """
+        UpdateModelMixin.update without dropping the prefetched exercises, which
+        are read-only here, so the response does not query them one by one.
+        """
         instance = self.get_object()
-        data = self.get_serializer(instance).data
-        exercises = LoggedExercise.objects.filter(logged_workout=instance).order_by('order')
-        data['exercises'] = [
-            {
-                'exercise_id': ex.exercise.id,
-                'name': ex.exercise.name,
-                'sets_completed': ex.sets_completed,
-                'reps_completed': ex.reps_completed,
-                'weight_used_kg': ex.weight_used_kg,
-                'km_ran': ex.km_ran
-            }
-            for ex in exercises
-        ]
-        return Response(data)
+        serializer = self.get_serializer(instance, data=request.data, partial=kwargs.pop('partial', False))
+        serializer.is_valid(raise_exception=True)
+        self.perform_update(serializer)
+        return Response(serializer.data)
+
+    def perform_destroy(self, instance):
+        with deleting_logged_workout(instance.pk):
+            instance.delete()
+
+
+def program_day_queryset():
+    """
+    ProgramDays with their workout and its exercises loaded, as ProgramDaySerializer needs them.
+    """
+    return ProgramDay.objects.select_related('workout').prefetch_related(
+        Prefetch('workout__workoutexercise_set', queryset=WorkoutExercise.objects.select_related('exercise'))
+    )
+
+
+def workout_program_queryset():
+    """
+    WorkoutPrograms with everything WorkoutProgramSerializer touches prefetched,
+    so a program serializes in a fixed number of queries whatever its size.
+    """
+    return WorkoutProgram.objects.prefetch_related(
+        Prefetch('days', queryset=program_day_queryset())
+    )
+
 
 class WorkoutProgramViewSet(viewsets.ReadOnlyModelViewSet):
     """
     A viewset for viewing Workout Programs and their associated Program Days.
     """
-    queryset = WorkoutProgram.objects.all().prefetch_related('days')  # Prefetch ProgramDays to optimize queries
     serializer_class = WorkoutProgramSerializer
     permission_classes = [IsAuthenticated]  # Only authenticated users can access this view
 
     def get_queryset(self):
+        # The shared templates and the user's own programs
+        return workout_program_queryset().filter(Q(is_template=True) | Q(user=self.request.user))
+
+    @cache_per_user(WORKOUT_PROGRAMS, WORKOUTS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_per_user(WORKOUT_PROGRAMS, WORKOUTS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=False, methods=['get'])
+    @cache_per_resource(WORKOUT_PROGRAMS, WORKOUTS)
+    def templates(self, request):
+        """
+        The program templates, the same for every user and served from one cache entry.
+        """
+        serializer = self.get_serializer(workout_program_queryset().filter(is_template=True), many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['post'])
+    def customize(self, request, pk=None):
         """
-        Optionally restricts the returned workouts to a given user,
-        by filtering against a `user` query parameter in the URL.
+        Change days of the user's active program, given as
+        `{"days": [{"day_of_week": 1, "workout_id": 3}, ...]}`, a null workout
+        making a rest day. A template is copied to a program of the user on
+        the first change, so the other subscribers keep it unchanged.
         """
-        queryset = super().get_queryset()
-        user = self.request.user
-        return queryset
+        serializer = ProgramCustomizationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Locked, so a concurrent customize waits, then finds the program it copied to
+            active_program = ActiveWorkoutProgram.objects.select_for_update().filter(
+                workout_program_id=pk,
+                user=request.user,
+                is_active=True
+            ).select_related('workout_program').first()
+            if active_program is None:
+                return Response({'error': 'No active workout program found'}, status=status.HTTP_400_BAD_REQUEST)
+
+            schedule = ActiveWorkoutProgram.schedule_of(pk)
+            for day in serializer.validated_data['days']:
+                schedule[str(day['day_of_week'])] = day['workout_id']
+
+            program = active_program.workout_program
+            if program.user_id != request.user.pk:
+                program = WorkoutProgram.objects.create(
+                    user=request.user, name=program.name, description=program.description
+                )
+            else:
+                # The schedules are set once below, not once per deleted day
+                with replacing_program_days(program.pk):
+                    ProgramDay.objects.filter(workout_program=program).delete()
+            ProgramDay.objects.bulk_create([
+                ProgramDay(workout_program=program, workout_id=workout_id, day_of_week=int(day))
+                for day, workout_id in sorted(schedule.items())
+            ])
+            ActiveWorkoutProgram.objects.filter(
+                Q(pk=active_program.pk) | Q(workout_program=program)
+            ).update(workout_program=program, schedule=schedule)
+            # The bulk writes skip the signals
+            invalidate(WORKOUT_PROGRAMS)
+            invalidate(ACTIVE_PROGRAMS, request.user.pk)
+
+        serializer = WorkoutProgramSerializer(workout_program_queryset().get(pk=program.pk))
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
@@ -309,26 +491,25 @@ class WorkoutProgramViewSet(viewsets.ReadOnlyModelViewSet):
         """
         program = self.get_object()
 
-        # Check if the user has any active workout program
-        active_program = ActiveWorkoutProgram.objects.filter(
-            user=request.user, is_active=True
-        ).first()
-        if active_program:
+        # Activate the new program, unless the user has an active one (see ActiveWorkoutProgram.Meta)
+        start_date = request.data.get('start_date')
+        end_date = request.data.get('end_date')
+        if not start_date or not end_date:
+            return Response({'error': 'start_date and end_date are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                ActiveWorkoutProgram.objects.create(
+                    workout_program=program,
+                    user=request.user,
+                    start_date=start_date,
+                    end_date=end_date,
+                    is_active=True
+                )
+        except IntegrityError:
             return Response(
                 {'error': 'You already have an active workout program. Deactivate it first to activate another.'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-
-        # Activate the new program
-        start_date = request.data.get('start_date')
-        end_date = request.data.get('end_date')
-        ActiveWorkoutProgram.objects.create(
-            workout_program=program,
-            user=request.user,
-            start_date=start_date,
-            end_date=end_date,
-            is_active=True
-        )
         return Response({'status': 'workout program activated'})
 
     @action(detail=True, methods=['post'])
@@ -353,159 +534,138 @@ class WorkoutProgramViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Retrieve the latest active workout program for the authenticated user.
         """
-        active_program = ActiveWorkoutProgram.objects.filter(user=request.user, is_active=True).order_by('-start_date').first()
-        
-        if active_program is None:
+        program = workout_program_queryset().filter(
+            activeworkoutprogram__user=request.user,
+            activeworkoutprogram__is_active=True
+        ).order_by('-activeworkoutprogram__start_date').first()
+
+        if program is None:
             return Response({'error': 'No active workout program found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        serializer = WorkoutProgramSerializer(active_program.workout_program)
+
+        serializer = WorkoutProgramSerializer(program)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
+    @cache_per_user(
+        ACTIVE_PROGRAMS, WORKOUT_PROGRAMS, WORKOUTS, timeout=lambda request: seconds_until_midnight(request.user.timezone)
+    )
     def todays_workout(self, request):
+        """
+        The workout of the active program for today in the user's timezone,
+        looked up in its schedule and cached until the user's local midnight.
+        """
         active_program = ActiveWorkoutProgram.objects.filter(
             user=request.user, is_active=True
-        ).order_by('-start_date').first()
+        ).order_by('-start_date').values('workout_program_id', 'schedule').first()
 
         if not active_program:
             return Response({'error': 'No active workout program found'}, status=status.HTTP_404_NOT_FOUND)
 
-        day = get_current_day()  # Assuming this function returns an integer (0-6)
-        todays_day = ProgramDay.objects.filter(
-            workout_program=active_program.workout_program, day_of_week=day
-        ).first()
+        workout_program_id = active_program['workout_program_id']
+        workout_id = active_program['schedule'].get(str(get_current_day(request.user.timezone)))
+        # The workout may have been deleted since, which makes it a rest day like its ProgramDay
+        workout = workout_id and Workout.objects.prefetch_related(
+            Prefetch('workoutexercise_set', queryset=WorkoutExercise.objects.select_related('exercise'))
+        ).filter(pk=workout_id).first()
 
-        if todays_day and todays_day.workout:
-            serializer = WorkoutSerializer(todays_day.workout)
-            response_data = serializer.data
-            response_data['workout_program_id'] = active_program.workout_program.id
+        if workout:
+            response_data = WorkoutSerializer(workout).data
+            response_data['workout_program_id'] = workout_program_id
             return Response(response_data)
-        
-        return Response({'message': 'Rest day', 'workout_program_id': active_program.workout_program.id})
+
+        return Response({'message': 'Rest day', 'workout_program_id': workout_program_id})
 
 
 
 class StatsViewSet(viewsets.ViewSet):
+    """
+    Dashboard statistics, read from the DailyUserStats rollup table and cached
+    per user until their logs change.
+    """
     permission_classes = [permissions.IsAuthenticated]
 
+    def week_per_day(self, user, field):
+        """
+        Values of a DailyUserStats field for each day of the current week, starting Monday.
+        """
+        today = timezone.localdate()
+        start_of_week = today - timedelta(days=today.weekday())  # Get the last Monday
+
+        # Initialize a dictionary to store the values for each day of the week
+        values_per_day = {start_of_week + timedelta(days=i): 0 for i in range(7)}
+
+        daily_stats = DailyUserStats.objects.filter(
+            user=user,
+            date__gte=start_of_week,
+            date__lte=today
+        ).values_list('date', field)
+        values_per_day.update(daily_stats)
+
+        # Convert the dictionary to a list starting from Monday
+        return [values_per_day[start_of_week + timedelta(days=i)] for i in range(7)]
+
     @action(detail=False, methods=['get'])
+    @cache_per_user(LOGGED_WORKOUTS)
     def calories_burned(self, request):
         """
         Total calories burned today by the authenticated user.
         """
-        user = request.user
-        today = datetime.now().date()
-
-        # Sum up calories from logged exercises for today
-        exercises_today = LoggedExercise.objects.filter(
-            logged_workout__user=user,
-            logged_workout__log_time__date=today
-        ).select_related('exercise')
-
-        total_calories_burned = sum(
-            ex.sets_completed * ex.reps_completed * ex.exercise.calories_burned
-            for ex in exercises_today
-        )
+        today = timezone.localdate()
+        daily_stats = DailyUserStats.objects.filter(user=request.user, date=today).first()
+        total_calories_burned = daily_stats.calories_burned if daily_stats else 0
         return Response({'calories_burned_today': total_calories_burned})
 
     @action(detail=False, methods=['get'])
+    @cache_per_user(DIET_LOG_ITEMS)
     def calories_eaten(self, request):
         """
         Total calories eaten today by the authenticated user.
         """
-        user = request.user
-        today = datetime.now().date()
-
-        # Sum up calories from diet log items for today
-        calories_eaten = DietLogItem.objects.filter(
-            user=user,
-            log_time__date=today
-        ).aggregate(total_calories=Sum('food_calories'))['total_calories'] or 0
-
+        today = timezone.localdate()
+        daily_stats = DailyUserStats.objects.filter(user=request.user, date=today).first()
+        calories_eaten = daily_stats.calories_eaten if daily_stats else 0
         return Response({'calories_eaten_today': calories_eaten})
 
     @action(detail=False, methods=['get'])
+    @cache_per_user(DIET_LOG_ITEMS)
     def calories_eaten_per_day(self, request):
         """
         Number of calories eaten for the past week on each weekday, starting Monday onward.
         """
-        user = request.user
-        today = datetime.now().date()
-        start_of_week = today - timedelta(days=today.weekday())  # Get the last Monday
-
-        # Initialize a dictionary to store calories for each day of the week
-        calories_per_day = {start_of_week + timedelta(days=i): 0 for i in range(7)}
-
-        # Get the calories eaten for the past week
-        diet_logs = DietLogItem.objects.filter(
-            user=user,
-            log_time__date__gte=start_of_week,
-            log_time__date__lte=today
-        ).values('log_time__date').annotate(total_calories=Sum('food_calories'))
-
-        # Update the dictionary with the actual calories eaten
-        for log in diet_logs:
-            log_date = log['log_time__date']
-            calories_per_day[log_date] = log['total_calories']
-
-        # Convert the dictionary to a list of calories starting from Monday
-        calories_list = [calories_per_day[start_of_week + timedelta(days=i)] for i in range(7)]
-
-        return Response({'calories_eaten_per_day': calories_list})
+        return Response({'calories_eaten_per_day': self.week_per_day(request.user, 'calories_eaten')})
 
     @action(detail=False, methods=['get'])
+    @cache_per_user(LOGGED_WORKOUTS)
     def calories_burned_per_day(self, request):
         """
         Number of calories burned for the past week on each weekday, starting Monday onward.
         """
-        user = request.user
-        today = datetime.now().date()
-        start_of_week = today - timedelta(days=today.weekday())  # Get the last Monday
-
-        # Initialize a dictionary to store calories for each day of the week
-        calories_per_day = {start_of_week + timedelta(days=i): 0 for i in range(7)}
-
-        # Get the exercises for the past week
-        exercises = LoggedExercise.objects.filter(
-            logged_workout__user=user,
-            logged_workout__log_time__date__gte=start_of_week,
-            logged_workout__log_time__date__lte=today
-        ).select_related('exercise')
-
-        # Calculate the total calories burned for each day
-        for exercise in exercises:
-            log_date = exercise.logged_workout.log_time.date()
-            calories_burned = exercise.sets_completed * exercise.reps_completed * exercise.exercise.calories_burned
-            calories_per_day[log_date] += calories_burned
-
-        # Convert the dictionary to a list of calories starting from Monday
-        calories_list = [calories_per_day[start_of_week + timedelta(days=i)] for i in range(7)]
-
-        return Response({'calories_burned_per_day': calories_list})
+        return Response({'calories_burned_per_day': self.week_per_day(request.user, 'calories_burned')})
 
     @action(detail=False, methods=['get'])
+    @cache_per_user(LOGGED_WORKOUTS)
     def number_exercises(self, request):
         """
         Total number of exercises done by the authenticated user.
         """
-        user = request.user.userprofile
-        exercise_count = LoggedExercise.objects.filter(
-            logged_workout__user=user
-        ).count()
+        exercise_count = DailyUserStats.objects.filter(
+            user=request.user
+        ).aggregate(total=Sum('exercises_logged'))['total'] or 0
         return Response({'number_of_exercises': exercise_count})
 
     @action(detail=False, methods=['get'])
+    @cache_per_user(LOGGED_WORKOUTS)
     def number_logged_exercises_per_day(self, request):
         """
         Number of logged exercises per day for the last 30 days.
         """
-        user = request.user.userprofile
-        last_30_days = datetime.now() - timedelta(days=30)
+        last_30_days = timezone.localdate() - timedelta(days=30)
 
-        exercise_logs = LoggedExercise.objects.filter(
-            logged_workout__user=user,
-            logged_workout__log_time__gte=last_30_days
-        ).values('logged_workout__log_time__date').annotate(count=Count('id'))
+        exercise_logs = DailyUserStats.objects.filter(
+            user=request.user,
+            date__gte=last_30_days,
+            exercises_logged__gt=0
+        ).values_list('date', 'exercises_logged')
 
-        data = {log['logged_workout__log_time__date']: log['count'] for log in exercise_logs}
-        return Response({'number_logged_exercises_per_day': data})
\ No newline at end of file
+        data = {log_date.isoformat(): count for log_date, count in exercise_logs}
+        return Response({'number_logged_exercises_per_day': data})
@@ -0,0 +1,167 @@
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import ValidationError
+from .caching import DIET_LOG_ITEMS, LOGGED_WORKOUTS, invalidate
+from .models import DietLogItem, Exercise, LoggedExercise, LoggedWorkout
+from .rollups import refresh_daily_stats, stats_date
+from .serializers import SyncDietLogItemSerializer, SyncLoggedWorkoutSerializer
+
+# Maximum number of workouts, and of diet log items, accepted in one sync batch
+SYNC_BATCH_LIMIT = 500
+
+
+def resolve_exercises(exercise_ids):
+    """
+    Fetch the Exercises with the given ids in one query, keyed by id.
+    Raises a single ValidationError listing every id that does not exist.
+    """
+    exercises_by_id = Exercise.objects.in_bulk(exercise_ids)
+    unknown_ids = sorted(set(exercise_ids) - exercises_by_id.keys())
+    if unknown_ids:
+        raise ValidationError({'unknown_exercise_ids': unknown_ids})
+    return exercises_by_id
+
+
+def build_logged_exercises(logged_workout, exercises_data, exercises_by_id):
+    """
+    Unsaved LoggedExercises for validated LoggedExerciseInputSerializer data, ready for bulk_create.
+    """
+    return [
+        LoggedExercise(
+            logged_workout=logged_workout,
+            exercise=exercises_by_id[exercise['exercise_id']],
+            order=exercise['order'],
+            sets_completed=exercise['sets'],
+            reps_completed=exercise['reps'],
+            weight_used_kg=exercise.get('weight_in_kg'),
+            km_ran=exercise.get('km_ran'),
+        )
+        for exercise in exercises_data
+    ]
+
+
+def sync_logs(user, data):
+    """
+    Write a batch of logged workouts and diet log items replayed by an offline client.
+
+    Every item carries a client-generated `client_key`; items whose key was already
+    synced are reported as existing instead of being written again, so a batch can
+    be retried safely. Valid items are written with bulk inserts in one transaction
+    and a result is returned for every item, in the order they were sent.
+    """
+    if not isinstance(data, dict):
+        raise ValidationError({'non_field_errors': 'Expected an object with logged_workouts and diet_log_items.'})
+    workouts = data.get('logged_workouts', [])
+    diet_log_items = data.get('diet_log_items', [])
+    for field, items in (('logged_workouts', workouts), ('diet_log_items', diet_log_items)):
+        if not isinstance(items, list):
+            raise ValidationError({field: 'Expected a list of items.'})
+        if len(items) > SYNC_BATCH_LIMIT:
+            raise ValidationError({field: f'At most {SYNC_BATCH_LIMIT} items can be synced at once.'})
+
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return write_sync_batch(user, workouts, diet_log_items)
+        except IntegrityError:
+            # A concurrent retry of the same batch inserted some of the keys first;
+            # the second attempt reports those items as existing.
+            if attempt:
+                raise
+
+
+def write_sync_batch(user, workouts, diet_log_items):
+    workout_results, pending_workouts = validate_sync_items(
+        SyncLoggedWorkoutSerializer, LoggedWorkout, user, workouts
+    )
+    diet_results, pending_diet_items = validate_sync_items(
+        SyncDietLogItemSerializer, DietLogItem, user, diet_log_items
+    )
+
+    exercise_ids = {
+        exercise['exercise_id']
+        for data, results in pending_workouts.values()
+        for exercise in data.get('exercises', [])
+    }
+    exercises_by_id = Exercise.objects.in_bulk(exercise_ids)
+    for client_key, (data, results) in list(pending_workouts.items()):
+        unknown_ids = sorted({exercise['exercise_id'] for exercise in data.get('exercises', [])} - exercises_by_id.keys())
+        if unknown_ids:
+            del pending_workouts[client_key]
+            for result in results:
+                result.update(status='invalid', errors={'unknown_exercise_ids': unknown_ids})
+
+    new_workouts = [
+        LoggedWorkout(user=user, **{field: value for field, value in data.items() if field != 'exercises'})
+        for data, results in pending_workouts.values()
+    ]
+    LoggedWorkout.objects.bulk_create(new_workouts)
+    new_workouts = assign_ids(LoggedWorkout, user, new_workouts)
+    LoggedExercise.objects.bulk_create([
+        logged_exercise
+        for logged_workout in new_workouts
+        for logged_exercise in build_logged_exercises(
+            logged_workout, pending_workouts[logged_workout.client_key][0].get('exercises', []), exercises_by_id
+        )
+    ])
+
+    new_diet_items = [DietLogItem(user=user, **data) for data, results in pending_diet_items.values()]
+    DietLogItem.objects.bulk_create(new_diet_items)
+    new_diet_items = assign_ids(DietLogItem, user, new_diet_items)
+
+    for pending, created in ((pending_workouts, new_workouts), (pending_diet_items, new_diet_items)):
+        for instance in created:
+            first, *repeats = pending[instance.client_key][1]
+            first.update(status='created', id=instance.pk)
+            for result in repeats:
+                result.update(status='existing', id=instance.pk)
+
+    # bulk_create skips the signals that keep the stats rollup current
+    refresh_daily_stats(user.pk, {stats_date(instance.log_time) for instance in new_workouts + new_diet_items})
+    invalidate(LOGGED_WORKOUTS, user.pk)
+    invalidate(DIET_LOG_ITEMS, user.pk)
+
+    return {'logged_workouts': workout_results, 'diet_log_items': diet_results}
+
+
+def validate_sync_items(serializer_class, model, user, items):
+    """
+    Validate the items of a sync batch one by one.
+
+    Returns the per-item results, plus the items that still need to be written
+    as a dict of client_key -> (validated data, results sharing that key).
+    Results of items that are invalid or already synced are filled in here.
+    """
+    results = []
+    pending = {}
+    for item in items:
+        serializer = serializer_class(data=item)
+        if not serializer.is_valid():
+            client_key = item.get('client_key') if isinstance(item, dict) else None
+            results.append({'client_key': client_key, 'status': 'invalid', 'errors': serializer.errors})
+            continue
+        client_key = serializer.validated_data['client_key']
+        result = {'client_key': client_key}
+        results.append(result)
+        pending.setdefault(client_key, (serializer.validated_data, []))[1].append(result)
+
+    existing = model.objects.filter(user=user, client_key__in=pending.keys()).values_list('client_key', 'id')
+    for client_key, pk in existing:
+        for result in pending.pop(client_key)[1]:
+            result.update(status='existing', id=pk)
+
+    return results, pending
+
+
+def assign_ids(model, user, instances):
+    """
+    Make sure bulk created instances have their primary key, for backends that
+    cannot return it from a bulk insert.
+    """
+    missing = [instance for instance in instances if instance.pk is None]
+    if missing:
+        ids = dict(model.objects.filter(
+            user=user, client_key__in=[instance.client_key for instance in missing]
+        ).values_list('client_key', 'id'))
+        for instance in missing:
+            instance.pk = ids[instance.client_key]
+    return instances
@@ -1,32 +1,14 @@
-import json
 from fitness.models import (
     UserProfile, DietLogItem, Workout, WorkoutExercise, WorkoutProgram, ProgramDay,
     LoggedWorkout, LoggedExercise, ActiveWorkoutProgram, Exercise, FeaturedWorkout
 )
-from fitness.serializers import ExerciseSerializer
+from django.core.management import call_command
 from django.utils import timezone
 
 # Seed Exercises
 def seed_exercises():
     print('Seeding exercises...')
-    with open('fitness_server/seed_exercise.json') as f:
-        exercises_data = json.load(f)
-
-    for exercise_data in exercises_data:
-        exercise_data['exercise_id'] = exercise_data.pop('id')
-        exercise_data['gif_url'] = exercise_data.pop('gifUrl')
-        exercise_data['body_part'] = exercise_data.pop('bodyPart')
-
-        exercise_data['secondaryMuscles'] = exercise_data.pop('secondaryMuscles', [])
-        exercise_data['instructions'] = exercise_data.pop('instructions', [])
-        exercise_data['calories_burned'] = 200
-
-        serializer = ExerciseSerializer(data=exercise_data)
-        if serializer.is_valid():
-            serializer.save()
-            print(f'Successfully added exercise: {exercise_data["name"]}')
-        else:
-            print(f'Failed to add exercise: {exercise_data["name"]}. Errors: {serializer.errors}')
+    call_command('import_catalog', 'fitness_server/seed_exercise.json')
 
 # # Seed UserProfile
 # def seed_user_profiles():
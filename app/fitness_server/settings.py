@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "fitness.middleware.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -57,12 +58,69 @@ MIDDLEWARE = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-        'rest_framework.authentication.SessionAuthentication',
+        'fitness.authentication.CachedTokenAuthentication',
+        'fitness.authentication.SessionAuthentication',
     ],
 }
 
+# Local memory (per process) for development; a file- or Redis-backed cache
+# shared by all gunicorn workers in production.
+CACHE_BACKENDS = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+}
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKENDS[CACHE_BACKEND],
+        # Directory of the file cache, or redis://host:port/db
+        "LOCATION": os.environ.get("CACHE_LOCATION", str(BASE_DIR / "cache") if CACHE_BACKEND == "file" else ""),
+        "TIMEOUT": int(os.environ.get("CACHE_TIMEOUT", 300)),  # In seconds
+        "KEY_PREFIX": os.environ.get("CACHE_KEY_PREFIX", "fitness"),
+        # The Redis backend evicts by its own maxmemory policy
+        "OPTIONS": {} if CACHE_BACKEND == "redis" else {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000))},
+    }
+}
+VIEW_CACHE_TIMEOUT = int(os.environ.get("VIEW_CACHE_TIMEOUT", 300))  # In seconds, 0 turns view caching off (fitness.caching)
+FEATURED_WORKOUT_MAX_AGE = int(os.environ.get("FEATURED_WORKOUT_MAX_AGE", 300))  # In seconds, client caching of the featured workout
+
+AUTH_TOKEN_CACHE_TTL = int(os.environ.get("AUTH_TOKEN_CACHE_TTL", 60))  # In seconds, 0 disables the token cache
+
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", 30))  # In seconds
+OPENAI_CONNECT_TIMEOUT = float(os.environ.get("OPENAI_CONNECT_TIMEOUT", 5))
+OPENAI_MAX_CONNECTIONS = int(os.environ.get("OPENAI_MAX_CONNECTIONS", 10))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", 60))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", 4))  # Concurrent model calls per process
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", 3))
+OPENAI_RETRY_BACKOFF = float(os.environ.get("OPENAI_RETRY_BACKOFF", 0.5))  # Base delay, in seconds
+
+# Food scans run as background jobs. FOOD_SCANNER can point at
+# fitness.utils.stub_food_scanner.StubFoodScanner to work without OpenAI.
+FOOD_SCANNER = os.environ.get("FOOD_SCANNER", "fitness.utils.gpt_food_scanner.GPTFoodScanner")
+FOOD_SCAN_WORKERS = int(os.environ.get("FOOD_SCAN_WORKERS", 4))
+FOOD_SCAN_RUN_INLINE = bool(int(os.environ.get("FOOD_SCAN_RUN_INLINE", 0)))
+FOOD_SCAN_MAX_WAIT = float(os.environ.get("FOOD_SCAN_MAX_WAIT", 20))  # Longest long-poll, in seconds
+# Longest wait of the sync scan_result view, which holds a worker while it polls; long
+# waits go to the async endpoints
+FOOD_SCAN_SYNC_MAX_WAIT = float(os.environ.get("FOOD_SCAN_SYNC_MAX_WAIT", 1))
+FOOD_SCAN_POLL_INTERVAL = 0.25
+FOOD_SCAN_JOB_TIMEOUT = int(os.environ.get("FOOD_SCAN_JOB_TIMEOUT", 120))
+FOOD_SCAN_IMAGE_FORMAT = os.environ.get("FOOD_SCAN_IMAGE_FORMAT", "JPEG")  # JPEG or WEBP
+FOOD_SCAN_CACHE_MAX_ENTRIES = int(os.environ.get("FOOD_SCAN_CACHE_MAX_ENTRIES", 10000))
+FOOD_SCAN_CACHE_TTL = int(os.environ.get("FOOD_SCAN_CACHE_TTL", 7 * 24 * 60 * 60))  # In seconds
+# Per-request timing breakdown, Server-Timing headers and per-URL histograms
+# (fitness.middleware.ProfilingMiddleware). A PROFILING_SAMPLE_RATE share of
+# requests also runs cProfile; those slower than PROFILING_SLOW_MS are dumped
+# to PROFILING_DUMP_DIR as .prof files.
+PROFILING_ENABLED = bool(int(os.environ.get("PROFILING_ENABLED", 0)))
+PROFILING_SERVER_TIMING = bool(int(os.environ.get("PROFILING_SERVER_TIMING", 1)))
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_SLOW_MS = float(os.environ.get("PROFILING_SLOW_MS", 500))
+PROFILING_DUMP_DIR = os.environ.get("PROFILING_DUMP_DIR", BASE_DIR / "profiles")
+
 ROOT_URLCONF = "fitness_server.urls"
 
 TEMPLATES = [
@@ -87,6 +145,9 @@ WSGI_APPLICATION = "fitness_server.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# wsgi or asgi, the server gunicorn.conf.py runs
+SERVER_MODE = os.environ.get("SERVER_MODE", "wsgi")
+
 DATABASES = {
     "default": {
         "ENGINE": os.environ.get("SQL_ENGINE", "django.db.backends.sqlite3"),
@@ -95,6 +156,15 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", "password"),
         "HOST": os.environ.get("SQL_HOST", "localhost"),
         "PORT": os.environ.get("SQL_PORT", "5432"),
+        # Seconds a connection is reused across requests, 0 closes it after every request.
+        # Always 0 under ASGI: the sync code of each request runs in a thread of its own,
+        # which would leave its persistent connection open and never reuse it
+        "CONN_MAX_AGE": 0 if SERVER_MODE == "asgi" else int(os.environ.get("SQL_CONN_MAX_AGE", 60)),
+        # Check a reused connection before the first query of a request
+        "CONN_HEALTH_CHECKS": bool(int(os.environ.get("SQL_CONN_HEALTH_CHECKS", 1))),
+        # PgBouncer in transaction mode hands each transaction a different server
+        # connection, which breaks server-side cursors
+        "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("SQL_POOLER") == "pgbouncer",
     }
 }
 
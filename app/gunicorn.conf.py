@@ -0,0 +1,15 @@
+# Gunicorn settings, e.g. gunicorn -c gunicorn.conf.py
+# SERVER_MODE=asgi serves fitness_server.asgi with uvicorn workers, so the
+# async views (fitness/async_views.py) wait on I/O without holding a worker.
+# Database connections are then closed after every request (see settings.py).
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 3))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))  # In seconds, above FOOD_SCAN_MAX_WAIT
+
+if os.environ.get("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "fitness_server.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "fitness_server.wsgi:application"